@@ -9,7 +9,8 @@ help-text =
 
     <b>Commands:</b>
     /start - Restart the bot (show the welcome message)
-    /newchat - Start a new conversation (clear history)
+    /newchat [title] - Start a new conversation (the current one is saved)
+    /chats - Switch between your conversations
     /generate_image - Generate an image from text
     /model - Select an AI model for text generation
     /language - Change the interface language
@@ -27,6 +28,11 @@ help-text =
 thinking = 🧠 Thinking about your question...
 analyzing = 🖼️ Analyzing the image...
 thinking-retry = ⏳ Retrying your previous request...
+queue-position = ⏳ The bot is under heavy load right now. You are #{ $position } in the queue, please wait...
+user-queue-full = ⏳ I'm still working on your previous messages. Please wait for the answers before sending more.
+admission-rejected = 😔 The bot is overloaded right now and can't take your request. Please try again in a few minutes.
+request-cancelled = ⏹ Request cancelled.
+error-deadline-exceeded = ⏱ Your request took too long and was stopped. Please try again.
 
 # Image Generation
 generate-image-prompt = 🎨 Enter a text description (prompt) for image generation:
@@ -49,9 +55,15 @@ processing-extracted-text = 🧠 Analyzing text from document '{ $filename }'...
 # AI Models
 model-prompt = Select an AI model for text generation:
 model-chosen = AI model set to: { $model_name }
+model-auto = 🤖 Auto (picks a model for every message)
 
 # Creating a new chat
-newchat-started = ✨ Alright, let's start a new conversation! I've forgotten the previous context.
+newchat-started = ✨ Alright, let's start a new conversation! The previous one is saved, use /chats to go back to it.
+chats-prompt = Your conversations (the current one is marked):
+chats-empty = You don't have saved conversations yet. Just send me a message to start one.
+chats-untitled = Conversation #{ $id }
+chats-switched = 💬 Switched to conversation: { $title }
+chats-not-found = ⚠️ This conversation doesn't exist anymore.
 
 # Prompts for AI
 prompt-analyze-document = Analyze the text from this document '{ $filename }':
@@ -64,8 +76,10 @@ button-retry-request = 🔁 Retry request?
 settings-current-prompt = Current Gemini generation settings:
 settings-button-temperature = 🌡️ Temperature: { $value }
 settings-button-max-tokens = 📏 Max length: { $value }
+settings-button-speed = ⚡ Speed: { $value }
 settings-prompt-temperature = Select temperature (affects creativity):
 settings-prompt-max-tokens = Select maximum response length (in tokens):
+settings-prompt-speed = Select response speed (less thinking is faster, more thinking is better for hard questions):
 settings-option-default = Default ({ $value })
 settings-option-temperature-precise = 0.3 (Precise)
 settings-option-temperature-balanced = 0.7 (Balanced)
@@ -74,6 +88,15 @@ settings-option-max-tokens-short = 512 (Short)
 settings-option-max-tokens-medium = 1024 (Medium)
 settings-option-max-tokens-long = 2048 (Long)
 settings-option-max-tokens-very_long = 8192 (Very long)
+settings-option-speed-fast = Fast (no thinking)
+settings-option-speed-balanced = Balanced
+settings-option-speed-deep = Deep (long thinking)
+settings-button-debounce = 🧩 Merge messages: { $value }
+settings-prompt-debounce = Merge messages sent in a row into one question? The bot waits this long after your last message before answering:
+settings-option-debounce-off = Off (answer each message)
+settings-option-debounce-short = 1 s
+settings-option-debounce-medium = 1.5 s
+settings-option-debounce-long = 3 s
 button-back = ⬅️ Back
 
 # Data Deletion
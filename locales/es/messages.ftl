@@ -11,7 +11,8 @@ help-text =
 
     <b>Comandos:</b>
     /start - Reiniciar el bot (mostrar saludo)
-    /newchat - Iniciar un nuevo diálogo (limpiar historial)
+    /newchat [título] - Iniciar un nuevo diálogo (el actual se guarda)
+    /chats - Cambiar entre tus diálogos
     /generate_image - Generar una imagen a partir de texto
     /model - Seleccionar un modelo de IA para generar texto
     /language - Cambiar el idioma de la interfaz
@@ -29,6 +30,11 @@ help-text =
 thinking = 🧠 Pensando en tu consulta...
 analyzing = 🖼️ Analizando la imagen...
 thinking-retry = ⏳ Reintentando tu solicitud anterior...
+queue-position = ⏳ El bot tiene mucha carga en este momento. Estás en la posición #{ $position } de la cola, por favor espera...
+user-queue-full = ⏳ Todavía estoy procesando tus mensajes anteriores. Espera las respuestas antes de enviar más.
+admission-rejected = 😔 El bot está sobrecargado en este momento y no puede aceptar tu solicitud. Inténtalo de nuevo en unos minutos.
+request-cancelled = ⏹ Solicitud cancelada.
+error-deadline-exceeded = ⏱ Tu solicitud tardó demasiado y se detuvo. Inténtalo de nuevo.
 
 # Generación de imágenes
 generate-image-prompt = 🎨 Ingresa una descripción de texto (prompt) para la generación de imágenes:
@@ -51,9 +57,15 @@ processing-extracted-text = 🧠 Analizando texto del documento '{ $filename }'.
 # Modelos de IA
 model-prompt = Selecciona un modelo de IA para generar texto:
 model-chosen = El modelo de IA se ha establecido en: { $model_name }
+model-auto = 🤖 Automático (elige el modelo para cada mensaje)
 
 # Creación de un nuevo chat
-newchat-started = ✨ ¡Bien, empecemos un nuevo diálogo! He olvidado el contexto anterior.
+newchat-started = ✨ ¡Bien, empecemos un nuevo diálogo! El anterior está guardado, usa /chats para volver a él.
+chats-prompt = Tus diálogos (el actual está marcado):
+chats-empty = Aún no tienes diálogos guardados. Envíame un mensaje para empezar uno.
+chats-untitled = Diálogo n.º { $id }
+chats-switched = 💬 Cambiado al diálogo: { $title }
+chats-not-found = ⚠️ Este diálogo ya no existe.
 
 # Indicaciones para IA
 prompt-analyze-document = Analiza el texto de este documento '{ $filename }' en español:
@@ -66,8 +78,10 @@ button-retry-request = 🔁 ¿Reintentar solicitud?
 settings-current-prompt = Configuración actual de generación de Gemini:
 settings-button-temperature = 🌡️ Temperatura: { $value }
 settings-button-max-tokens = 📏 Longitud máxima: { $value }
+settings-button-speed = ⚡ Velocidad: { $value }
 settings-prompt-temperature = Selecciona la temperatura (afecta la creatividad):
 settings-prompt-max-tokens = Selecciona la longitud máxima de la respuesta (en tokens):
+settings-prompt-speed = Selecciona la velocidad de respuesta (menos razonamiento es más rápido, más razonamiento es mejor para preguntas difíciles):
 settings-option-default = Predeterminado ({ $value })
 settings-option-temperature-precise = 0.3 (Preciso)
 settings-option-temperature-balanced = 0.7 (Equilibrado)
@@ -76,6 +90,15 @@ settings-option-max-tokens-short = 512 (Corto)
 settings-option-max-tokens-medium = 1024 (Medio)
 settings-option-max-tokens-long = 2048 (Largo)
 settings-option-max-tokens-very_long = 8192 (Muy largo)
+settings-option-speed-fast = Rápida (sin razonamiento)
+settings-option-speed-balanced = Equilibrada
+settings-option-speed-deep = Profunda (razonamiento largo)
+settings-button-debounce = 🧩 Unir mensajes: { $value }
+settings-prompt-debounce = ¿Unir los mensajes enviados seguidos en una sola pregunta? El bot espera este tiempo tras tu último mensaje antes de responder:
+settings-option-debounce-off = Desactivado (responder a cada mensaje)
+settings-option-debounce-short = 1 s
+settings-option-debounce-medium = 1,5 s
+settings-option-debounce-long = 3 s
 button-back = ⬅️ Atrás
 
 # Eliminación de datos
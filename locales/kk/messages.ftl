@@ -9,7 +9,8 @@ help-text =
 
     <b>Командалар:</b>
     /start - Ботты қайта іске қосу (сәлемдесуді көрсету)
-    /newchat - Жаңа диалог бастау (тарихты тазалау)
+    /newchat [атауы] - Жаңа диалог бастау (ағымдағысы сақталады)
+    /chats - Диалогтар арасында ауысу
     /generate_image - Мәтіннен сурет жасау
     /model - Мәтін генерациялау үшін ЖИ моделін таңдау
     /language - Тілді өзгерту
@@ -48,10 +49,21 @@ processing-extracted-text = 🧠 '{ $filename }' құжатынан мәтінд
 # ЖИ модельдері
 model-prompt = Мәтін генерациялау үшін ЖИ моделін таңдаңыз:
 model-chosen = ЖИ моделі орнатылды: { $model_name }
+model-auto = 🤖 Авто (әр хабарлама үшін модельді таңдайды)
 thinking-retry = ⏳ Алдыңғы сұрауыңызды қайталап жатырмын...
+queue-position = ⏳ Қазір бот қатты жүктелген. Сіз кезекте #{ $position } орындасыз, күте тұрыңыз...
+user-queue-full = ⏳ Мен әлі алдыңғы хабарламаларыңызды өңдеп жатырмын. Жаңасын жібермес бұрын жауаптарды күтіңіз.
+admission-rejected = 😔 Қазір бот шамадан тыс жүктелген және сұрауыңызды қабылдай алмайды. Бірнеше минуттан кейін қайталап көріңіз.
+request-cancelled = ⏹ Сұрау тоқтатылды.
+error-deadline-exceeded = ⏱ Сұрауыңыз тым ұзаққа созылып, тоқтатылды. Қайталап көріңіз.
 
 # Жаңа чат ашу
-newchat-started = ✨ Жақсы, жаңа диалогты бастайық! Мен алдыңғы контексті ұмытып кеттім.
+newchat-started = ✨ Жақсы, жаңа диалогты бастайық! Алдыңғысы сақталды, оған оралу үшін /chats пайдаланыңыз.
+chats-prompt = Сіздің диалогтарыңыз (ағымдағысы белгіленген):
+chats-empty = Сізде әлі сақталған диалогтар жоқ. Біреуін бастау үшін маған хабарлама жіберіңіз.
+chats-untitled = Диалог №{ $id }
+chats-switched = 💬 Диалогқа ауысты: { $title }
+chats-not-found = ⚠️ Бұл диалог енді жоқ.
 
 # AI үшін нұсқаулар
 prompt-analyze-document = Осы құжаттың '{ $filename }' мәтінін қазақ тілінде талдаңыз:
@@ -64,8 +76,10 @@ button-retry-request = 🔁 Сұранысты қайталау?
 settings-current-prompt = Gemini генерациясының ағымдағы параметрлері:
 settings-button-temperature = 🌡️ Температура: { $value }
 settings-button-max-tokens = 📏 Максималды ұзындық: { $value }
+settings-button-speed = ⚡ Жылдамдық: { $value }
 settings-prompt-temperature = Температураны таңдаңыз (шығармашылыққа әсер етеді):
 settings-prompt-max-tokens = Жауаптың максималды ұзындығын таңдаңыз (токендерде):
+settings-prompt-speed = Жауап жылдамдығын таңдаңыз (аз ойлану жылдамырақ, көп ойлану күрделі сұрақтар үшін жақсырақ):
 settings-option-default = Әдепкі ({ $value })
 settings-option-temperature-precise = 0.3 (Дәл)
 settings-option-temperature-balanced = 0.7 (Теңгерімді)
@@ -74,6 +88,15 @@ settings-option-max-tokens-short = 512 (Қысқа)
 settings-option-max-tokens-medium = 1024 (Орташа)
 settings-option-max-tokens-long = 2048 (Ұзын)
 settings-option-max-tokens-very_long = 8192 (Өте ұзын)
+settings-option-speed-fast = Жылдам (ойланусыз)
+settings-option-speed-balanced = Теңгерімді
+settings-option-speed-deep = Терең (ұзақ ойлану)
+settings-button-debounce = 🧩 Хабарламаларды біріктіру: { $value }
+settings-prompt-debounce = Қатарынан жіберілген хабарламаларды бір сұраққа біріктіру керек пе? Бот жауап бермес бұрын соңғы хабарламаңыздан кейін осынша күтеді:
+settings-option-debounce-off = Өшірулі (әр хабарламаға жауап беру)
+settings-option-debounce-short = 1 с
+settings-option-debounce-medium = 1,5 с
+settings-option-debounce-long = 3 с
 button-back = ⬅️ Артқа
 
 # Деректерді жою
@@ -9,7 +9,8 @@ help-text =
     
     <b>Команды:</b>
     /start - Перезапустить бота (показать приветствие)
-    /newchat - Начать новый диалог (очистить историю)
+    /newchat [название] - Начать новый диалог (текущий сохранится)
+    /chats - Переключиться между диалогами
     /generate_image - Сгенерировать изображение по тексту
     /model - Выбрать модель ИИ для генерации текста
     /language - Сменить язык интерфейса
@@ -27,6 +28,11 @@ help-text =
 thinking = 🧠 Думаю над вашим вопросом...
 analyzing = 🖼️ Анализирую изображение...
 thinking-retry = ⏳ Повторяю ваш предыдущий запрос...
+queue-position = ⏳ Сейчас бот сильно загружен. Вы #{ $position } в очереди, пожалуйста, подождите...
+user-queue-full = ⏳ Я ещё обрабатываю ваши предыдущие сообщения. Пожалуйста, дождитесь ответов, прежде чем отправлять новые.
+admission-rejected = 😔 Сейчас бот перегружен и не может принять ваш запрос. Попробуйте ещё раз через несколько минут.
+request-cancelled = ⏹ Запрос отменён.
+error-deadline-exceeded = ⏱ Запрос выполнялся слишком долго и был остановлен. Попробуйте ещё раз.
 
 # Генерация изображений
 generate-image-prompt = 🎨 Введите текстовое описание (промпт) для генерации изображения:
@@ -49,9 +55,15 @@ processing-extracted-text = 🧠 Анализирую текст из докум
 # Модели ИИ
 model-prompt = Выберите модель ИИ для генерации текста:
 model-chosen = Модель ИИ установлена на: { $model_name }
+model-auto = 🤖 Авто (выбирает модель для каждого сообщения)
 
 # Создание нового чата
-newchat-started = ✨ Хорошо, начнем новый диалог! Я забыл предыдущий контекст.
+newchat-started = ✨ Хорошо, начнем новый диалог! Предыдущий сохранен, вернуться к нему можно через /chats.
+chats-prompt = Ваши диалоги (текущий отмечен):
+chats-empty = У вас пока нет сохраненных диалогов. Просто отправьте сообщение, чтобы начать.
+chats-untitled = Диалог №{ $id }
+chats-switched = 💬 Переключено на диалог: { $title }
+chats-not-found = ⚠️ Этого диалога больше нет.
 
 # Подсказки для ИИ
 prompt-analyze-document = Проанализируйте текст из этого документа '{ $filename }' на русском языке:
@@ -64,8 +76,10 @@ button-retry-request = 🔁 Повторить запрос?
 settings-current-prompt = Текущие настройки генерации Gemini:
 settings-button-temperature = 🌡️ Температура: { $value }
 settings-button-max-tokens = 📏 Макс. длина: { $value }
+settings-button-speed = ⚡ Скорость: { $value }
 settings-prompt-temperature = Выберите температуру (влияет на креативность):
 settings-prompt-max-tokens = Выберите максимальную длину ответа (в токенах):
+settings-prompt-speed = Выберите скорость ответа (меньше размышлений — быстрее, больше — лучше для сложных вопросов):
 settings-option-default = По умолчанию ({ $value })
 settings-option-temperature-precise = 0.3 (Точный)
 settings-option-temperature-balanced = 0.7 (Сбалансированный)
@@ -74,6 +88,15 @@ settings-option-max-tokens-short = 512 (Короткий)
 settings-option-max-tokens-medium = 1024 (Средний)
 settings-option-max-tokens-long = 2048 (Длинный)
 settings-option-max-tokens-very_long = 8192 (Очень длинный)
+settings-option-speed-fast = Быстро (без размышлений)
+settings-option-speed-balanced = Сбалансированно
+settings-option-speed-deep = Глубоко (долгие размышления)
+settings-button-debounce = 🧩 Объединять сообщения: { $value }
+settings-prompt-debounce = Объединять сообщения, отправленные подряд, в один вопрос? Бот ждёт столько после вашего последнего сообщения, прежде чем ответить:
+settings-option-debounce-off = Выкл. (отвечать на каждое)
+settings-option-debounce-short = 1 с
+settings-option-debounce-medium = 1,5 с
+settings-option-debounce-long = 3 с
 button-back = ⬅️ Назад
 
 # Удаление данных
@@ -9,7 +9,8 @@ help-text =
 
     <b>Команди:</b>
     /start - Перезапустити бота (показати привітання)
-    /newchat - Почати новий діалог (очистити історію)
+    /newchat [назва] - Почати новий діалог (поточний збережеться)
+    /chats - Перемкнутися між діалогами
     /generate_image - Згенерувати зображення з тексту
     /model - Обрати модель ШІ для генерації тексту
     /language - Змінити мову інтерфейсу
@@ -27,6 +28,11 @@ help-text =
 thinking = 🧠 Думаю над вашим запитом...
 analyzing = 🖼️ Аналізую зображення...
 thinking-retry = ⏳ Повторюю ваш попередній запит...
+queue-position = ⏳ Зараз бот дуже завантажений. Ви #{ $position } у черзі, будь ласка, зачекайте...
+user-queue-full = ⏳ Я ще обробляю ваші попередні повідомлення. Будь ласка, дочекайтеся відповідей, перш ніж надсилати нові.
+admission-rejected = 😔 Зараз бот перевантажений і не може прийняти ваш запит. Спробуйте ще раз за кілька хвилин.
+request-cancelled = ⏹ Запит скасовано.
+error-deadline-exceeded = ⏱ Запит виконувався надто довго й був зупинений. Спробуйте ще раз.
 
 # Генерація зображень
 generate-image-prompt = 🎨 Введіть текстовий опис (промпт) для генерації зображення:
@@ -49,9 +55,15 @@ processing-extracted-text = 🧠 Аналізую текст із докумен
 # Моделі ШІ
 model-prompt = Оберіть модель ШІ для генерації тексту:
 model-chosen = Модель ШІ встановлено на: { $model_name }
+model-auto = 🤖 Авто (обирає модель для кожного повідомлення)
 
 # Створення нового чату  
-newchat-started = ✨ Гаразд, почнімо новий діалог! Я забув попередній контекст.
+newchat-started = ✨ Гаразд, почнімо новий діалог! Попередній збережено, повернутися до нього можна через /chats.
+chats-prompt = Ваші діалоги (поточний позначено):
+chats-empty = У вас ще немає збережених діалогів. Просто надішліть повідомлення, щоб почати.
+chats-untitled = Діалог №{ $id }
+chats-switched = 💬 Перемкнуто на діалог: { $title }
+chats-not-found = ⚠️ Цього діалогу більше немає.
 
 # Підказки для ІІ
 prompt-analyze-document = Проаналізуйте текст із цього документа '{ $filename }' українською мовою:
@@ -64,8 +76,10 @@ button-retry-request = 🔁 Повторити запит?
 settings-current-prompt = Поточні налаштування генерації Gemini:
 settings-button-temperature = 🌡️ Температура: { $value }
 settings-button-max-tokens = 📏 Максимальна довжина: { $value }
+settings-button-speed = ⚡ Швидкість: { $value }
 settings-prompt-temperature = Виберіть температуру (впливає на креативність):
 settings-prompt-max-tokens = Виберіть максимальну довжину відповіді (у токенах):
+settings-prompt-speed = Оберіть швидкість відповіді (менше роздумів — швидше, більше — краще для складних питань):
 settings-option-default = За замовчуванням ({ $value })
 settings-option-temperature-precise = 0.3 (Точний)
 settings-option-temperature-balanced = 0.7 (Збалансований)
@@ -74,6 +88,15 @@ settings-option-max-tokens-short = 512 (Короткий)
 settings-option-max-tokens-medium = 1024 (Середній)
 settings-option-max-tokens-long = 2048 (Довгий)
 settings-option-max-tokens-very_long = 8192 (Дуже довгий)
+settings-option-speed-fast = Швидко (без роздумів)
+settings-option-speed-balanced = Збалансовано
+settings-option-speed-deep = Глибоко (довгі роздуми)
+settings-button-debounce = 🧩 Об'єднувати повідомлення: { $value }
+settings-prompt-debounce = Об'єднувати повідомлення, надіслані поспіль, в одне запитання? Бот чекає стільки після вашого останнього повідомлення, перш ніж відповісти:
+settings-option-debounce-off = Вимк. (відповідати на кожне)
+settings-option-debounce-short = 1 с
+settings-option-debounce-medium = 1,5 с
+settings-option-debounce-long = 3 с
 button-back = ⬅️ Назад
 
 # Видалення даних
@@ -11,7 +11,8 @@ help-text =
 
     <b>命令:</b>
     /start - 重新启动机器人（显示欢迎信息）
-    /newchat - 开始新对话（清除历史记录）
+    /newchat [标题] - 开始新对话（当前对话会被保存）
+    /chats - 在你的对话之间切换
     /generate_image - 根据文本生成图像
     /model - 选择用于生成文本的人工智能模型
     /language - 更改界面语言
@@ -29,6 +30,11 @@ help-text =
 thinking = 🧠 正在思考您的问题...
 analyzing = 🖼️ 正在分析图片...
 thinking-retry = ⏳ 正在重试您的上一个请求...
+queue-position = ⏳ 机器人当前负载较高。您在队列中排第 { $position } 位，请稍候...
+user-queue-full = ⏳ 我仍在处理您之前的消息。请等待回复后再发送新消息。
+admission-rejected = 😔 机器人当前负载过高，无法处理您的请求。请几分钟后再试。
+request-cancelled = ⏹ 请求已取消。
+error-deadline-exceeded = ⏱ 您的请求耗时过长，已被停止。请重试。
 
 # 图像生成
 generate-image-prompt = 🎨 输入用于生成图像的文本描述（提示）：
@@ -51,9 +57,15 @@ processing-extracted-text = 🧠 正在分析文档 '{ $filename }' 中的文本
 # 人工智能模型
 model-prompt = 选择用于生成文本的人工智能模型：
 model-chosen = 人工智能模型已设置为：{ $model_name }
+model-auto = 🤖 自动（为每条消息选择模型）
 
 # 创建新聊天
-newchat-started = ✨ 好的，我们开始一个新对话！我已经忘记了之前的上下文。
+newchat-started = ✨ 好的，我们开始一个新对话！之前的对话已保存，使用 /chats 可以返回。
+chats-prompt = 你的对话（当前对话已标记）：
+chats-empty = 你还没有保存的对话。发送一条消息即可开始。
+chats-untitled = 对话 #{ $id }
+chats-switched = 💬 已切换到对话：{ $title }
+chats-not-found = ⚠️ 该对话已不存在。
 
 # AI 提示
 prompt-analyze-document = 请用简体中文分析文档 '{ $filename }' 中的文本：
@@ -66,8 +78,10 @@ button-retry-request = 🔁 重试请求？
 settings-current-prompt = 当前 Gemini 生成设置：
 settings-button-temperature = 🌡️ 温度：{ $value }
 settings-button-max-tokens = 📏 最大长度：{ $value }
+settings-button-speed = ⚡ 速度：{ $value }
 settings-prompt-temperature = 选择温度（影响创造力）：
 settings-prompt-max-tokens = 选择最大回复长度（以令牌计）：
+settings-prompt-speed = 选择回答速度（思考越少越快，思考越多越适合难题）：
 settings-option-default = 默认 ({ $value })
 settings-option-temperature-precise = 0.3（精确）
 settings-option-temperature-balanced = 0.7（平衡）
@@ -76,6 +90,15 @@ settings-option-max-tokens-short = 512（短）
 settings-option-max-tokens-medium = 1024（中等）
 settings-option-max-tokens-long = 2048（长）
 settings-option-max-tokens-very_long = 8192（非常长）
+settings-option-speed-fast = 快速（不思考）
+settings-option-speed-balanced = 均衡
+settings-option-speed-deep = 深入（长时间思考）
+settings-button-debounce = 🧩 合并消息：{ $value }
+settings-prompt-debounce = 是否将连续发送的消息合并为一个问题？机器人会在您最后一条消息后等待这么久再回答：
+settings-option-debounce-off = 关闭（逐条回答）
+settings-option-debounce-short = 1 秒
+settings-option-debounce-medium = 1.5 秒
+settings-option-debounce-long = 3 秒
 button-back = ⬅️ 返回
 
 # 数据删除
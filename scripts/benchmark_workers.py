@@ -0,0 +1,97 @@
+"""
+Throughput benchmark of the supervisor mode: 1 worker process vs N.
+
+Usage:
+    python -m scripts.benchmark_workers [workers] [updates] [users]
+
+Dispatches `updates` (default 2000) synthetic text updates of `users`
+(default 200) users through the consistent hash ring to 1 and to `workers`
+(default: CPU count) worker processes, and prints updates per second.
+Benchmark workers parse updates like src.worker does and run CPU-bound
+post-processing of a long Markdown answer (strip_markdown_v2) instead of
+calling Telegram and Gemini, so the numbers show how the handler CPU load
+scales with processes. Timing starts once all workers are up, so process
+start-up (importing aiogram) isn't counted.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from aiogram.types import Update
+
+from src.supervisor import HashRing, Supervisor
+from src.utils.text_processing import strip_markdown_v2
+
+ANSWER = (
+    "# Answer\n\nHere is **bold**, _italic_ and `code` with a [link](https://x.y).\n"
+    "> quoted line\n- item one\n- item **two**\n~~struck~~ text\n"
+) * 200
+COMMAND = [sys.executable, "-m", "scripts.benchmark_workers", "--worker"]
+# Directory where started benchmark workers leave a marker file.
+READY_DIR_ENV = "BENCHMARK_WORKERS_READY_DIR"
+
+
+def run_worker():
+    """Benchmark worker: handles updates from stdin until it's closed."""
+    open(os.path.join(os.environ[READY_DIR_ENV], str(os.getpid())), "w").close()
+    for line in sys.stdin.buffer:
+        update = Update.model_validate_json(line)
+        strip_markdown_v2(ANSWER + update.message.text)
+
+
+def make_update(update_id: int, user_id: int) -> bytes:
+    return (
+        f'{{"update_id":{update_id},"message":{{"message_id":{update_id},'
+        f'"date":1700000000,"chat":{{"id":{user_id},"type":"private"}},'
+        f'"from":{{"id":{user_id},"is_bot":false,"first_name":"U"}},'
+        f'"text":"message {update_id}"}}}}'
+    ).encode()
+
+
+async def measure(workers: int, updates: int, users: int) -> float:
+    """Returns updates per second handled by `workers` processes."""
+    supervisor = Supervisor(workers, COMMAND, stop_timeout=600)
+    with tempfile.TemporaryDirectory() as ready_dir:
+        os.environ[READY_DIR_ENV] = ready_dir
+        await supervisor.start()
+        while len(os.listdir(ready_dir)) < workers:
+            await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    for update_id in range(updates):
+        user_id = update_id % users
+        await supervisor.dispatch(f"user:{user_id}", make_update(update_id, user_id))
+    # Stopping waits for the workers to handle everything sent to them.
+    await supervisor.stop()
+    return updates / (time.perf_counter() - started)
+
+
+def main():
+    args = [int(arg) for arg in sys.argv[1:]]
+    workers = args[0] if len(args) > 0 else os.cpu_count() or 2
+    updates = args[1] if len(args) > 1 else 2000
+    users = args[2] if len(args) > 2 else 200
+
+    ring = HashRing(workers)
+    shares = Counter(ring.node_for(f"user:{user_id}") for user_id in range(users))
+    print(
+        f"{users} users over {workers} workers: "
+        + ", ".join(f"w{node}={shares[node]}" for node in range(workers))
+    )
+
+    print(f"{'workers':>8} {'updates/s':>10} {'speedup':>8}")
+    baseline = asyncio.run(measure(1, updates, users))
+    print(f"{1:>8} {baseline:>10.1f} {1.0:>8.2f}")
+    if workers > 1:
+        throughput = asyncio.run(measure(workers, updates, users))
+        print(f"{workers:>8} {throughput:>10.1f} {throughput / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--worker"]:
+        run_worker()
+    else:
+        main()
@@ -0,0 +1,113 @@
+"""
+Offline evaluation of the "auto" model router.
+
+Usage:
+    python -m scripts.evaluate_model_router [labeled.jsonl]
+
+Every line of the dataset is a JSON object:
+    {"prompt": "...", "history_depth": 4, "has_document": false, "label": "fast" | "strong"}
+where `label` is the route a human would pick. Without a dataset a small built-in
+sample is used. Prints accuracy, confusion matrix and the share of traffic sent
+to the fast model.
+"""
+
+import json
+import sys
+from collections import Counter
+from typing import Any, Dict, List
+
+from src.services.routing import AUTO_ROUTE_FAST, AUTO_ROUTE_STRONG, ComplexityRouter
+
+SAMPLE_DATASET: List[Dict[str, Any]] = [
+    {"prompt": "Hi! How are you?", "history_depth": 0, "label": "fast"},
+    {
+        "prompt": "Translate 'good morning' to Spanish",
+        "history_depth": 2,
+        "label": "fast",
+    },
+    {"prompt": "Какая сегодня погода в Алматы?", "history_depth": 0, "label": "fast"},
+    {
+        "prompt": "Give me three ideas for a birthday gift",
+        "history_depth": 6,
+        "label": "fast",
+    },
+    {"prompt": "Thanks, that helped", "history_depth": 24, "label": "fast"},
+    {
+        "prompt": "Why does this fail?\n```python\ndef f(x):\n    return x / 0\n```",
+        "history_depth": 2,
+        "label": "strong",
+    },
+    {
+        "prompt": "Prove that the integral of x^2 from 0 to 1 equals 1/3",
+        "history_depth": 0,
+        "label": "strong",
+    },
+    {
+        "prompt": "Докажи, что уравнение x^2 + 1 = 0 не имеет действительных корней",
+        "history_depth": 4,
+        "label": "strong",
+    },
+    {
+        "prompt": "Summarize the document and list the open questions.\n\n"
+        + "lorem ipsum " * 400,
+        "history_depth": 0,
+        "has_document": True,
+        "label": "strong",
+    },
+    {
+        "prompt": "Refactor it to use async/await:\nfunction load() {\n  return fetch(url).then(r => r.json());\n}",
+        "history_depth": 22,
+        "label": "strong",
+    },
+]
+
+
+def load_dataset(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(dataset: List[Dict[str, Any]], router: ComplexityRouter) -> Dict[str, Any]:
+    confusion: Counter = Counter()
+    for item in dataset:
+        score, _ = router.score(
+            item["prompt"],
+            item.get("history_depth", 0),
+            item.get("has_document", False),
+        )
+        predicted = (
+            AUTO_ROUTE_STRONG if score >= router.score_threshold else AUTO_ROUTE_FAST
+        )
+        confusion[(item["label"], predicted)] += 1
+
+    total = sum(confusion.values())
+    correct = sum(
+        n for (label, predicted), n in confusion.items() if label == predicted
+    )
+    fast = sum(
+        n for (_, predicted), n in confusion.items() if predicted == AUTO_ROUTE_FAST
+    )
+    return {
+        "total": total,
+        "accuracy": correct / total if total else 0.0,
+        "fast_share": fast / total if total else 0.0,
+        "confusion": confusion,
+    }
+
+
+def main():
+    dataset = load_dataset(sys.argv[1]) if len(sys.argv) > 1 else SAMPLE_DATASET
+    result = evaluate(dataset, ComplexityRouter())
+    routes = (AUTO_ROUTE_FAST, AUTO_ROUTE_STRONG)
+
+    print(f"Requests: {result['total']}")
+    print(f"Accuracy: {result['accuracy']:.1%}")
+    print(f"Routed to fast model: {result['fast_share']:.1%}")
+    print("\nlabel \\ predicted " + "".join(f"{r:>10}" for r in routes))
+    for label in routes:
+        row = "".join(f"{result['confusion'][(label, r)]:>10}" for r in routes)
+        print(f"{label:<18}{row}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Moves chat histories from user documents to the messages collection.
+
+Usage:
+    python -m scripts.migrate_history_to_messages [batch_size]
+
+Streams user documents that still hold history and migrates
+them one by one, so memory use doesn't depend on the number of users. Users
+that aren't migrated yet are also migrated by the bot on their next message,
+and the script can be run again or alongside the running bot.
+"""
+
+import asyncio
+import logging
+import sys
+from src.db import backend
+from src.storage.mongo import CONVERSATION_FIELD, MongoBackend
+from src.storage.retention import LEGACY_HISTORY_FIELD
+
+DEFAULT_BATCH_SIZE = 100
+PROGRESS_EVERY = 1000
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate(batch_size: int) -> int:
+    """Returns the number of migrated users."""
+    if not isinstance(backend, MongoBackend):
+        raise SystemExit("History migration is only needed for MongoDB storage.")
+    if not await backend.connect():
+        raise SystemExit("Cannot connect to MongoDB.")
+    migrated = 0
+    try:
+        cursor = backend.user_data.find(
+            {LEGACY_HISTORY_FIELD: {"$exists": True}},
+            projection={"user_id": 1, CONVERSATION_FIELD: 1, LEGACY_HISTORY_FIELD: 1},
+            batch_size=batch_size,
+        )
+        async for doc in cursor:
+            await backend.migrate_legacy_history(doc["user_id"], doc)
+            migrated += 1
+            if migrated % PROGRESS_EVERY == 0:
+                logger.info(f"Migrated {migrated} users...")
+    finally:
+        await backend.close()
+    return migrated
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BATCH_SIZE
+    migrated = asyncio.run(migrate(batch_size))
+    print(f"Migrated histories of {migrated} users.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Simulation of admission queuing under a heavy-user flood.
+
+Usage:
+    python -m scripts.simulate_fair_scheduling [heavy_requests]
+
+One heavy user submits a burst of requests (default 200) to a pool of 4 slots,
+while light users send single requests at random moments during the flood.
+Every request holds its slot for a fixed service time. Prints p50/p95/max
+latency (queue wait + service) of light users with the FIFO queue and with
+fair queuing, then the share of slots two flooding users get with weights
+1 and 3 (e.g. a premium user).
+"""
+
+import asyncio
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+from src.services.admission import ModalityPool
+
+SLOTS = 4
+SERVICE_SECONDS = 0.02
+LIGHT_USERS = 40
+HEAVY_USER_ID = 0
+PREMIUM_USER_ID = 1
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def request(pool: ModalityPool, user_id: int) -> float:
+    started = time.monotonic()
+    await pool.acquire(user_id)
+    try:
+        await asyncio.sleep(SERVICE_SECONDS)
+    finally:
+        pool.release()
+    return time.monotonic() - started
+
+
+async def light_request(pool: ModalityPool, user_id: int, delay: float) -> float:
+    await asyncio.sleep(delay)
+    return await request(pool, user_id)
+
+
+def make_pool(
+    fair_queueing: bool, queue_size: int, weights: Optional[Dict[int, float]] = None
+) -> ModalityPool:
+    return ModalityPool("simulation", SLOTS, queue_size, 3600.0, fair_queueing, weights)
+
+
+async def flood(fair_queueing: bool, heavy_requests: int) -> List[float]:
+    """Returns latencies of light users' requests sent during the flood."""
+    pool = make_pool(fair_queueing, heavy_requests + LIGHT_USERS)
+    flood_seconds = heavy_requests * SERVICE_SECONDS / SLOTS
+    rng = random.Random(0)
+    heavy = [request(pool, HEAVY_USER_ID) for _ in range(heavy_requests)]
+    light = [
+        light_request(pool, user_id, rng.uniform(0, flood_seconds * 0.8))
+        for user_id in range(1, LIGHT_USERS + 1)
+    ]
+    results = await asyncio.gather(*heavy, *light)
+    return list(results[heavy_requests:])
+
+
+async def weighted_share(heavy_requests: int) -> Dict[int, int]:
+    """Counts slots each of two flooding users got in the first half of the flood."""
+    pool = make_pool(True, 2 * heavy_requests, {PREMIUM_USER_ID: 3.0})
+    served: Dict[int, int] = {HEAVY_USER_ID: 0, PREMIUM_USER_ID: 0}
+    order: List[int] = []
+
+    async def counted(user_id: int):
+        await request(pool, user_id)
+        order.append(user_id)
+
+    await asyncio.gather(
+        *(
+            counted(user_id)
+            for _ in range(heavy_requests)
+            for user_id in (HEAVY_USER_ID, PREMIUM_USER_ID)
+        )
+    )
+    for user_id in order[:heavy_requests]:
+        served[user_id] += 1
+    return served
+
+
+def main():
+    heavy_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(
+        f"{heavy_requests} heavy requests, {LIGHT_USERS} light users, {SLOTS} slots,"
+        f" {SERVICE_SECONDS * 1000:.0f} ms per request\n"
+    )
+    print(f"{'queue':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for name, fair_queueing in (("fifo", False), ("fair", True)):
+        latencies = asyncio.run(flood(fair_queueing, heavy_requests))
+        print(
+            f"{name:>6} {statistics.median(latencies) * 1000:>8.0f}"
+            f" {percentile(latencies, 0.95) * 1000:>8.0f}"
+            f" {max(latencies) * 1000:>8.0f}"
+        )
+
+    served = asyncio.run(weighted_share(heavy_requests // 2))
+    total = sum(served.values())
+    print(
+        f"\nTwo flooding users, weights 1 and 3: first {total} slots went"
+        f" {served[HEAVY_USER_ID]} / {served[PREMIUM_USER_ID]}"
+        f" ({served[PREMIUM_USER_ID] / total:.0%} to the weight 3 user)"
+    )
+
+
+if __name__ == "__main__":
+    main()
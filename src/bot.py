@@ -1,12 +1,14 @@
 import asyncio
 import logging
+import signal
+import sys
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
-from aiogram.fsm.storage.mongo import MongoStorage
+from aiogram.fsm.storage.base import BaseStorage
 
 from src.config import config
-from src.db import close_db, connect_db
+from src.db import backend, close_db, connect_db
 from src.handlers import (
     audio_router,
     common_router,
@@ -17,7 +19,19 @@ from src.handlers import (
     settings_router,
     text_router,
 )
-from src.middlewares import LanguageMiddleware
+from src.middlewares import (
+    AdmissionMiddleware,
+    DeadlineMiddleware,
+    DebounceMiddleware,
+    HistoryLoaderMiddleware,
+    InFlightTaskMiddleware,
+    LanguageMiddleware,
+    UserContextLoaderMiddleware,
+    UserSerializationMiddleware,
+)
+from src.services.bulkhead import bulkheads
+from src.supervisor import ShardingMiddleware, Supervisor
+from src.webhook import WebhookServer
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,11 +43,27 @@ logger = logging.getLogger(__name__)
 async def on_startup(dispatcher: Dispatcher, bot: Bot):
     """Actions when the bot starts up."""
     if not await connect_db():
-        logger.critical("Cannot connect to MongoDB. Some bot features may not work.")
+        logger.critical(
+            f"Cannot open {backend.name} storage. Some bot features may not work."
+        )
     else:
         logger.info("DB succesfully connected.")
-    await bot.delete_webhook(drop_pending_updates=True)
-    logger.info("Webhook deleted. Bot started.")
+    await setup_webhook(dispatcher, bot)
+
+
+async def setup_webhook(dispatcher: Dispatcher, bot: Bot):
+    """Sets the webhook in webhook mode, deletes it for polling."""
+    if config.bot.run_mode == "webhook":
+        url = config.bot.webhook_url.rstrip("/") + config.bot.webhook_path
+        await bot.set_webhook(
+            url,
+            secret_token=config.bot.webhook_secret,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+        )
+        logger.info(f"Webhook set to {url}. Bot started.")
+    else:
+        await bot.delete_webhook(drop_pending_updates=True)
+        logger.info("Webhook deleted. Bot started.")
 
 
 async def on_shutdown(dispatcher: Dispatcher):
@@ -41,30 +71,11 @@ async def on_shutdown(dispatcher: Dispatcher):
     logger.info("Bot stopping...")
     await close_db()
     await dispatcher.storage.close()
+    bulkheads.shutdown()
     logger.info("FSM Storage closed. Bot stopped.")
 
 
-async def main():
-    if not config:
-        logger.critical("Bot can't start. No config found.")
-        return
-
-    bot = Bot(token=config.bot.token, default=DefaultBotProperties(parse_mode="HTML"))
-
-    try:
-        storage = MongoStorage.from_url(url=config.mongo.uri)
-        logger.info("Using MongoStorage for FSM (DB from URI)")
-    except Exception as e:
-        logger.critical(f"Cannot initialize MongoStorage from URI: {e}", exc_info=True)
-        return
-
-    dp = Dispatcher(storage=storage)
-
-    dp.startup.register(on_startup)
-    dp.shutdown.register(on_shutdown)
-    dp.update.outer_middleware(LanguageMiddleware())
-    logger.info("LanguageMiddleware() registered.")
-
+def include_routers(dp: Dispatcher):
     logger.info("Connecting routers...")
     dp.include_router(common_router)
     dp.include_router(settings_router)
@@ -76,13 +87,137 @@ async def main():
     dp.include_router(text_router)
     logger.info("Routers connected.")
 
+
+def create_dispatcher(storage: BaseStorage) -> Dispatcher:
+    """Dispatcher handling updates: middlewares and all routers."""
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(UserContextLoaderMiddleware())
+    logger.info("UserContextLoaderMiddleware() registered.")
+    dp.update.outer_middleware(LanguageMiddleware())
+    logger.info("LanguageMiddleware() registered.")
+    text_router.message.middleware(DebounceMiddleware())
+    logger.info("DebounceMiddleware() registered.")
+    ai_routers = (
+        text_router,
+        audio_router,
+        document_router,
+        image_router,
+        image_generation_router,
+    )
+    deadline = DeadlineMiddleware(config.bot.update_deadline_seconds)
+    for router in ai_routers:
+        router.message.middleware(deadline)
+    text_router.callback_query.middleware(deadline)
+    logger.info("DeadlineMiddleware() registered.")
+    inflight = InFlightTaskMiddleware(config.bot.cancel_superseded_requests)
+    for router in ai_routers:
+        router.message.middleware(inflight)
+    text_router.callback_query.middleware(inflight)
+    logger.info("InFlightTaskMiddleware() registered.")
+    serialization = UserSerializationMiddleware(config.bot.user_queue_max_depth)
+    for router in (text_router, audio_router, document_router):
+        router.message.middleware(serialization)
+    text_router.callback_query.middleware(serialization)
+    logger.info("UserSerializationMiddleware() registered.")
+    history_loader = HistoryLoaderMiddleware()
+    for router in (text_router, audio_router, document_router):
+        router.message.middleware(history_loader)
+    text_router.callback_query.middleware(history_loader)
+    logger.info("HistoryLoaderMiddleware() registered.")
+    admission = AdmissionMiddleware()
+    for router in ai_routers:
+        router.message.middleware(admission)
+    text_router.callback_query.middleware(admission)
+    logger.info("AdmissionMiddleware() registered.")
+    include_routers(dp)
+    return dp
+
+
+def create_supervisor_dispatcher() -> Dispatcher:
+    """
+    Dispatcher of the supervisor process: only forwards updates to workers.
+    Routers are included to resolve used update types, but never reached.
+    """
+    supervisor = Supervisor(
+        config.bot.worker_processes, [sys.executable, "-m", "src.worker"]
+    )
+    dp = Dispatcher()
+    dp.update.outer_middleware(ShardingMiddleware(supervisor))
+    include_routers(dp)
+    dp.startup.register(supervisor.start)
+    dp.startup.register(setup_webhook)
+    dp.shutdown.register(supervisor.stop)
+    return dp
+
+
+async def main():
+    if not config:
+        logger.critical("Bot can't start. No config found.")
+        return
+
+    bot = Bot(token=config.bot.token, default=DefaultBotProperties(parse_mode="HTML"))
+
+    supervised = config.bot.worker_processes > 1
+    if supervised:
+        dp = create_supervisor_dispatcher()
+        logger.info(
+            f"Supervisor mode: updates are handled by {config.bot.worker_processes} workers."
+        )
+    else:
+        try:
+            storage = backend.create_fsm_storage()
+            logger.info(f"Using {backend.name} storage for user data and FSM")
+        except Exception as e:
+            logger.critical(
+                f"Cannot initialize {backend.name} FSM storage: {e}", exc_info=True
+            )
+            return
+        dp = create_dispatcher(storage)
+        dp.startup.register(on_startup)
+        dp.shutdown.register(on_shutdown)
+
+    if config.bot.run_mode == "webhook":
+        await run_webhook(dp, bot)
+        return
+
     logger.info("Polling started...")
     try:
-        await dp.start_polling(bot)
+        # The supervisor forwards updates one by one to keep their order per user.
+        await dp.start_polling(bot, handle_as_tasks=not supervised)
     except Exception as e:
         logger.critical(f"Critical error while polling: {e}", exc_info=True)
 
 
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Serves updates through the webhook server until SIGINT/SIGTERM."""
+    server = WebhookServer(
+        dp,
+        bot,
+        path=config.bot.webhook_path,
+        secret_token=config.bot.webhook_secret,
+        host=config.bot.server_host,
+        port=config.bot.server_port,
+        max_pending=config.bot.webhook_max_pending_updates,
+        # The supervisor forwards updates one by one to keep their order per user.
+        handle_as_tasks=config.bot.worker_processes <= 1,
+    )
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    try:
+        await server.start()
+        await stop_event.wait()
+    except Exception as e:
+        logger.critical(f"Critical error in webhook mode: {e}", exc_info=True)
+    finally:
+        await server.stop()
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+
+
 if __name__ == "__main__":
     try:
         asyncio.run(main())
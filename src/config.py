@@ -1,10 +1,15 @@
 import os
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import Dict, List, Optional
 
 from dotenv import load_dotenv
 
-AVAILABLE_TEXT_MODELS = ["gemini-2.5-flash-preview-04-17", "gemini-2.5-pro-exp-03-25"]
+AUTO_TEXT_MODEL = "auto"
+AVAILABLE_TEXT_MODELS = [
+    "gemini-2.5-flash-preview-04-17",
+    "gemini-2.5-pro-exp-03-25",
+    AUTO_TEXT_MODEL,
+]
 DEFAULT_TEXT_MODEL = "gemini-2.5-flash-preview-04-17"
 DEFAULT_GEMINI_TEMPERATURE = 1
 DEFAULT_GEMINI_MAX_TOKENS = 1024
@@ -20,15 +25,185 @@ ALLOWED_MAX_TOKENS: Dict[str, int] = {
     "long": 2048,
     "very_long": 8192,
 }
+# Thinking budget (in tokens) of Gemini 2.5 models for every speed mode.
+ALLOWED_SPEED_MODES: Dict[str, int] = {
+    "fast": 0,
+    "balanced": 1024,
+    "deep": 8192,
+}
+DEFAULT_SPEED_MODE = "balanced"
+# Window (seconds after the last message) in which rapid text messages of a user
+# are merged into one prompt, for every debounce mode. "off" answers each one.
+ALLOWED_DEBOUNCE_MODES: Dict[str, float] = {
+    "off": 0.0,
+    "short": 1.0,
+    "medium": 1.5,
+    "long": 3.0,
+}
+DEFAULT_DEBOUNCE_MODE = "off"
+# A merged batch is sent right away once it has this many messages.
+DEBOUNCE_MAX_MESSAGES = 10
+# Models that can't turn thinking off accept budgets starting from this minimum.
+MIN_THINKING_BUDGETS: Dict[str, int] = {"gemini-2.5-pro-exp-03-25": 128}
 TEMPERATURE_NAMES: Dict[float, str] = {v: k for k, v in ALLOWED_TEMPERATURES.items()}
 MAX_TOKENS_NAMES: Dict[int, str] = {v: k for k, v in ALLOWED_MAX_TOKENS.items()}
 VISION_MODEL = "gemini-2.5-flash-preview-04-17"
 DEFAULT_IMAGE_GEN_MODEL_ID = "stabilityai/stable-diffusion-3-medium-diffusers"
 
+# Client-side Gemini quota: requests and tokens per minute for every model.
+GEMINI_MODEL_LIMITS: Dict[str, Dict[str, int]] = {
+    "gemini-2.5-flash-preview-04-17": {"rpm": 10, "tpm": 250000},
+    "gemini-2.5-pro-exp-03-25": {"rpm": 5, "tpm": 250000},
+}
+DEFAULT_MODEL_LIMITS: Dict[str, int] = {"rpm": 10, "tpm": 250000}
+DEFAULT_QUOTA_MAX_QUEUE_SIZE = 50
+DEFAULT_QUOTA_MAX_WAIT_SECONDS = 30.0
+
+# Automatic retries and circuit breaker around Gemini calls.
+DEFAULT_RETRY_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BASE_DELAY_SECONDS = 0.5
+DEFAULT_RETRY_MAX_DELAY_SECONDS = 4.0
+DEFAULT_RETRY_BUDGET_SECONDS = 20.0
+DEFAULT_CIRCUIT_FAILURE_THRESHOLD = 5
+DEFAULT_CIRCUIT_RECOVERY_SECONDS = 30.0
+
+# Models to try, in order, when the selected one is rate-limited or unavailable.
+MODEL_FALLBACKS: Dict[str, List[str]] = {
+    "gemini-2.5-pro-exp-03-25": ["gemini-2.5-flash-preview-04-17"],
+}
+DEFAULT_MODEL_COOLDOWN_SECONDS = 60.0
+
+# "auto" model: every request is scored by complexity, hard ones go to the strong model.
+AUTO_ROUTE_FAST_MODEL = "gemini-2.5-flash-preview-04-17"
+AUTO_ROUTE_STRONG_MODEL = "gemini-2.5-pro-exp-03-25"
+AUTO_ROUTE_LONG_PROMPT_CHARS = 2000
+AUTO_ROUTE_VERY_LONG_PROMPT_CHARS = 8000
+AUTO_ROUTE_DEEP_HISTORY_MESSAGES = 20
+AUTO_ROUTE_SCORE_THRESHOLD = 2
+
+# Hedged text requests: duplicate a slow request after a latency percentile.
+DEFAULT_HEDGE_PERCENTILE = 0.95
+DEFAULT_HEDGE_MAX_FRACTION = 0.1
+DEFAULT_HEDGE_MIN_DELAY_SECONDS = 1.0
+DEFAULT_HEDGE_INITIAL_DELAY_SECONDS = 5.0
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+
+# How updates are received: long polling or a webhook on the built-in HTTP server,
+# which also serves /healthz and /metrics.
+RUN_MODES = ("polling", "webhook")
+DEFAULT_RUN_MODE = "polling"
+DEFAULT_WEBHOOK_PATH = "/webhook"
+DEFAULT_SERVER_HOST = "0.0.0.0"
+DEFAULT_SERVER_PORT = 8080
+DEFAULT_WEBHOOK_MAX_PENDING_UPDATES = 1000
+# Number of worker processes running the handlers. With more than one, the main
+# process only receives updates and shards them to workers by user_id, and every
+# worker gets its share of the Gemini quotas, admission and bulkhead limits.
+DEFAULT_WORKER_PROCESSES = 1
+# Max updates of one user running or waiting in history handlers; more are rejected.
+DEFAULT_USER_QUEUE_MAX_DEPTH = 3
+# Whether a new text or voice message cancels the user's unfinished one.
+DEFAULT_CANCEL_SUPERSEDED_REQUESTS = False
+# Time budget of one AI request from dispatch to answer, shared by all its stages
+# (queues, download, parsing, model calls); the reserve is kept for the timeout notice.
+DEFAULT_UPDATE_DEADLINE_SECONDS = 240.0
+DEFAULT_DEADLINE_RESERVE_SECONDS = 5.0
+# Kinds of expensive work, isolated from each other by admission control and bulkheads.
+MODALITIES = ("text", "vision", "audio", "document", "image_generation")
+# Admission control of expensive handlers: max concurrent requests of every
+# modality, the rest wait in a bounded queue and see their position.
+DEFAULT_ADMISSION_LIMITS: Dict[str, int] = {
+    "text": 32,
+    "vision": 8,
+    "audio": 8,
+    "document": 4,
+    "image_generation": 2,
+}
+DEFAULT_ADMISSION_MAX_QUEUE_SIZE = 50
+DEFAULT_ADMISSION_MAX_WAIT_SECONDS = 120.0
+# Waiting requests are ordered by per-user virtual time (start-time fair queuing),
+# so one user's flood can't delay other users. Users get weight 1 unless
+# ADMISSION_USER_WEIGHTS ("user_id:weight,...") gives them a larger share.
+DEFAULT_ADMISSION_FAIR_QUEUEING = True
+DEFAULT_ADMISSION_USER_WEIGHT = 1.0
+# Bulkheads around the calls of every modality: max concurrent calls, own thread
+# pool for blocking work and a timeout of one call, so a stalled image model
+# can't take threads or slots of text chat.
+DEFAULT_BULKHEAD_MAX_CONCURRENT: Dict[str, int] = {
+    "text": 32,
+    "vision": 8,
+    "audio": 8,
+    "document": 4,
+    "image_generation": 2,
+}
+DEFAULT_BULKHEAD_WORKERS: Dict[str, int] = {
+    "text": 2,
+    "vision": 2,
+    "audio": 4,
+    "document": 4,
+    "image_generation": 2,
+}
+DEFAULT_BULKHEAD_TIMEOUT_SECONDS: Dict[str, float] = {
+    "text": 120.0,
+    "vision": 90.0,
+    "audio": 120.0,
+    "document": 60.0,
+    "image_generation": 90.0,
+}
+
+# Storage of user data and FSM: MongoDB, process memory or a local SQLite file.
+STORAGE_BACKENDS = ("mongo", "memory", "sqlite")
+DEFAULT_STORAGE_BACKEND = "mongo"
+DEFAULT_SQLITE_PATH = "bot.sqlite3"
+# In-process cache over the MongoDB FSM storage.
+FSM_DB_NAME = "aiogram_fsm"
+FSM_COLLECTION_NAME = "states_and_data"
+DEFAULT_FSM_CACHE_MAX_ENTRIES = 10000
+DEFAULT_FSM_CACHE_TTL_SECONDS = 300.0
+# In-process cache of chat histories, bounded by their total size.
+DEFAULT_HISTORY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# One document per history message, only the latest window is read per request.
+MESSAGES_COLLECTION_NAME = "messages"
+DEFAULT_HISTORY_WINDOW_MESSAGES = 100
+# Named conversations of a user, listed by /chats.
+CONVERSATIONS_COLLECTION_NAME = "conversations"
+CONVERSATION_TITLE_MAX_CHARS = 40
+CONVERSATIONS_LIST_LIMIT = 10
+# Optional write-behind of user settings in bulk_write batches. History appends
+# don't use it: they reserve message seq numbers and are fenced by the lease.
+DEFAULT_WRITE_BEHIND_BATCH_SIZE = 100
+DEFAULT_WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = 1.0
+DEFAULT_WRITE_BEHIND_MAX_PENDING = 1000
+# Retention of history: expiring inactive users, trimming long conversations.
+MESSAGES_ARCHIVE_COLLECTION_NAME = "messages_archive"
+RETENTION_MODES = ("archive", "delete")
+DEFAULT_RETENTION_MODE = "archive"
+DEFAULT_RETENTION_INACTIVE_DAYS = 90
+DEFAULT_RETENTION_MAX_MESSAGES = 1000
+DEFAULT_RETENTION_ARCHIVE_TTL_DAYS = 365
+DEFAULT_RETENTION_SWEEP_INTERVAL_SECONDS = 3600.0
+DEFAULT_RETENTION_BATCH_SIZE = 100
+DEFAULT_RETENTION_BATCH_PAUSE_SECONDS = 1.0
+# Per-user leases that keep bot instances from handling one user's history at once.
+LEASES_COLLECTION_NAME = "user_leases"
+DEFAULT_LEASE_TTL_SECONDS = 30.0
+DEFAULT_LEASE_ACQUIRE_TIMEOUT_SECONDS = 60.0
+
 
 @dataclass
 class BotConfig:
     token: str
+    run_mode: str = DEFAULT_RUN_MODE
+    webhook_url: Optional[str] = None
+    webhook_path: str = DEFAULT_WEBHOOK_PATH
+    webhook_secret: Optional[str] = None
+    webhook_max_pending_updates: int = DEFAULT_WEBHOOK_MAX_PENDING_UPDATES
+    server_host: str = DEFAULT_SERVER_HOST
+    server_port: int = DEFAULT_SERVER_PORT
+    worker_processes: int = DEFAULT_WORKER_PROCESSES
+    user_queue_max_depth: int = DEFAULT_USER_QUEUE_MAX_DEPTH
+    cancel_superseded_requests: bool = DEFAULT_CANCEL_SUPERSEDED_REQUESTS
+    update_deadline_seconds: float = DEFAULT_UPDATE_DEADLINE_SECONDS
 
 
 @dataclass
@@ -42,12 +217,87 @@ class GeminiConfig:
     allowed_max_tokens: Dict[str, int] = field(
         default_factory=lambda: ALLOWED_MAX_TOKENS
     )
+    default_speed_mode: str = DEFAULT_SPEED_MODE
+    allowed_speed_modes: Dict[str, int] = field(
+        default_factory=lambda: ALLOWED_SPEED_MODES
+    )
+    model_limits: Dict[str, Dict[str, int]] = field(
+        default_factory=lambda: GEMINI_MODEL_LIMITS
+    )
+    quota_max_queue_size: int = DEFAULT_QUOTA_MAX_QUEUE_SIZE
+    quota_max_wait_seconds: float = DEFAULT_QUOTA_MAX_WAIT_SECONDS
+    retry_max_attempts: int = DEFAULT_RETRY_MAX_ATTEMPTS
+    retry_base_delay_seconds: float = DEFAULT_RETRY_BASE_DELAY_SECONDS
+    retry_max_delay_seconds: float = DEFAULT_RETRY_MAX_DELAY_SECONDS
+    retry_budget_seconds: float = DEFAULT_RETRY_BUDGET_SECONDS
+    circuit_failure_threshold: int = DEFAULT_CIRCUIT_FAILURE_THRESHOLD
+    circuit_recovery_seconds: float = DEFAULT_CIRCUIT_RECOVERY_SECONDS
+    model_fallbacks: Dict[str, List[str]] = field(
+        default_factory=lambda: MODEL_FALLBACKS
+    )
+    model_cooldown_seconds: float = DEFAULT_MODEL_COOLDOWN_SECONDS
+    hedging_enabled: bool = False
+    hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE
+    hedge_max_fraction: float = DEFAULT_HEDGE_MAX_FRACTION
+    hedge_min_delay_seconds: float = DEFAULT_HEDGE_MIN_DELAY_SECONDS
 
 
 @dataclass
 class MongoConfig:
     uri: str
     db_name: str
+    fsm_cache_max_entries: int = DEFAULT_FSM_CACHE_MAX_ENTRIES
+    fsm_cache_ttl_seconds: float = DEFAULT_FSM_CACHE_TTL_SECONDS
+    fsm_cache_invalidation: bool = False
+    history_cache_max_bytes: int = DEFAULT_HISTORY_CACHE_MAX_BYTES
+    history_window_messages: int = DEFAULT_HISTORY_WINDOW_MESSAGES
+    write_behind_enabled: bool = False
+    write_behind_batch_size: int = DEFAULT_WRITE_BEHIND_BATCH_SIZE
+    write_behind_flush_interval_seconds: float = (
+        DEFAULT_WRITE_BEHIND_FLUSH_INTERVAL_SECONDS
+    )
+    write_behind_max_pending: int = DEFAULT_WRITE_BEHIND_MAX_PENDING
+    retention_enabled: bool = False
+    retention_mode: str = DEFAULT_RETENTION_MODE
+    retention_inactive_days: int = DEFAULT_RETENTION_INACTIVE_DAYS
+    retention_max_messages: int = DEFAULT_RETENTION_MAX_MESSAGES
+    retention_archive_ttl_days: int = DEFAULT_RETENTION_ARCHIVE_TTL_DAYS
+    retention_sweep_interval_seconds: float = DEFAULT_RETENTION_SWEEP_INTERVAL_SECONDS
+    retention_batch_size: int = DEFAULT_RETENTION_BATCH_SIZE
+    retention_batch_pause_seconds: float = DEFAULT_RETENTION_BATCH_PAUSE_SECONDS
+    lease_enabled: bool = False
+    lease_ttl_seconds: float = DEFAULT_LEASE_TTL_SECONDS
+    lease_acquire_timeout_seconds: float = DEFAULT_LEASE_ACQUIRE_TIMEOUT_SECONDS
+
+
+@dataclass
+class StorageConfig:
+    backend: str = DEFAULT_STORAGE_BACKEND
+    sqlite_path: str = DEFAULT_SQLITE_PATH
+
+
+@dataclass
+class AdmissionConfig:
+    limits: Dict[str, int] = field(
+        default_factory=lambda: dict(DEFAULT_ADMISSION_LIMITS)
+    )
+    max_queue_size: int = DEFAULT_ADMISSION_MAX_QUEUE_SIZE
+    max_wait_seconds: float = DEFAULT_ADMISSION_MAX_WAIT_SECONDS
+    fair_queueing: bool = DEFAULT_ADMISSION_FAIR_QUEUEING
+    user_weights: Dict[int, float] = field(default_factory=dict)
+
+
+@dataclass
+class BulkheadConfig:
+    max_concurrent: Dict[str, int] = field(
+        default_factory=lambda: dict(DEFAULT_BULKHEAD_MAX_CONCURRENT)
+    )
+    workers: Dict[str, int] = field(
+        default_factory=lambda: dict(DEFAULT_BULKHEAD_WORKERS)
+    )
+    timeout_seconds: Dict[str, float] = field(
+        default_factory=lambda: dict(DEFAULT_BULKHEAD_TIMEOUT_SECONDS)
+    )
 
 
 @dataclass
@@ -62,6 +312,68 @@ class Config:
     gemini: GeminiConfig
     mongo: MongoConfig
     hf: HuggingFaceConfig
+    storage: StorageConfig
+    admission: AdmissionConfig
+    bulkheads: BulkheadConfig
+
+
+def _get_int_env(name: str, default: int) -> int:
+    """Reads integer environment variable, falls back to default if it's invalid."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Warning: {name}={value!r} is not an integer, using {default}.")
+        return default
+
+
+def _get_float_env(name: str, default: float) -> float:
+    """Reads float environment variable, falls back to default if it's invalid."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Warning: {name}={value!r} is not a number, using {default}.")
+        return default
+
+
+def _get_bool_env(name: str, default: bool) -> bool:
+    """Reads boolean environment variable (1/true/yes/on)."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _get_weights_env(name: str) -> Dict[int, float]:
+    """Reads "user_id:weight,..." environment variable, skips invalid entries."""
+    weights: Dict[int, float] = {}
+    for item in os.getenv(name, "").split(","):
+        if not item.strip():
+            continue
+        user_id, _, weight = item.partition(":")
+        try:
+            parsed_id, parsed_weight = int(user_id), float(weight)
+        except ValueError:
+            print(f"Warning: {name} entry {item!r} is not user_id:weight, skipping.")
+            continue
+        if parsed_weight <= 0:
+            print(f"Warning: {name} weight of {parsed_id} must be positive, skipping.")
+            continue
+        weights[parsed_id] = parsed_weight
+    return weights
+
+
+def per_process_limit(limit: int, processes: int) -> int:
+    """
+    Share of a rate or concurrency limit for one of `processes` worker processes,
+    which enforce their limits independently. At least 1, so every process can work.
+    """
+    return max(1, limit // max(1, processes))
 
 
 def load_config(path: str | None = ".env") -> Config | None:
@@ -78,15 +390,198 @@ def load_config(path: str | None = ".env") -> Config | None:
     hf_token = os.getenv("HUGGINGFACE_API_TOKEN")
     img_model = os.getenv("IMAGE_GEN_MODEL_ID", DEFAULT_IMAGE_GEN_MODEL_ID)
 
-    if not all([bot_token, gemini_key, mongo_uri, mongo_db, hf_token]):
+    run_mode = os.getenv("RUN_MODE", DEFAULT_RUN_MODE).lower()
+    webhook_url = os.getenv("WEBHOOK_URL")
+    webhook_secret = os.getenv("WEBHOOK_SECRET")
+    if run_mode not in RUN_MODES:
+        print(f"Error: RUN_MODE must be one of {', '.join(RUN_MODES)}.")
+        return None
+    if run_mode == "webhook" and not all([webhook_url, webhook_secret]):
+        print("Error: WEBHOOK_URL and WEBHOOK_SECRET are required in webhook mode.")
+        return None
+
+    storage_backend = os.getenv("STORAGE_BACKEND", DEFAULT_STORAGE_BACKEND).lower()
+    if storage_backend not in STORAGE_BACKENDS:
+        print(f"Error: STORAGE_BACKEND must be one of {', '.join(STORAGE_BACKENDS)}.")
+        return None
+    # MongoDB settings are only required when it's the storage.
+    if storage_backend != "mongo":
+        mongo_uri, mongo_db = mongo_uri or "", mongo_db or ""
+    elif not all([mongo_uri, mongo_db]):
+        print("Error: MONGO_URI and MONGO_DB_NAME are required for MongoDB storage.")
+        return None
+
+    if not all([bot_token, gemini_key, hf_token]):
         print("Error: Not all required environment variables are set.")
         return None
 
     return Config(
-        bot=BotConfig(token=bot_token),
-        gemini=GeminiConfig(api_key=gemini_key),
-        mongo=MongoConfig(uri=mongo_uri, db_name=mongo_db),
+        bot=BotConfig(
+            token=bot_token,
+            run_mode=run_mode,
+            webhook_url=webhook_url,
+            webhook_path=os.getenv("WEBHOOK_PATH", DEFAULT_WEBHOOK_PATH),
+            webhook_secret=webhook_secret,
+            webhook_max_pending_updates=_get_int_env(
+                "WEBHOOK_MAX_PENDING_UPDATES", DEFAULT_WEBHOOK_MAX_PENDING_UPDATES
+            ),
+            server_host=os.getenv("SERVER_HOST", DEFAULT_SERVER_HOST),
+            server_port=_get_int_env("PORT", DEFAULT_SERVER_PORT),
+            worker_processes=_get_int_env("WORKER_PROCESSES", DEFAULT_WORKER_PROCESSES),
+            user_queue_max_depth=_get_int_env(
+                "USER_QUEUE_MAX_DEPTH", DEFAULT_USER_QUEUE_MAX_DEPTH
+            ),
+            cancel_superseded_requests=_get_bool_env(
+                "CANCEL_SUPERSEDED_REQUESTS", DEFAULT_CANCEL_SUPERSEDED_REQUESTS
+            ),
+            update_deadline_seconds=_get_float_env(
+                "UPDATE_DEADLINE_SECONDS", DEFAULT_UPDATE_DEADLINE_SECONDS
+            ),
+        ),
+        gemini=GeminiConfig(
+            api_key=gemini_key,
+            quota_max_queue_size=_get_int_env(
+                "GEMINI_QUOTA_MAX_QUEUE_SIZE", DEFAULT_QUOTA_MAX_QUEUE_SIZE
+            ),
+            quota_max_wait_seconds=_get_float_env(
+                "GEMINI_QUOTA_MAX_WAIT_SECONDS", DEFAULT_QUOTA_MAX_WAIT_SECONDS
+            ),
+            retry_max_attempts=_get_int_env(
+                "GEMINI_RETRY_MAX_ATTEMPTS", DEFAULT_RETRY_MAX_ATTEMPTS
+            ),
+            retry_base_delay_seconds=_get_float_env(
+                "GEMINI_RETRY_BASE_DELAY_SECONDS", DEFAULT_RETRY_BASE_DELAY_SECONDS
+            ),
+            retry_max_delay_seconds=_get_float_env(
+                "GEMINI_RETRY_MAX_DELAY_SECONDS", DEFAULT_RETRY_MAX_DELAY_SECONDS
+            ),
+            retry_budget_seconds=_get_float_env(
+                "GEMINI_RETRY_BUDGET_SECONDS", DEFAULT_RETRY_BUDGET_SECONDS
+            ),
+            circuit_failure_threshold=_get_int_env(
+                "GEMINI_CIRCUIT_FAILURE_THRESHOLD", DEFAULT_CIRCUIT_FAILURE_THRESHOLD
+            ),
+            circuit_recovery_seconds=_get_float_env(
+                "GEMINI_CIRCUIT_RECOVERY_SECONDS", DEFAULT_CIRCUIT_RECOVERY_SECONDS
+            ),
+            model_cooldown_seconds=_get_float_env(
+                "GEMINI_MODEL_COOLDOWN_SECONDS", DEFAULT_MODEL_COOLDOWN_SECONDS
+            ),
+            hedging_enabled=_get_bool_env("GEMINI_HEDGING_ENABLED", False),
+            hedge_percentile=_get_float_env(
+                "GEMINI_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE
+            ),
+            hedge_max_fraction=_get_float_env(
+                "GEMINI_HEDGE_MAX_FRACTION", DEFAULT_HEDGE_MAX_FRACTION
+            ),
+            hedge_min_delay_seconds=_get_float_env(
+                "GEMINI_HEDGE_MIN_DELAY_SECONDS", DEFAULT_HEDGE_MIN_DELAY_SECONDS
+            ),
+        ),
+        mongo=MongoConfig(
+            uri=mongo_uri,
+            db_name=mongo_db,
+            fsm_cache_max_entries=_get_int_env(
+                "FSM_CACHE_MAX_ENTRIES", DEFAULT_FSM_CACHE_MAX_ENTRIES
+            ),
+            fsm_cache_ttl_seconds=_get_float_env(
+                "FSM_CACHE_TTL_SECONDS", DEFAULT_FSM_CACHE_TTL_SECONDS
+            ),
+            fsm_cache_invalidation=_get_bool_env("FSM_CACHE_INVALIDATION", False),
+            history_cache_max_bytes=_get_int_env(
+                "HISTORY_CACHE_MAX_BYTES", DEFAULT_HISTORY_CACHE_MAX_BYTES
+            ),
+            history_window_messages=_get_int_env(
+                "HISTORY_WINDOW_MESSAGES", DEFAULT_HISTORY_WINDOW_MESSAGES
+            ),
+            write_behind_enabled=_get_bool_env("WRITE_BEHIND_ENABLED", False),
+            write_behind_batch_size=_get_int_env(
+                "WRITE_BEHIND_BATCH_SIZE", DEFAULT_WRITE_BEHIND_BATCH_SIZE
+            ),
+            write_behind_flush_interval_seconds=_get_float_env(
+                "WRITE_BEHIND_FLUSH_INTERVAL_SECONDS",
+                DEFAULT_WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+            ),
+            write_behind_max_pending=_get_int_env(
+                "WRITE_BEHIND_MAX_PENDING", DEFAULT_WRITE_BEHIND_MAX_PENDING
+            ),
+            retention_enabled=_get_bool_env("RETENTION_ENABLED", False),
+            retention_mode=os.getenv("RETENTION_MODE", DEFAULT_RETENTION_MODE).lower(),
+            retention_inactive_days=_get_int_env(
+                "RETENTION_INACTIVE_DAYS", DEFAULT_RETENTION_INACTIVE_DAYS
+            ),
+            retention_max_messages=_get_int_env(
+                "RETENTION_MAX_MESSAGES", DEFAULT_RETENTION_MAX_MESSAGES
+            ),
+            retention_archive_ttl_days=_get_int_env(
+                "RETENTION_ARCHIVE_TTL_DAYS", DEFAULT_RETENTION_ARCHIVE_TTL_DAYS
+            ),
+            retention_sweep_interval_seconds=_get_float_env(
+                "RETENTION_SWEEP_INTERVAL_SECONDS",
+                DEFAULT_RETENTION_SWEEP_INTERVAL_SECONDS,
+            ),
+            retention_batch_size=_get_int_env(
+                "RETENTION_BATCH_SIZE", DEFAULT_RETENTION_BATCH_SIZE
+            ),
+            retention_batch_pause_seconds=_get_float_env(
+                "RETENTION_BATCH_PAUSE_SECONDS", DEFAULT_RETENTION_BATCH_PAUSE_SECONDS
+            ),
+            lease_enabled=_get_bool_env("USER_LEASE_ENABLED", False),
+            lease_ttl_seconds=_get_float_env(
+                "USER_LEASE_TTL_SECONDS", DEFAULT_LEASE_TTL_SECONDS
+            ),
+            lease_acquire_timeout_seconds=_get_float_env(
+                "USER_LEASE_ACQUIRE_TIMEOUT_SECONDS",
+                DEFAULT_LEASE_ACQUIRE_TIMEOUT_SECONDS,
+            ),
+        ),
         hf=HuggingFaceConfig(api_token=hf_token, image_gen_model_id=img_model),
+        storage=StorageConfig(
+            backend=storage_backend,
+            sqlite_path=os.getenv("SQLITE_PATH", DEFAULT_SQLITE_PATH),
+        ),
+        admission=AdmissionConfig(
+            limits={
+                modality: _get_int_env(
+                    f"ADMISSION_LIMIT_{modality.upper()}",
+                    DEFAULT_ADMISSION_LIMITS[modality],
+                )
+                for modality in MODALITIES
+            },
+            max_queue_size=_get_int_env(
+                "ADMISSION_MAX_QUEUE_SIZE", DEFAULT_ADMISSION_MAX_QUEUE_SIZE
+            ),
+            max_wait_seconds=_get_float_env(
+                "ADMISSION_MAX_WAIT_SECONDS", DEFAULT_ADMISSION_MAX_WAIT_SECONDS
+            ),
+            fair_queueing=_get_bool_env(
+                "ADMISSION_FAIR_QUEUEING", DEFAULT_ADMISSION_FAIR_QUEUEING
+            ),
+            user_weights=_get_weights_env("ADMISSION_USER_WEIGHTS"),
+        ),
+        bulkheads=BulkheadConfig(
+            max_concurrent={
+                modality: _get_int_env(
+                    f"BULKHEAD_{modality.upper()}_MAX_CONCURRENT",
+                    DEFAULT_BULKHEAD_MAX_CONCURRENT[modality],
+                )
+                for modality in MODALITIES
+            },
+            workers={
+                modality: _get_int_env(
+                    f"BULKHEAD_{modality.upper()}_WORKERS",
+                    DEFAULT_BULKHEAD_WORKERS[modality],
+                )
+                for modality in MODALITIES
+            },
+            timeout_seconds={
+                modality: _get_float_env(
+                    f"BULKHEAD_{modality.upper()}_TIMEOUT_SECONDS",
+                    DEFAULT_BULKHEAD_TIMEOUT_SECONDS[modality],
+                )
+                for modality in MODALITIES
+            },
+        ),
     )
 
 
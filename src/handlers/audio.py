@@ -14,15 +14,17 @@ from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from fluent.runtime import FluentLocalization
 
-from src.db import get_history, save_history
 from src.handlers.text import (
     LAST_FAILED_PROMPT_KEY,
     RETRY_CALLBACK_DATA,
     _process_text_input,
     create_gemini_message,
+    make_queue_position_notifier,
     send_typing_periodically,
+    show_request_cancelled,
 )
 from src.keyboards import get_main_keyboard
+from src.middlewares import UserContext
 from src.services import gemini
 from src.services.errors import (
     DATABASE_SAVE_ERROR,
@@ -37,14 +39,21 @@ from src.services.gemini import (
     GEMINI_QUOTA_ERROR,
     GEMINI_TRANSCRIPTION_ERROR,
 )
+from src.utils import deadline
 
 logger = logging.getLogger(__name__)
 audio_router = Router()
 
 
-@audio_router.message(F.voice, StateFilter(None))
+@audio_router.message(
+    F.voice, StateFilter(None), flags={"admission": "audio", "history": True}
+)
 async def handle_voice_message(
-    message: types.Message, state: FSMContext, bot: Bot, localizer: FluentLocalization
+    message: types.Message,
+    state: FSMContext,
+    bot: Bot,
+    localizer: FluentLocalization,
+    user_context: UserContext,
 ):
     user_id = message.from_user.id
     chat_id = message.chat.id
@@ -68,7 +77,8 @@ async def handle_voice_message(
         audio_bytes_io = io.BytesIO()
         try:
             logger.debug(f"Downloading voice {voice.file_id}...")
-            await bot.download(file=voice, destination=audio_bytes_io)
+            async with deadline.stage("download"):
+                await bot.download(file=voice, destination=audio_bytes_io)
             audio_bytes = audio_bytes_io.getvalue()
             logger.debug(
                 f"Audio downloaded ({len(audio_bytes)} bytes), mime_type={voice.mime_type}"
@@ -82,12 +92,21 @@ async def handle_voice_message(
                 f"Failed to download voice {voice.file_id} for user {user_id}: {e}",
                 exc_info=True,
             )
-            final_response, _ = format_error_message(TELEGRAM_DOWNLOAD_ERROR, localizer)
+            final_response, _ = format_error_message(
+                deadline.DEADLINE_EXCEEDED
+                if isinstance(e, deadline.DeadlineExceeded)
+                else TELEGRAM_DOWNLOAD_ERROR,
+                localizer,
+            )
             download_error = True
 
         if not download_error:
             transcribed_text, transcription_error_code = await gemini.transcribe_audio(
-                audio_bytes=audio_bytes, mime_type=voice.mime_type
+                audio_bytes=audio_bytes,
+                mime_type=voice.mime_type,
+                on_queue_position=make_queue_position_notifier(
+                    status_message, localizer, processing_voice_text
+                ),
             )
 
             if transcribed_text and not transcription_error_code:
@@ -116,8 +135,11 @@ async def handle_voice_message(
                 ) = await _process_text_input(
                     user_text=transcribed_text,
                     user_id=user_id,
-                    state=state,
+                    user_context=user_context,
                     localizer=localizer,
+                    on_queue_position=make_queue_position_notifier(
+                        status_message, localizer, processing_text_status
+                    ),
                 )
                 save_needed = (
                     updated_history is not None and failed_prompt_for_retry is None
@@ -136,7 +158,7 @@ async def handle_voice_message(
                     user_msg_hist = create_gemini_message(
                         "user", "[Audio message - transcription blocked]"
                     )
-                    current_history = await get_history(user_id)
+                    current_history = await user_context.get_history()
                     updated_history = current_history + [user_msg_hist]
                     save_needed = True
                 else:
@@ -148,6 +170,9 @@ async def handle_voice_message(
                 final_response, _ = format_error_message(None, localizer)
                 save_needed = False
 
+    except asyncio.CancelledError:
+        await show_request_cancelled(status_message, localizer)
+        raise
     except Exception as e:
         logger.exception(
             f"Critical error in voice handler logic for user_id={user_id}: {e}"
@@ -260,7 +285,7 @@ async def handle_voice_message(
 
     if save_needed and updated_history is not None and message_sent_or_edited:
         try:
-            await save_history(user_id, updated_history)
+            await user_context.save_history(updated_history)
         except Exception as db_save_e:
             logger.exception(
                 f"Audio Handler: Failed to save history for user_id={user_id} to DB: {db_save_e}"
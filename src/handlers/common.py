@@ -1,14 +1,15 @@
+import html
 import logging
 
 from aiogram import F, Router, types
 from aiogram.exceptions import TelegramBadRequest, TelegramNetworkError
-from aiogram.filters import Command, CommandStart
+from aiogram.filters import Command, CommandObject, CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from fluent.runtime import FluentLocalization
 
-from src.config import AVAILABLE_TEXT_MODELS, DEFAULT_TEXT_MODEL
-from src.db import clear_history
+from src.config import AUTO_TEXT_MODEL, AVAILABLE_TEXT_MODELS, DEFAULT_TEXT_MODEL
+from src.db import list_conversations, start_conversation, switch_conversation
 from src.keyboards import get_main_keyboard
 from src.localization import LOCALIZATIONS, SUPPORTED_LOCALES, get_localizer
 from src.services.errors import (
@@ -16,6 +17,7 @@ from src.services.errors import (
     TELEGRAM_MESSAGE_DELETED_ERROR,
     format_error_message,
 )
+from src.utils.task_registry import inflight_tasks
 
 common_router = Router()
 logger = logging.getLogger(__name__)
@@ -127,6 +129,12 @@ async def handle_language_selection(
         )
 
 
+def _model_label(model_name: str, localizer: FluentLocalization) -> str:
+    if model_name == AUTO_TEXT_MODEL:
+        return localizer.format_value("model-auto")
+    return model_name
+
+
 @common_router.message(Command("model"))
 async def handle_model_command(
     message: types.Message, state: FSMContext, localizer: FluentLocalization
@@ -137,7 +145,8 @@ async def handle_model_command(
     current_model = user_data.get("selected_model", DEFAULT_TEXT_MODEL)
 
     for model_name in AVAILABLE_TEXT_MODELS:
-        button_text = f"✅ {model_name}" if model_name == current_model else model_name
+        label = _model_label(model_name, localizer)
+        button_text = f"✅ {label}" if model_name == current_model else label
         builder.button(text=button_text, callback_data=f"model_select:{model_name}")
     builder.adjust(1)
 
@@ -171,7 +180,8 @@ async def handle_model_selection(
     current_localizer = get_localizer(lang_code)
 
     response_text = current_localizer.format_value(
-        "model-chosen", args={"model_name": selected_model}
+        "model-chosen",
+        args={"model_name": _model_label(selected_model, current_localizer)},
     )
 
     try:
@@ -209,21 +219,24 @@ async def handle_model_selection(
 
 
 @common_router.message(Command("newchat"))
-async def handle_new_chat(message: types.Message, localizer: FluentLocalization):
-    """/newchat command handler. Clears the user's chat history."""
+async def handle_new_chat(
+    message: types.Message, command: CommandObject, localizer: FluentLocalization
+):
+    """/newchat [title] command handler. Starts a new conversation, keeping the current one."""
     user_id = message.from_user.id
     keyboard = get_main_keyboard(localizer)
-    success = await clear_history(user_id)
+    # An unfinished answer would be saved into the new conversation.
+    await inflight_tasks.cancel(user_id, "newchat")
 
     try:
-        success = await clear_history(user_id)
+        success = await start_conversation(user_id, command.args)
         if success:
             response_text = localizer.format_value("newchat-started")
             logger.info(f"User {user_id} started a new chat.")
         else:
             response_text, _ = format_error_message(DATABASE_SAVE_ERROR, localizer)
             logger.error(
-                f"Failed to clear history (clear_history returned False) for user {user_id}."
+                f"Failed to start conversation (start_conversation returned False) for user {user_id}."
             )
 
     except Exception as e:
@@ -236,6 +249,66 @@ async def handle_new_chat(message: types.Message, localizer: FluentLocalization)
         logger.error(f"NewChat: Could not send response to user {user_id}: {e_send}")
 
 
+def _conversation_label(conversation: dict, localizer: FluentLocalization) -> str:
+    return conversation.get("title") or localizer.format_value(
+        "chats-untitled", args={"id": conversation["conversation_id"]}
+    )
+
+
+@common_router.message(Command("chats"))
+async def handle_chats_command(message: types.Message, localizer: FluentLocalization):
+    """/chats command handler. Lists the user's conversations to switch between them."""
+    conversations, current_id = await list_conversations(message.from_user.id)
+    if not conversations:
+        await message.answer(localizer.format_value("chats-empty"))
+        return
+
+    builder = InlineKeyboardBuilder()
+    for conversation in conversations:
+        conversation_id = conversation["conversation_id"]
+        label = _conversation_label(conversation, localizer)
+        button_text = f"✅ {label}" if conversation_id == current_id else label
+        builder.button(text=button_text, callback_data=f"chat_select:{conversation_id}")
+    builder.adjust(1)
+
+    prompt_text = localizer.format_value("chats-prompt")
+    await message.answer(prompt_text, reply_markup=builder.as_markup())
+
+
+@common_router.callback_query(F.data.startswith("chat_select:"))
+async def handle_chat_selection(
+    callback_query: types.CallbackQuery, localizer: FluentLocalization
+):
+    """Switches the user to the selected conversation."""
+    if not isinstance(callback_query, types.CallbackQuery) or not callback_query.data:
+        return
+    await callback_query.answer()
+
+    try:
+        conversation_id = int(callback_query.data.split(":")[1])
+    except (IndexError, ValueError):
+        return
+
+    user_id = callback_query.from_user.id
+    await inflight_tasks.cancel(user_id, "chat_switch")
+    conversation = await switch_conversation(user_id, conversation_id)
+    if conversation is None:
+        response_text = localizer.format_value("chats-not-found")
+    else:
+        response_text = localizer.format_value(
+            "chats-switched",
+            # Titles come from users and the message is sent as HTML.
+            args={"title": html.escape(_conversation_label(conversation, localizer))},
+        )
+
+    try:
+        await callback_query.bot.send_message(chat_id=user_id, text=response_text)
+        if callback_query.message:
+            await callback_query.message.delete()
+    except (TelegramNetworkError, TelegramBadRequest) as e_send:
+        logger.error(f"Chat select: Error answering user {user_id}: {e_send}")
+
+
 @common_router.message(Command("help"))
 async def handle_help(message: types.Message, localizer: FluentLocalization):
     """/help command handler."""
@@ -14,14 +14,16 @@ from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from fluent.runtime import FluentLocalization
 
-from src.db import save_history
 from src.handlers.text import (
     LAST_FAILED_PROMPT_KEY,
     RETRY_CALLBACK_DATA,
     _process_text_input,
+    make_queue_position_notifier,
     send_typing_periodically,
+    show_request_cancelled,
 )
 from src.keyboards import get_main_keyboard
+from src.middlewares import UserContext
 from src.services import document_parser as doc_parser
 from src.services.errors import (
     DATABASE_SAVE_ERROR,
@@ -31,6 +33,7 @@ from src.services.errors import (
     TELEGRAM_NETWORK_ERROR,
     format_error_message,
 )
+from src.utils import deadline
 
 logger = logging.getLogger(__name__)
 document_router = Router()
@@ -39,9 +42,17 @@ MAX_DOCUMENT_SIZE_BYTES = 20 * 1024 * 1024
 MAX_PROMPT_LENGTH_FOR_AI = 30000
 
 
-@document_router.message(F.document, StateFilter(None))
+@document_router.message(
+    F.document,
+    StateFilter(None),
+    flags={"admission": "document", "history": True},
+)
 async def handle_document_message(
-    message: types.Message, state: FSMContext, bot: Bot, localizer: FluentLocalization
+    message: types.Message,
+    state: FSMContext,
+    bot: Bot,
+    localizer: FluentLocalization,
+    user_context: UserContext,
 ):
     user_id = message.from_user.id
     chat_id = message.chat.id
@@ -91,7 +102,8 @@ async def handle_document_message(
 
     try:
         logger.debug(f"Starting download of document {document.file_id}...")
-        await bot.download(file=document, destination=doc_bytes_io)
+        async with deadline.stage("download"):
+            await bot.download(file=document, destination=doc_bytes_io)
         doc_bytes = doc_bytes_io.getvalue()
         if not doc_bytes:
             raise ValueError("Downloaded document bytes are empty.")
@@ -155,8 +167,12 @@ async def handle_document_message(
             ) = await _process_text_input(
                 user_text=user_input_for_gemini,
                 user_id=user_id,
-                state=state,
+                user_context=user_context,
                 localizer=localizer,
+                on_queue_position=make_queue_position_notifier(
+                    status_message, localizer, processing_text_status
+                ),
+                has_document=True,
             )
             save_needed = (
                 updated_history is not None and failed_prompt_for_retry is None
@@ -176,8 +192,18 @@ async def handle_document_message(
             )
             save_needed = False
 
+    except asyncio.CancelledError:
+        await show_request_cancelled(status_message, localizer)
+        raise
     except (TelegramNetworkError, TelegramBadRequest, ValueError, Exception) as e:
-        if isinstance(e, (TelegramNetworkError, TelegramBadRequest)):
+        if isinstance(e, deadline.DeadlineExceeded):
+            logger.warning(
+                f"Document {document.file_id} for user {user_id} ran out of time: {e}"
+            )
+            final_response, _ = format_error_message(
+                deadline.DEADLINE_EXCEEDED, localizer
+            )
+        elif isinstance(e, (TelegramNetworkError, TelegramBadRequest)):
             logger.error(
                 f"Failed to download document {document.file_id} for user {user_id}: {e}",
                 exc_info=True,
@@ -308,7 +334,7 @@ async def handle_document_message(
 
     if save_needed and updated_history is not None and message_sent_or_edited:
         try:
-            await save_history(user_id, updated_history)
+            await user_context.save_history(updated_history)
         except Exception as db_save_e:
             logger.exception(
                 f"Document Handler: Failed to save history for user_id={user_id} to DB: {db_save_e}"
@@ -13,7 +13,11 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State
 from fluent.runtime import FluentLocalization
 
-from src.handlers.text import send_typing_periodically
+from src.handlers.text import (
+    make_queue_position_notifier,
+    send_typing_periodically,
+    show_request_cancelled,
+)
 from src.keyboards import get_main_keyboard
 from src.services import gemini
 from src.services.errors import (
@@ -21,6 +25,7 @@ from src.services.errors import (
     TELEGRAM_NETWORK_ERROR,
     format_error_message,
 )
+from src.utils import deadline
 from src.utils.text_processing import strip_markdown
 
 logger = logging.getLogger(__name__)
@@ -28,7 +33,7 @@ logger = logging.getLogger(__name__)
 image_router = Router()
 
 
-@image_router.message(F.photo, State(None))
+@image_router.message(F.photo, State(None), flags={"admission": "vision"})
 async def handle_image_message(
     message: types.Message, bot: Bot, state: FSMContext, localizer: FluentLocalization
 ):
@@ -38,13 +43,15 @@ async def handle_image_message(
 
     photo = message.photo[-1]
 
-    thinking_message = await message.answer(localizer.format_value("analyzing"))
+    analyzing_text = localizer.format_value("analyzing")
+    thinking_message = await message.answer(analyzing_text)
     image_bytes: Optional[bytes] = None
     image_bytes_io = io.BytesIO()
     download_error = False
 
     try:
-        await bot.download(file=photo, destination=image_bytes_io)
+        async with deadline.stage("download"):
+            await bot.download(file=photo, destination=image_bytes_io)
         image_bytes = image_bytes_io.getvalue()
         if not image_bytes:
             raise ValueError("Downloaded image bytes are empty.")
@@ -56,7 +63,12 @@ async def handle_image_message(
             f"Failed to download photo {photo.file_id} for user_id={user_id}: {e}",
             exc_info=True,
         )
-        error_msg, _ = format_error_message(TELEGRAM_DOWNLOAD_ERROR, localizer)
+        error_msg, _ = format_error_message(
+            deadline.DEADLINE_EXCEEDED
+            if isinstance(e, deadline.DeadlineExceeded)
+            else TELEGRAM_DOWNLOAD_ERROR,
+            localizer,
+        )
         try:
             await thinking_message.edit_text(error_msg)
         except Exception:
@@ -81,7 +93,13 @@ async def handle_image_message(
     final_response = localizer.format_value("error-general")
 
     try:
-        response_text, error_code = await gemini.analyze_image(image_bytes, prompt)
+        response_text, error_code = await gemini.analyze_image(
+            image_bytes,
+            prompt,
+            on_queue_position=make_queue_position_notifier(
+                thinking_message, localizer, analyzing_text
+            ),
+        )
 
         if response_text and not error_code:
             final_response = strip_markdown(response_text)
@@ -99,6 +117,9 @@ async def handle_image_message(
             )
             final_response, _ = format_error_message(None, localizer)
 
+    except asyncio.CancelledError:
+        await show_request_cancelled(thinking_message, localizer)
+        raise
     except Exception as e:
         logger.exception(
             f"Unexpected error during image analysis call for user {user_id}: {e}"
@@ -13,6 +13,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from fluent.runtime import FluentLocalization
 
+from src.handlers.text import show_request_cancelled
 from src.keyboards import get_main_keyboard
 from src.services import image_generation as img_gen_service
 from src.services.errors import (
@@ -54,7 +55,9 @@ async def handle_generate_image_command(
     await state.set_state(ImageGenState.waiting_for_prompt)
 
 
-@image_generation_router.message(ImageGenState.waiting_for_prompt, F.text)
+@image_generation_router.message(
+    ImageGenState.waiting_for_prompt, F.text, flags={"admission": "image_generation"}
+)
 async def handle_image_prompt(
     message: types.Message, state: FSMContext, bot: Bot, localizer: FluentLocalization
 ):
@@ -162,6 +165,9 @@ async def handle_image_prompt(
                     f"Image Gen: Could not edit status message with error: {e_edit_err}"
                 )
 
+    except asyncio.CancelledError:
+        await show_request_cancelled(status_message, localizer)
+        raise
     except Exception as e:
         logger.exception(
             f"Image Gen: Unexpected error in handler for user {user_id}: {e}"
@@ -17,6 +17,7 @@ from src.services.errors import (
     TELEGRAM_NETWORK_ERROR,
     format_error_message,
 )
+from src.utils.task_registry import inflight_tasks
 
 logger = logging.getLogger(__name__)
 privacy_router = Router()
@@ -69,6 +70,7 @@ async def handle_delete_confirmation_callback(
     if action == "yes":
         logger.warning(f"User user_id={user_id} confirmed data deletion.")
         deleted = False
+        await inflight_tasks.cancel(user_id, "delete_my_data")
         try:
             deleted = await delete_user_data(user_id)
         except Exception as e_db:
@@ -13,14 +13,17 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from fluent.runtime import FluentLocalization
 
 from src.config import (
+    ALLOWED_DEBOUNCE_MODES,
     ALLOWED_MAX_TOKENS,
+    ALLOWED_SPEED_MODES,
     ALLOWED_TEMPERATURES,
     DEFAULT_GEMINI_MAX_TOKENS,
     DEFAULT_GEMINI_TEMPERATURE,
     MAX_TOKENS_NAMES,
     TEMPERATURE_NAMES,
 )
-from src.db import get_user_settings, save_user_setting
+from src.db import save_user_setting
+from src.middlewares import UserContext
 from src.services.errors import (
     DATABASE_SAVE_ERROR,
     TELEGRAM_MESSAGE_DELETED_ERROR,
@@ -33,13 +36,17 @@ settings_router = Router()
 
 
 async def build_settings_keyboard(
-    user_id: int, localizer: FluentLocalization
+    user_context: UserContext, localizer: FluentLocalization
 ) -> InlineKeyboardBuilder:
     """Build inline keyboard for settings."""
-    current_temp, current_max_tokens = await get_user_settings(user_id)
+    await user_context.load_settings()
+    current_temp = user_context.temperature
+    current_max_tokens = user_context.max_tokens
+    current_speed_mode = user_context.speed_mode
 
     temp_name = TEMPERATURE_NAMES.get(current_temp, f"{current_temp:.1f}")
     tokens_name = MAX_TOKENS_NAMES.get(current_max_tokens, str(current_max_tokens))
+    speed_name = localizer.format_value(f"settings-option-speed-{current_speed_mode}")
 
     builder = InlineKeyboardBuilder()
     temp_button_text = localizer.format_value(
@@ -50,6 +57,17 @@ async def build_settings_keyboard(
         "settings-button-max-tokens", args={"value": tokens_name}
     )
     builder.button(text=tokens_button_text, callback_data="settings:set:max_tokens")
+    speed_button_text = localizer.format_value(
+        "settings-button-speed", args={"value": speed_name}
+    )
+    builder.button(text=speed_button_text, callback_data="settings:set:speed")
+    debounce_name = localizer.format_value(
+        f"settings-option-debounce-{user_context.debounce_mode}"
+    )
+    debounce_button_text = localizer.format_value(
+        "settings-button-debounce", args={"value": debounce_name}
+    )
+    builder.button(text=debounce_button_text, callback_data="settings:set:debounce")
     builder.adjust(1)
     return builder
 
@@ -92,12 +110,12 @@ async def _edit_settings_message(
 
 @settings_router.message(Command("settings"))
 async def handle_settings_command(
-    message: types.Message, localizer: FluentLocalization
+    message: types.Message, localizer: FluentLocalization, user_context: UserContext
 ):
     """Shows settings keyboard."""
     user_id = message.from_user.id
     try:
-        keyboard = await build_settings_keyboard(user_id, localizer)
+        keyboard = await build_settings_keyboard(user_context, localizer)
         settings_text = localizer.format_value("settings-current-prompt")
         await message.answer(
             settings_text, reply_markup=keyboard.as_markup(), parse_mode=None
@@ -112,14 +130,15 @@ async def handle_settings_command(
 
 @settings_router.callback_query(F.data == "settings:show")
 async def cq_show_settings(
-    callback: types.CallbackQuery, localizer: FluentLocalization
+    callback: types.CallbackQuery,
+    localizer: FluentLocalization,
+    user_context: UserContext,
 ):
     """Shows settings keyboard (after pressing 'back')."""
-    user_id = callback.from_user.id
     if not callback.message:
         return
 
-    keyboard = await build_settings_keyboard(user_id, localizer)
+    keyboard = await build_settings_keyboard(user_context, localizer)
     settings_text = localizer.format_value("settings-current-prompt")
     await _edit_settings_message(
         callback.message, settings_text, keyboard.as_markup(), localizer
@@ -132,7 +151,9 @@ async def cq_show_settings(
 
 @settings_router.callback_query(F.data.startswith("settings:set:"))
 async def cq_set_parameter(
-    callback: types.CallbackQuery, localizer: FluentLocalization
+    callback: types.CallbackQuery,
+    localizer: FluentLocalization,
+    user_context: UserContext,
 ):
     """Shows options for setting a parameter."""
     if not callback.message:
@@ -144,8 +165,10 @@ async def cq_set_parameter(
         await callback.answer("Error!", show_alert=True)
         return
 
-    user_id = callback.from_user.id
-    current_temp, current_max_tokens = await get_user_settings(user_id)
+    await user_context.load_settings()
+    current_temp = user_context.temperature
+    current_max_tokens = user_context.max_tokens
+    current_speed_mode = user_context.speed_mode
 
     builder = InlineKeyboardBuilder()
     prompt_text = ""
@@ -186,6 +209,25 @@ async def cq_set_parameter(
                 text=f"✅ {button_text}" if is_current else button_text,
                 callback_data=f"settings:value:max_tokens:{value}",
             )
+
+    elif parameter == "speed":
+        prompt_text = localizer.format_value("settings-prompt-speed")
+        for name in ALLOWED_SPEED_MODES:
+            is_current = current_speed_mode == name
+            button_text = localizer.format_value(f"settings-option-speed-{name}")
+            builder.button(
+                text=f"✅ {button_text}" if is_current else button_text,
+                callback_data=f"settings:value:speed:{name}",
+            )
+    elif parameter == "debounce":
+        prompt_text = localizer.format_value("settings-prompt-debounce")
+        for name in ALLOWED_DEBOUNCE_MODES:
+            is_current = user_context.debounce_mode == name
+            button_text = localizer.format_value(f"settings-option-debounce-{name}")
+            builder.button(
+                text=f"✅ {button_text}" if is_current else button_text,
+                callback_data=f"settings:value:debounce:{name}",
+            )
     else:
         logger.warning(f"Unknown parameter in 'settings:set:': {parameter}")
         await callback.answer("Unknown parameter!", show_alert=True)
@@ -205,7 +247,11 @@ async def cq_set_parameter(
 
 
 @settings_router.callback_query(F.data.startswith("settings:value:"))
-async def cq_save_value(callback: types.CallbackQuery, localizer: FluentLocalization):
+async def cq_save_value(
+    callback: types.CallbackQuery,
+    localizer: FluentLocalization,
+    user_context: UserContext,
+):
     """Saves selected value and returns to settings."""
     if not callback.message:
         return
@@ -221,7 +267,7 @@ async def cq_save_value(callback: types.CallbackQuery, localizer: FluentLocaliza
     user_id = callback.from_user.id
     setting_saved = False
     db_field_name = ""
-    final_value: Union[float, int, None] = None
+    final_value: Union[float, int, str, None] = None
     error_text = ""
 
     if parameter == "temperature":
@@ -255,6 +301,25 @@ async def cq_save_value(callback: types.CallbackQuery, localizer: FluentLocaliza
             )
             await callback.answer("Incorrect value!", show_alert=True)
             return
+
+    elif parameter == "speed":
+        db_field_name = "gemini_speed_mode"
+        if value_str not in ALLOWED_SPEED_MODES:
+            logger.warning(
+                f"Incorrect value for speed '{value_str}' from user_id={user_id}"
+            )
+            await callback.answer("Incorrect value!", show_alert=True)
+            return
+        final_value = value_str
+    elif parameter == "debounce":
+        db_field_name = "message_debounce"
+        if value_str not in ALLOWED_DEBOUNCE_MODES:
+            logger.warning(
+                f"Incorrect value for debounce '{value_str}' from user_id={user_id}"
+            )
+            await callback.answer("Incorrect value!", show_alert=True)
+            return
+        final_value = value_str
     else:
         logger.warning(f"Unknown parameter in 'settings:value:': {parameter}")
         await callback.answer("Unknown parameter!", show_alert=True)
@@ -275,7 +340,16 @@ async def cq_save_value(callback: types.CallbackQuery, localizer: FluentLocaliza
             error_text, _ = format_error_message(DATABASE_SAVE_ERROR, localizer)
 
     if setting_saved:
-        await cq_show_settings(callback, localizer)
+        await user_context.load_settings()
+        if parameter == "temperature":
+            user_context.temperature = final_value
+        elif parameter == "max_tokens":
+            user_context.max_tokens = final_value
+        elif parameter == "debounce":
+            user_context.debounce_mode = final_value
+        else:
+            user_context.speed_mode = final_value
+        await cq_show_settings(callback, localizer, user_context)
     else:
         final_error_text = error_text or localizer.format_value("error-settings-save")
         try:
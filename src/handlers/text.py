@@ -1,6 +1,7 @@
 import asyncio
 import logging
-from typing import Any, Dict, List, Optional, Tuple
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from aiogram import Bot, F, Router, types
 from aiogram.enums import ChatAction
@@ -14,9 +15,9 @@ from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from fluent.runtime import FluentLocalization
 
-from src.config import DEFAULT_TEXT_MODEL
-from src.db import get_history, get_user_settings, save_history
+from src.config import AUTO_TEXT_MODEL, DEFAULT_TEXT_MODEL
 from src.keyboards import get_main_keyboard
+from src.middlewares import UserContext
 from src.services import gemini
 from src.services.errors import (
     DATABASE_SAVE_ERROR,
@@ -33,6 +34,9 @@ from src.services.gemini import (
     GEMINI_SERVICE_UNAVAILABLE,
     GEMINI_UNKNOWN_API_ERROR,
 )
+from src.services.quota import estimate_tokens
+from src.services.routing import complexity_router
+from src.utils import deadline
 from src.utils.text_processing import strip_markdown
 
 logger = logging.getLogger(__name__)
@@ -62,32 +66,105 @@ async def send_typing_periodically(bot: Bot, chat_id: int):
         )
 
 
+async def show_request_cancelled(
+    status_message: Optional[types.Message], localizer: FluentLocalization
+):
+    """
+    Replaces the status message of a cancelled request: cancelled by the user's
+    later action, or because the update's time budget ran out.
+    """
+    if status_message is None:
+        return
+    current = deadline.current_deadline.get()
+    if current is not None and current.expired:
+        text, _ = format_error_message(deadline.DEADLINE_EXCEEDED, localizer)
+    else:
+        text = localizer.format_value("request-cancelled")
+    try:
+        await status_message.edit_text(text, reply_markup=None)
+    except Exception as e:
+        logger.debug(f"Could not show request cancellation: {e}")
+
+
+def make_queue_position_notifier(
+    status_message: types.Message, localizer: FluentLocalization, status_text: str
+) -> Callable[[int], Awaitable[None]]:
+    """
+    Creates callback that shows user's position in the Gemini quota queue in status message.
+    Position 0 means the request left the queue, so original status text is restored.
+    """
+
+    async def notify(position: int):
+        if position > 0:
+            text = localizer.format_value("queue-position", args={"position": position})
+        else:
+            text = status_text
+        try:
+            await status_message.edit_text(text)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.debug(f"Could not show queue position {position}: {e}")
+        except Exception as e:
+            logger.debug(f"Could not show queue position {position}: {e}")
+
+    return notify
+
+
 async def _process_text_input(
-    user_text: str, user_id: int, state: FSMContext, localizer: FluentLocalization
+    user_text: str,
+    user_id: int,
+    user_context: UserContext,
+    localizer: FluentLocalization,
+    on_queue_position: Optional[Callable[[int], Awaitable[None]]] = None,
+    has_document: bool = False,
 ) -> Tuple[str, Optional[List[Dict[str, Any]]], Optional[str]]:
     """
     Processes user text input: queries Gemini, processes the response.
+    With the "auto" model, the model is chosen for every request by its complexity.
     Returns: (response_text_to_user, updated_history_for_saving | None, original_query_text_for_retry | None)
     """
     updated_history = None
     failed_prompt_for_retry = None
 
     try:
-        current_history = await get_history(user_id)
-        user_temp, user_max_tokens = await get_user_settings(user_id)
-        user_data = await state.get_data()
-        selected_model = user_data.get("selected_model", DEFAULT_TEXT_MODEL)
+        current_history = await user_context.get_history()
+        await user_context.load_settings()
+        user_temp = user_context.temperature
+        user_max_tokens = user_context.max_tokens
+        user_speed_mode = user_context.speed_mode
+        selected_model = user_context.fsm_data.get("selected_model", DEFAULT_TEXT_MODEL)
+        route_decision = None
+        if selected_model == AUTO_TEXT_MODEL:
+            route_decision = complexity_router.route(
+                user_text, len(current_history), has_document
+            )
+            selected_model = route_decision.model_name
         logger.debug(
-            f"Processing text with: model={selected_model}, temp={user_temp}, tokens={user_max_tokens}"
+            f"Processing text with: model={selected_model}, temp={user_temp}, tokens={user_max_tokens}, speed={user_speed_mode}"
         )
 
+        started_at = time.monotonic()
         response_text, error_code = await gemini.generate_text_with_history(
             history=current_history,
             new_prompt=user_text,
             model_name=selected_model,
             temperature=user_temp,
             max_output_tokens=user_max_tokens,
+            on_queue_position=on_queue_position,
+            speed_mode=user_speed_mode,
         )
+        if route_decision:
+            history_texts = [
+                part.get("text", "")
+                for msg in current_history
+                for part in msg.get("parts", [])
+            ]
+            complexity_router.record_result(
+                route_decision,
+                time.monotonic() - started_at,
+                estimate_tokens(user_text, response_text or "", *history_texts),
+                error_code,
+            )
 
         if response_text and not error_code:
             final_response = strip_markdown(response_text)
@@ -125,9 +202,17 @@ async def _process_text_input(
         return final_response, None, None
 
 
-@text_router.message(F.text & ~F.text.startswith("/"), StateFilter(None))
+@text_router.message(
+    F.text & ~F.text.startswith("/"),
+    StateFilter(None),
+    flags={"admission": "text", "history": True},
+)
 async def handle_text_message(
-    message: types.Message, state: FSMContext, bot: Bot, localizer: FluentLocalization
+    message: types.Message,
+    state: FSMContext,
+    bot: Bot,
+    localizer: FluentLocalization,
+    user_context: UserContext,
 ):
     user_text = message.text
     user_id = message.from_user.id
@@ -148,9 +233,18 @@ async def handle_text_message(
 
     try:
         final_response, updated_history, failed_prompt = await _process_text_input(
-            user_text=user_text, user_id=user_id, state=state, localizer=localizer
+            user_text=user_text,
+            user_id=user_id,
+            user_context=user_context,
+            localizer=localizer,
+            on_queue_position=make_queue_position_notifier(
+                thinking_message, localizer, thinking_text
+            ),
         )
         save_needed = updated_history is not None and failed_prompt is None
+    except asyncio.CancelledError:
+        await show_request_cancelled(thinking_message, localizer)
+        raise
     except Exception as e:
         logger.exception(
             f"Critical error in handler logic for user_id={user_id} while processing text: {e}"
@@ -247,7 +341,7 @@ async def handle_text_message(
 
     if save_needed and updated_history is not None:
         try:
-            await save_history(user_id, updated_history)
+            await user_context.save_history(updated_history)
         except Exception as db_save_e:
             logger.exception(
                 f"Failed to save history for user_id={user_id} to DB: {db_save_e}"
@@ -259,18 +353,20 @@ async def handle_text_message(
         )
 
 
-@text_router.callback_query(F.data == RETRY_CALLBACK_DATA)
+@text_router.callback_query(
+    F.data == RETRY_CALLBACK_DATA, flags={"admission": "text", "history": True}
+)
 async def handle_retry_request(
     callback: types.CallbackQuery,
     state: FSMContext,
     bot: Bot,
     localizer: FluentLocalization,
+    user_context: UserContext,
 ):
     await callback.answer()
     user_id = callback.from_user.id
     chat_id = callback.message.chat.id if callback.message else user_id
-    user_data = await state.get_data()
-    original_prompt = user_data.get(LAST_FAILED_PROMPT_KEY)
+    original_prompt = user_context.fsm_data.get(LAST_FAILED_PROMPT_KEY)
 
     try:
         await callback.answer()
@@ -318,7 +414,17 @@ async def handle_retry_request(
 
     try:
         final_response, updated_history, failed_prompt = await _process_text_input(
-            user_text=original_prompt, user_id=user_id, state=state, localizer=localizer
+            user_text=original_prompt,
+            user_id=user_id,
+            user_context=user_context,
+            localizer=localizer,
+            on_queue_position=(
+                make_queue_position_notifier(
+                    status_message, localizer, retry_status_text
+                )
+                if status_message
+                else None
+            ),
         )
         if not failed_prompt and updated_history is not None:
             await state.update_data({LAST_FAILED_PROMPT_KEY: None})
@@ -326,6 +432,9 @@ async def handle_retry_request(
         else:
             save_needed = False
 
+    except asyncio.CancelledError:
+        await show_request_cancelled(status_message, localizer)
+        raise
     except Exception as e:
         logger.exception(
             f"Retry Handler: Critical error in handler logic for user_id={user_id}: {e}"
@@ -453,7 +562,7 @@ async def handle_retry_request(
 
     if save_needed and updated_history is not None and message_sent_or_edited:
         try:
-            await save_history(user_id, updated_history)
+            await user_context.save_history(updated_history)
         except Exception as db_save_e:
             logger.exception(
                 f"Retry Handler: Failed to save history for user_id={user_id} to DB: {db_save_e}"
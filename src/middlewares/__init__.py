@@ -1,3 +1,23 @@
+from .admission import AdmissionMiddleware
+from .deadline import DeadlineMiddleware
+from .debounce import DebounceMiddleware
+from .inflight import InFlightTaskMiddleware
 from .language import LanguageMiddleware
+from .serialization import UserSerializationMiddleware
+from .user_context import (
+    HistoryLoaderMiddleware,
+    UserContext,
+    UserContextLoaderMiddleware,
+)
 
-__all__ = ["LanguageMiddleware"]
\ No newline at end of file
+__all__ = [
+    "AdmissionMiddleware",
+    "DeadlineMiddleware",
+    "DebounceMiddleware",
+    "HistoryLoaderMiddleware",
+    "InFlightTaskMiddleware",
+    "LanguageMiddleware",
+    "UserContext",
+    "UserContextLoaderMiddleware",
+    "UserSerializationMiddleware",
+]
@@ -0,0 +1,103 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from fluent.runtime import FluentLocalization
+
+from src.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    admission_controller,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _QueueStatus:
+    """Status message with the queue position, shown only while the request waits."""
+
+    def __init__(self, chat_message: Message, localizer: FluentLocalization):
+        self.chat_message = chat_message
+        self.localizer = localizer
+        self.status_message: Optional[Message] = None
+
+    async def show_position(self, position: int):
+        if position == 0:
+            await self.delete()
+            return
+        text = self.localizer.format_value(
+            "queue-position", args={"position": position}
+        )
+        if self.status_message is None:
+            self.status_message = await self.chat_message.answer(text)
+        else:
+            await self.status_message.edit_text(text)
+
+    async def delete(self):
+        if self.status_message is None:
+            return
+        try:
+            await self.status_message.delete()
+        except Exception as e:
+            logger.debug(f"Cannot delete queue status message: {e}")
+        self.status_message = None
+
+
+class AdmissionMiddleware(BaseMiddleware):
+    """
+    Admission control for handlers flagged with `flags={"admission": <modality>}`.
+    A request waiting for a slot of its modality sees its position in the queue,
+    requests over the queue limit or wait time are answered with 'admission-rejected'.
+    Waiting requests are ordered fairly between users (see ModalityPool).
+    Register after UserSerializationMiddleware, so waiting updates of one user
+    don't hold slots.
+    """
+
+    def __init__(self, controller: AdmissionController = admission_controller):
+        self.controller = controller
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        modality = get_flag(data, "admission")
+        if modality is None:
+            return await handler(event, data)
+
+        localizer: FluentLocalization = data["localizer"]
+        chat_message = event.message if isinstance(event, CallbackQuery) else event
+        user = getattr(event, "from_user", None)
+        status = None
+        if isinstance(chat_message, Message):
+            status = _QueueStatus(chat_message, localizer)
+        try:
+            async with self.controller.admit(
+                modality,
+                user.id if user else None,
+                status.show_position if status else None,
+            ):
+                return await handler(event, data)
+        except AdmissionRejected as e:
+            logger.warning(f"Request rejected by admission control: {e}")
+            if status:
+                await status.delete()
+            await self._reject(event, chat_message, localizer)
+
+    async def _reject(
+        self,
+        event: TelegramObject,
+        chat_message: Optional[Message],
+        localizer: FluentLocalization,
+    ):
+        text = localizer.format_value("admission-rejected")
+        try:
+            if isinstance(event, CallbackQuery):
+                await event.answer(text, show_alert=True)
+            elif isinstance(chat_message, Message):
+                await chat_message.answer(text)
+        except Exception as e:
+            logger.warning(f"Cannot notify user about the rejected request: {e}")
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import TelegramObject
+
+from src.config import DEFAULT_DEADLINE_RESERVE_SECONDS
+from src.utils.deadline import Deadline, current_deadline
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineMiddleware(BaseMiddleware):
+    """
+    Gives handlers flagged with `flags={"admission": <modality>}` a time budget.
+    Stages (queues, download, parsing, model calls) take their timeouts from what's
+    left of it and end with DEADLINE_EXCEEDED when it runs out. If the handler is
+    still running when the whole budget is spent, it's cancelled.
+    Time spent in every stage is logged. Register before all other AI middlewares,
+    so their waits count too.
+    """
+
+    def __init__(
+        self,
+        budget_seconds: float,
+        reserve_seconds: float = DEFAULT_DEADLINE_RESERVE_SECONDS,
+    ):
+        self.budget_seconds = budget_seconds
+        self.reserve_seconds = reserve_seconds
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        kind = get_flag(data, "admission")
+        if kind is None:
+            return await handler(event, data)
+
+        deadline = Deadline(self.budget_seconds, self.reserve_seconds)
+        token = current_deadline.set(deadline)
+        timeout = asyncio.timeout(self.budget_seconds)
+        try:
+            async with timeout:
+                return await handler(event, data)
+        except asyncio.TimeoutError:
+            if not timeout.expired():
+                raise
+            metrics.inc("deadline_exceeded_total", stage="handler")
+            logger.warning(
+                f"{kind.capitalize()} request cancelled, budget exhausted: {deadline.summary()}"
+            )
+        finally:
+            current_deadline.reset(token)
+            metrics.observe("request_duration_seconds", deadline.elapsed, kind=kind)
+            logger.info(f"{kind.capitalize()} request took {deadline.summary()}")
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message, TelegramObject
+
+from src.config import ALLOWED_DEBOUNCE_MODES, DEBOUNCE_MAX_MESSAGES
+from src.middlewares.user_context import UserContext
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Batch:
+    deadline: float
+    texts: List[str] = field(default_factory=list)
+    # Set when a message is added, so the waiting update re-checks the deadline.
+    updated: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class DebounceMiddleware(BaseMiddleware):
+    """
+    Merges text messages a user sends in a row into one prompt.
+    With the user's debounce mode on, the first message waits until the window
+    has passed since the latest one; messages arriving meanwhile are appended to
+    it and not handled on their own. So the handler runs once, with one
+    placeholder and one Gemini call, for the joined text.
+    Must be registered before UserSerializationMiddleware, so waiting for the
+    window doesn't hold the user's lock.
+    """
+
+    def __init__(self, max_messages: int = DEBOUNCE_MAX_MESSAGES):
+        self.max_messages = max_messages
+        self._batches: Dict[int, _Batch] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user_context: UserContext | None = data.get("user_context")
+        if not isinstance(event, Message) or not event.text or user_context is None:
+            return await handler(event, data)
+        await user_context.load_settings()
+        window = ALLOWED_DEBOUNCE_MODES.get(user_context.debounce_mode, 0.0)
+        if window <= 0:
+            return await handler(event, data)
+
+        user_id = user_context.user_id
+        batch = self._batches.get(user_id)
+        if batch is not None:
+            batch.texts.append(event.text)
+            batch.deadline = (
+                time.monotonic()
+                if len(batch.texts) >= self.max_messages
+                else time.monotonic() + window
+            )
+            batch.updated.set()
+            metrics.inc("debounce_merged_messages_total")
+            logger.debug(f"Message of user {user_id} merged into the pending batch.")
+            return None
+
+        batch = self._batches[user_id] = _Batch(
+            deadline=time.monotonic() + window, texts=[event.text]
+        )
+        try:
+            while (delay := batch.deadline - time.monotonic()) > 0:
+                batch.updated.clear()
+                try:
+                    await asyncio.wait_for(batch.updated.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            del self._batches[user_id]
+
+        metrics.observe("debounce_batch_messages", len(batch.texts))
+        if len(batch.texts) > 1:
+            logger.info(f"Merged {len(batch.texts)} messages of user {user_id}.")
+            event = event.model_copy(update={"text": "\n".join(batch.texts)})
+        return await handler(event, data)
@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import Message, TelegramObject
+
+from src.utils.task_registry import TaskRegistry, inflight_tasks
+
+logger = logging.getLogger(__name__)
+
+# Kinds of requests which are a new turn of the conversation: a newer message
+# of these kinds makes an unfinished one stale. Photos and documents are often
+# sent in batches, so they never supersede each other.
+SUPERSEDABLE_KINDS = ("text", "audio")
+
+
+class InFlightTaskMiddleware(BaseMiddleware):
+    """
+    Runs handlers flagged with `flags={"admission": <modality>}` in their own task,
+    tracked in the registry, so /newchat, /delete_my_data or (with `supersede`)
+    a newer message of the user can cancel them. A cancelled handler ends quietly,
+    the update itself isn't failed.
+    Register before UserSerializationMiddleware, so queued updates are tracked too.
+    """
+
+    def __init__(self, supersede: bool, registry: TaskRegistry = inflight_tasks):
+        self.supersede = supersede
+        self.registry = registry
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        kind = get_flag(data, "admission")
+        user = getattr(event, "from_user", None)
+        if kind is None or user is None:
+            return await handler(event, data)
+
+        if self.supersede and isinstance(event, Message) and kind in SUPERSEDABLE_KINDS:
+            await self.registry.cancel(user.id, "superseded", SUPERSEDABLE_KINDS)
+
+        task = asyncio.create_task(handler(event, data))
+        with self.registry.track(user.id, kind, task):
+            try:
+                return await task
+            except asyncio.CancelledError:
+                if not task.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                logger.info(f"{kind.capitalize()} request of user {user.id} cancelled.")
+                return None
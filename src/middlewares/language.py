@@ -14,6 +14,7 @@ class LanguageMiddleware(BaseMiddleware):
     """
     Middleware for localization.
     Adds 'localizer', 'lang_code' to event data.
+    Reads language from FSM data of 'user_context', if it's already loaded.
     """
 
     async def __call__(
@@ -30,8 +31,12 @@ class LanguageMiddleware(BaseMiddleware):
             logger.debug("LanguageMiddleware: No user found, using default locale.")
         else:
             state: FSMContext = data.get("state")
-            if state:
-                user_data = await state.get_data()
+            user_context = data.get("user_context")
+            if user_context or state:
+                if user_context:
+                    user_data = user_context.fsm_data
+                else:
+                    user_data = await state.get_data()
                 user_lang_code = user_data.get("language_code")
                 logger.debug(
                     f"LanguageMiddleware: User ID {user.id}, language from state: {user_lang_code}"
@@ -0,0 +1,87 @@
+import logging
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, Message, TelegramObject, User
+from fluent.runtime import FluentLocalization
+
+from src.middlewares.user_context import UserContext
+from src.storage.cached import CachedStorage
+from src.storage.history_cache import history_cache
+from src.storage.lease import LeaseUnavailable, user_lease
+from src.utils.keyed_lock import KeyedLock, KeyedLockFull
+
+logger = logging.getLogger(__name__)
+
+
+class UserSerializationMiddleware(BaseMiddleware):
+    """
+    Runs handlers of one user one at a time, in arrival order, while other users
+    are handled concurrently. Meant for the handlers that read and append chat
+    history, so two quick messages don't both answer from the same history.
+    A user may have at most `max_depth` updates running or waiting, further ones
+    are answered with 'user-queue-full'. If the update had to wait, its
+    UserContext is reloaded, as the previous updates changed it.
+    With user leases enabled the update also holds the user's MongoDB lease,
+    so other bot instances don't handle the user meanwhile; if one of them
+    held it last, cached data of the user is dropped and UserContext reloaded.
+    One instance must be shared by all the routers it guards.
+    """
+
+    def __init__(self, max_depth: int):
+        self.locks = KeyedLock("user_lock", max_depth)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        user_context: UserContext | None = data.get("user_context")
+        state: FSMContext | None = data.get("state")
+        try:
+            async with AsyncExitStack() as stack:
+                owner_changed = False
+                if user_lease.active:
+                    lease = await stack.enter_async_context(user_lease.hold(user.id))
+                    owner_changed = lease.owner_changed
+                waited = await stack.enter_async_context(self.locks.acquire(user.id))
+                if owner_changed:
+                    self._invalidate_caches(user.id, state)
+                if (waited or owner_changed) and user_context and state:
+                    await user_context.reload(state)
+                    logger.debug(f"Context of user {user.id} reloaded.")
+                return await handler(event, data)
+        except KeyedLockFull:
+            logger.warning(
+                f"User {user.id} has {self.locks.max_depth} updates in progress, "
+                f"rejecting {type(event).__name__}."
+            )
+            await self._reject(event, data.get("localizer"))
+        except LeaseUnavailable:
+            logger.warning(
+                f"Lease of user {user.id} is held by another instance, "
+                f"rejecting {type(event).__name__}."
+            )
+            await self._reject(event, data.get("localizer"))
+
+    def _invalidate_caches(self, user_id: int, state: FSMContext | None):
+        history_cache.invalidate(user_id)
+        if state is not None and isinstance(state.storage, CachedStorage):
+            state.storage.invalidate(state.key)
+
+    async def _reject(self, event: TelegramObject, localizer: FluentLocalization):
+        text = localizer.format_value("user-queue-full")
+        try:
+            if isinstance(event, Message):
+                await event.answer(text)
+            elif isinstance(event, CallbackQuery):
+                await event.answer(text, show_alert=True)
+        except Exception as e:
+            logger.warning(f"Cannot notify user about the full queue: {e}")
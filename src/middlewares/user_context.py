@@ -0,0 +1,122 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.fsm.context import FSMContext
+from aiogram.types import TelegramObject, User
+
+from src.config import (
+    DEFAULT_DEBOUNCE_MODE,
+    DEFAULT_GEMINI_MAX_TOKENS,
+    DEFAULT_GEMINI_TEMPERATURE,
+    DEFAULT_SPEED_MODE,
+)
+from src.db import append_history, get_history, get_user_data
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryNotSaved(Exception):
+    """Storage didn't save new history messages, e.g. a write fenced by the lease."""
+
+
+@dataclass
+class UserContext:
+    """
+    User data loaded once per update: FSM data, Gemini settings and chat history.
+    Settings are read from storage on the first load_settings() call,
+    history is None until it's needed, see HistoryLoaderMiddleware.
+    """
+
+    user_id: int
+    fsm_data: Dict[str, Any] = field(default_factory=dict)
+    temperature: float = DEFAULT_GEMINI_TEMPERATURE
+    max_tokens: int = DEFAULT_GEMINI_MAX_TOKENS
+    speed_mode: str = DEFAULT_SPEED_MODE
+    debounce_mode: str = DEFAULT_DEBOUNCE_MODE
+    history: Optional[List[Dict[str, Any]]] = None
+    settings_loaded: bool = False
+
+    async def load_settings(self):
+        """Reads Gemini settings and debounce mode from storage, once per update."""
+        if self.settings_loaded:
+            return
+        doc = await get_user_data(self.user_id, include_history=False)
+        self.temperature = doc.get("gemini_temperature", DEFAULT_GEMINI_TEMPERATURE)
+        self.max_tokens = doc.get("gemini_max_tokens", DEFAULT_GEMINI_MAX_TOKENS)
+        self.speed_mode = doc.get("gemini_speed_mode", DEFAULT_SPEED_MODE)
+        self.debounce_mode = doc.get("message_debounce", DEFAULT_DEBOUNCE_MODE)
+        self.settings_loaded = True
+
+    async def get_history(self) -> List[Dict[str, Any]]:
+        if self.history is None:
+            self.history = await get_history(self.user_id)
+        return self.history
+
+    async def save_history(self, updated_history: List[Dict[str, Any]]):
+        """
+        Saves messages of `updated_history` that follow the loaded history.
+        Raises HistoryNotSaved if the storage rejected them.
+        """
+        loaded_history = await self.get_history()
+        if not await append_history(
+            self.user_id, updated_history[len(loaded_history) :]
+        ):
+            raise HistoryNotSaved(f"History of user {self.user_id} wasn't saved.")
+        self.history = updated_history
+
+    async def reload(self, state: FSMContext):
+        """Re-reads FSM data and, if they were loaded, settings and history changed by other updates."""
+        self.fsm_data = await state.get_data()
+        if self.settings_loaded:
+            self.settings_loaded = False
+            await self.load_settings()
+        if self.history is not None:
+            self.history = await get_history(self.user_id)
+
+
+class UserContextLoaderMiddleware(BaseMiddleware):
+    """
+    Creates UserContext for the user of the update with its FSM data and adds it
+    to event data as 'user_context'. Settings and history aren't loaded here:
+    most updates (commands, photos, callbacks) don't need them, handlers load
+    them on demand.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        state: FSMContext | None = data.get("state")
+        if user is None or state is None:
+            return await handler(event, data)
+
+        fsm_data = await state.get_data()
+        logger.debug(f"UserContextLoaderMiddleware: Context loaded for user {user.id}.")
+        data["user_context"] = UserContext(user_id=user.id, fsm_data=fsm_data)
+        return await handler(event, data)
+
+
+class HistoryLoaderMiddleware(BaseMiddleware):
+    """
+    Loads history into 'user_context' for handlers flagged with
+    `flags={"history": True}`, others load it on demand with get_history().
+    Register after UserSerializationMiddleware, so an update that waited for
+    the previous ones reads the history they saved.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user_context: UserContext | None = data.get("user_context")
+        if user_context is not None and get_flag(data, "history"):
+            await user_context.get_history()
+        return await handler(event, data)
@@ -0,0 +1,267 @@
+import asyncio
+import bisect
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from src.config import (
+    DEFAULT_ADMISSION_FAIR_QUEUEING,
+    DEFAULT_ADMISSION_LIMITS,
+    DEFAULT_ADMISSION_MAX_QUEUE_SIZE,
+    DEFAULT_ADMISSION_MAX_WAIT_SECONDS,
+    DEFAULT_ADMISSION_USER_WEIGHT,
+    config,
+    per_process_limit,
+)
+from src.services.quota import QueuePositionCallback, notify_queue_position
+from src.utils.deadline import record_stage, time_left
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """The request wasn't admitted: the queue is full or the wait took too long."""
+
+
+@dataclass
+class _Waiter:
+    start_tag: float
+    seq: int
+    wakeup: asyncio.Event = field(default_factory=asyncio.Event)
+    admitted: bool = False
+
+    @property
+    def order(self) -> Tuple[float, int]:
+        return (self.start_tag, self.seq)
+
+
+class ModalityPool:
+    """
+    Concurrency limit of one modality with a bounded queue.
+    With fair queuing waiters are ordered by start-time fair queuing: every
+    request of a user starts in virtual time where the user's previous one
+    finished, and takes 1/weight of virtual time. A user flooding the queue
+    only pushes their own requests back, a light user's request goes ahead
+    of the flood. Without it (or for requests without a user) the queue is FIFO.
+    A released slot is handed straight to the first waiter.
+    """
+
+    def __init__(
+        self,
+        modality: str,
+        limit: int,
+        max_queue_size: int,
+        max_wait_seconds: float,
+        fair_queueing: bool = DEFAULT_ADMISSION_FAIR_QUEUEING,
+        user_weights: Optional[Dict[int, float]] = None,
+    ):
+        self.modality = modality
+        self.limit = max(1, limit)
+        self.max_queue_size = max_queue_size
+        self.max_wait_seconds = max_wait_seconds
+        self.fair_queueing = fair_queueing
+        self.user_weights = user_weights or {}
+        self.in_flight = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._finish_tags: Dict[int, float] = {}
+
+    @property
+    def queue_size(self) -> int:
+        return len(self._waiters)
+
+    def _update_gauges(self):
+        metrics.set_gauge("admission_in_flight", self.in_flight, modality=self.modality)
+        metrics.set_gauge(
+            "admission_queue_size", len(self._waiters), modality=self.modality
+        )
+
+    def _start_tag(self, user_id: Optional[int]) -> float:
+        """Virtual start time of the user's next request, charges the user for it."""
+        if not self.fair_queueing:
+            return 0.0
+        if user_id is None:
+            return self._virtual_time
+        start = max(self._virtual_time, self._finish_tags.get(user_id, 0.0))
+        weight = self.user_weights.get(user_id, DEFAULT_ADMISSION_USER_WEIGHT)
+        self._finish_tags[user_id] = start + 1.0 / weight
+        return start
+
+    def _start(self, start_tag: float):
+        self.in_flight += 1
+        self._virtual_time = max(self._virtual_time, start_tag)
+
+    def _forget_idle_users(self):
+        # Users whose requests all finished in virtual time have no advantage
+        # or debt left and would get the same start tag without an entry.
+        self._finish_tags = {
+            user_id: finish
+            for user_id, finish in self._finish_tags.items()
+            if finish > self._virtual_time
+        }
+
+    def _reject(self, reason: str):
+        metrics.inc("admission_rejected_total", modality=self.modality, reason=reason)
+        raise AdmissionRejected(f"{self.modality}: {reason}")
+
+    async def _wait(
+        self, waiter: _Waiter, on_queue_position: Optional[QueuePositionCallback]
+    ):
+        loop = asyncio.get_running_loop()
+        max_wait_seconds = time_left(self.max_wait_seconds)
+        deadline = loop.time() + max_wait_seconds
+        reported_position: Optional[int] = None
+        while not waiter.admitted:
+            position = (
+                bisect.bisect_left(self._waiters, waiter.order, key=lambda w: w.order)
+                + 1
+            )
+            if position != reported_position and on_queue_position:
+                reported_position = position
+                await notify_queue_position(on_queue_position, position)
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                logger.warning(
+                    f"Request waited {max_wait_seconds:.1f}s for {self.modality} admission, giving up."
+                )
+                self._reject("timeout")
+            waiter.wakeup.clear()
+            try:
+                await asyncio.wait_for(waiter.wakeup.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+        if reported_position is not None and on_queue_position:
+            await notify_queue_position(on_queue_position, 0)
+
+    async def acquire(
+        self,
+        user_id: Optional[int] = None,
+        on_queue_position: Optional[QueuePositionCallback] = None,
+    ):
+        """Takes a slot, waiting in the queue if all are busy. Raises AdmissionRejected."""
+        if self.in_flight < self.limit and not self._waiters:
+            self._start(self._start_tag(user_id))
+            metrics.observe("admission_wait_seconds", 0.0, modality=self.modality)
+            self._update_gauges()
+            return
+        if len(self._waiters) >= self.max_queue_size:
+            logger.warning(
+                f"Admission queue for {self.modality} is full ({len(self._waiters)} waiting)."
+            )
+            self._reject("queue_full")
+
+        waiter = _Waiter(self._start_tag(user_id), next(self._seq))
+        bisect.insort(self._waiters, waiter, key=lambda w: w.order)
+        # Waiters behind the new one moved back a position.
+        self._wake_all()
+        self._update_gauges()
+        started = time.monotonic()
+        try:
+            await self._wait(waiter, on_queue_position)
+        except BaseException:
+            if waiter.admitted:
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+                self._wake_all()
+                self._update_gauges()
+            raise
+        waited = time.monotonic() - started
+        metrics.observe("admission_wait_seconds", waited, modality=self.modality)
+        record_stage("admission", waited)
+
+    def release(self):
+        self.in_flight -= 1
+        if self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.pop(0)
+            waiter.admitted = True
+            self._start(waiter.start_tag)
+            self._wake_all()
+            waiter.wakeup.set()
+        if not self._waiters:
+            self._forget_idle_users()
+        self._update_gauges()
+
+    def _wake_all(self):
+        # Waiters re-read their positions.
+        for waiter in self._waiters:
+            waiter.wakeup.set()
+
+
+class AdmissionController:
+    """
+    Admission control in front of the expensive handlers: one ModalityPool
+    per modality, so a burst of documents can't take the slots of text chat.
+    Modalities without a configured limit get the text limit.
+    Limits are shared by `processes` worker processes, each takes its share.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, int],
+        max_queue_size: int,
+        max_wait_seconds: float,
+        fair_queueing: bool = DEFAULT_ADMISSION_FAIR_QUEUEING,
+        user_weights: Optional[Dict[int, float]] = None,
+        processes: int = 1,
+    ):
+        self.limits = limits
+        self.max_queue_size = max_queue_size
+        self.max_wait_seconds = max_wait_seconds
+        self.fair_queueing = fair_queueing
+        self.user_weights = user_weights or {}
+        self.processes = processes
+        self._pools: Dict[str, ModalityPool] = {}
+
+    def pool(self, modality: str) -> ModalityPool:
+        pool = self._pools.get(modality)
+        if pool is None:
+            limit = self.limits.get(modality, DEFAULT_ADMISSION_LIMITS["text"])
+            pool = ModalityPool(
+                modality,
+                per_process_limit(limit, self.processes),
+                self.max_queue_size,
+                self.max_wait_seconds,
+                self.fair_queueing,
+                self.user_weights,
+            )
+            self._pools[modality] = pool
+        return pool
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        modality: str,
+        user_id: Optional[int] = None,
+        on_queue_position: Optional[QueuePositionCallback] = None,
+    ) -> AsyncIterator[None]:
+        """Holds a slot of the modality in the block. Raises AdmissionRejected."""
+        pool = self.pool(modality)
+        await pool.acquire(user_id, on_queue_position)
+        try:
+            yield
+        finally:
+            pool.release()
+
+
+if config:
+    admission_controller = AdmissionController(
+        config.admission.limits,
+        config.admission.max_queue_size,
+        config.admission.max_wait_seconds,
+        config.admission.fair_queueing,
+        config.admission.user_weights,
+        config.bot.worker_processes,
+    )
+else:
+    admission_controller = AdmissionController(
+        DEFAULT_ADMISSION_LIMITS,
+        DEFAULT_ADMISSION_MAX_QUEUE_SIZE,
+        DEFAULT_ADMISSION_MAX_WAIT_SECONDS,
+    )
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from src.config import (
+    DEFAULT_BULKHEAD_MAX_CONCURRENT,
+    DEFAULT_BULKHEAD_TIMEOUT_SECONDS,
+    DEFAULT_BULKHEAD_WORKERS,
+    config,
+    per_process_limit,
+)
+from src.utils.deadline import DeadlineExceeded, record_stage, time_left
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Bulkhead:
+    """
+    Isolates calls of one modality: at most `max_concurrent` of them run at once,
+    blocking work runs in the bulkhead's own thread pool, and a call (with its wait
+    for a slot) is cancelled after `timeout_seconds` with asyncio.TimeoutError, or
+    with DeadlineExceeded when the update's remaining budget is shorter.
+    A thread already running blocking work can't be stopped, but it only holds
+    a thread of its own bulkhead.
+    """
+
+    def __init__(
+        self, name: str, max_concurrent: int, workers: int, timeout_seconds: float
+    ):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.workers = max(1, workers)
+        self.timeout_seconds = timeout_seconds
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix=f"bulkhead-{self.name}"
+            )
+        return self._executor
+
+    async def run(self, operation: Callable[[], Awaitable[T]]) -> T:
+        """
+        Awaits `operation()` in a slot of the bulkhead.
+        Raises asyncio.TimeoutError, or DeadlineExceeded if the update's budget ran out.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        timeout_seconds = time_left(self.timeout_seconds)
+        limited_by_deadline = timeout_seconds < self.timeout_seconds
+        deadline = started + timeout_seconds
+        metrics.add_gauge("bulkhead_waiting", 1, bulkhead=self.name)
+        timeout = asyncio.timeout_at(deadline)
+        try:
+            async with timeout:
+                await self._semaphore.acquire()
+        except asyncio.TimeoutError:
+            raise self._timeout_error(
+                "waiting for a slot", limited_by_deadline
+            ) from None
+        finally:
+            metrics.add_gauge("bulkhead_waiting", -1, bulkhead=self.name)
+
+        metrics.add_gauge("bulkhead_in_flight", 1, bulkhead=self.name)
+        timeout = asyncio.timeout_at(deadline)
+        try:
+            async with timeout:
+                return await operation()
+        except asyncio.TimeoutError:
+            if not timeout.expired():
+                raise
+            raise self._timeout_error("running", limited_by_deadline) from None
+        finally:
+            self._semaphore.release()
+            metrics.add_gauge("bulkhead_in_flight", -1, bulkhead=self.name)
+            metrics.observe(
+                "bulkhead_call_seconds", loop.time() - started, bulkhead=self.name
+            )
+            record_stage(self.name, loop.time() - started)
+
+    async def run_sync(self, func: Callable[..., T], *args) -> T:
+        """Runs blocking `func(*args)` in the bulkhead's thread pool, see `run`."""
+        loop = asyncio.get_running_loop()
+        return await self.run(lambda: loop.run_in_executor(self.executor, func, *args))
+
+    def _timeout_error(
+        self, stage: str, limited_by_deadline: bool
+    ) -> asyncio.TimeoutError:
+        if limited_by_deadline:
+            logger.warning(f"Bulkhead {self.name}: update deadline exceeded ({stage}).")
+            metrics.inc("deadline_exceeded_total", stage=self.name)
+            return DeadlineExceeded(f"{self.name} ran out of the update's budget.")
+        logger.warning(
+            f"Bulkhead {self.name}: call timed out after {self.timeout_seconds}s ({stage})."
+        )
+        metrics.inc("bulkhead_timeouts_total", bulkhead=self.name)
+        return asyncio.TimeoutError(f"{self.name} call timed out.")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class BulkheadRegistry:
+    def __init__(
+        self,
+        max_concurrent: Dict[str, int],
+        workers: Dict[str, int],
+        timeout_seconds: Dict[str, float],
+        processes: int = 1,
+    ):
+        self.max_concurrent = max_concurrent
+        self.workers = workers
+        self.timeout_seconds = timeout_seconds
+        # Concurrency limits are shared by the worker processes, thread pools are not.
+        self.processes = processes
+        self._bulkheads: Dict[str, Bulkhead] = {}
+
+    def get(self, name: str) -> Bulkhead:
+        bulkhead = self._bulkheads.get(name)
+        if bulkhead is None:
+            bulkhead = Bulkhead(
+                name,
+                per_process_limit(
+                    self.max_concurrent.get(
+                        name, DEFAULT_BULKHEAD_MAX_CONCURRENT["text"]
+                    ),
+                    self.processes,
+                ),
+                self.workers.get(name, DEFAULT_BULKHEAD_WORKERS["text"]),
+                self.timeout_seconds.get(
+                    name, DEFAULT_BULKHEAD_TIMEOUT_SECONDS["text"]
+                ),
+            )
+            self._bulkheads[name] = bulkhead
+        return bulkhead
+
+    def shutdown(self):
+        for bulkhead in self._bulkheads.values():
+            bulkhead.shutdown()
+
+
+if config:
+    bulkheads = BulkheadRegistry(
+        config.bulkheads.max_concurrent,
+        config.bulkheads.workers,
+        config.bulkheads.timeout_seconds,
+        config.bot.worker_processes,
+    )
+else:
+    bulkheads = BulkheadRegistry(
+        DEFAULT_BULKHEAD_MAX_CONCURRENT,
+        DEFAULT_BULKHEAD_WORKERS,
+        DEFAULT_BULKHEAD_TIMEOUT_SECONDS,
+    )
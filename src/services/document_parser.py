@@ -1,10 +1,15 @@
+import asyncio
 import io
 import logging
+import threading
 from typing import Optional, Tuple
 
 import docx
 import pypdf
 
+from src.services.bulkhead import bulkheads
+from src.utils.deadline import DEADLINE_EXCEEDED, DeadlineExceeded
+
 logger = logging.getLogger(__name__)
 
 PARSING_SUCCESS = "PARSING_SUCCESS"
@@ -14,6 +19,7 @@ PARSING_ERROR_DOCX = "PARSING_ERROR_DOCX"
 PARSING_ERROR_TXT = "PARSING_ERROR_TXT"
 PARSING_LIB_MISSING = "PARSING_LIB_MISSING"
 PARSING_EMPTY_DOC = "PARSING_EMPTY_DOC"
+PARSING_ERROR_UNKNOWN = "PARSING_ERROR_UNKNOWN"
 
 SUPPORTED_MIME_TYPES = {
     "application/pdf": "pdf",
@@ -26,9 +32,27 @@ async def extract_text_from_document(
     file_bytes: bytes, mime_type: str
 ) -> Tuple[Optional[str], str]:
     """
-    Extracts text from a document (PDF, DOCX or TXT).
+    Extracts text from a document (PDF, DOCX or TXT) in the document bulkhead.
     Returns tuple (extracted_text | None, status_code).
     """
+    stop = threading.Event()
+    try:
+        return await bulkheads.get("document").run_sync(
+            _extract_text, file_bytes, mime_type, stop
+        )
+    except DeadlineExceeded:
+        return None, DEADLINE_EXCEEDED
+    except asyncio.TimeoutError:
+        logger.warning(f"Parsing of {mime_type} ({len(file_bytes)} bytes) timed out.")
+        return None, PARSING_ERROR_UNKNOWN
+    finally:
+        # Stops a PDF parse still running in the pool after a timeout or cancellation.
+        stop.set()
+
+
+def _extract_text(
+    file_bytes: bytes, mime_type: str, stop: threading.Event
+) -> Tuple[Optional[str], str]:
     file_ext = SUPPORTED_MIME_TYPES.get(mime_type)
 
     if not file_ext:
@@ -49,6 +73,9 @@ async def extract_text_from_document(
                     f"Starting to extract text from PDF ({len(reader.pages)} pages)..."
                 )
                 for i, page in enumerate(reader.pages):
+                    if stop.is_set():
+                        logger.info(f"PDF parsing stopped at page {i + 1}.")
+                        return None, PARSING_ERROR_UNKNOWN
                     try:
                         page_text = page.extract_text()
                         if page_text:
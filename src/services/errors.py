@@ -3,11 +3,14 @@ from typing import Any, Dict, Optional, Tuple
 
 from fluent.runtime import FluentLocalization
 
+from src.utils.deadline import DEADLINE_EXCEEDED
+
 from .document_parser import (
     PARSING_EMPTY_DOC,
     PARSING_ERROR_DOCX,
     PARSING_ERROR_PDF,
     PARSING_ERROR_TXT,
+    PARSING_ERROR_UNKNOWN,
     PARSING_LIB_MISSING,
     PARSING_SUCCESS,
     PARSING_UNSUPPORTED_TYPE,
@@ -16,6 +19,7 @@ from .gemini import (
     GEMINI_API_KEY_ERROR,
     GEMINI_API_KEY_INVALID,
     GEMINI_BLOCKED_ERROR,
+    GEMINI_CIRCUIT_OPEN,
     GEMINI_QUOTA_ERROR,
     GEMINI_REQUEST_ERROR,
     GEMINI_SERVICE_UNAVAILABLE,
@@ -41,17 +45,18 @@ TELEGRAM_UPLOAD_ERROR = "TELEGRAM_UPLOAD_ERROR"
 TELEGRAM_NETWORK_ERROR = "TELEGRAM_NETWORK_ERROR"
 TELEGRAM_MESSAGE_DELETED_ERROR = "TELEGRAM_MESSAGE_DELETED_ERROR"
 DATABASE_SAVE_ERROR = "DATABASE_SAVE_ERROR"
-PARSING_ERROR_UNKNOWN = "PARSING_ERROR_UNKNOWN"
 
 RETRYABLE_ERRORS = {
     GEMINI_REQUEST_ERROR,
     GEMINI_SERVICE_UNAVAILABLE,
+    GEMINI_CIRCUIT_OPEN,
     IMAGE_GEN_TIMEOUT_ERROR,
     IMAGE_GEN_RATE_LIMIT_ERROR,
     IMAGE_GEN_CONNECTION_ERROR,
     IMAGE_ANALYSIS_ERROR,
     GEMINI_TRANSCRIPTION_ERROR,
     TELEGRAM_NETWORK_ERROR,
+    DEADLINE_EXCEEDED,
 }
 
 ERROR_CODE_TO_FTL_KEY: Dict[str, str] = {
@@ -61,6 +66,7 @@ ERROR_CODE_TO_FTL_KEY: Dict[str, str] = {
     GEMINI_BLOCKED_ERROR: "error-blocked-content",
     GEMINI_REQUEST_ERROR: "error-gemini-request",
     GEMINI_SERVICE_UNAVAILABLE: "error-gemini-service-unavailable",
+    GEMINI_CIRCUIT_OPEN: "error-gemini-service-unavailable",
     GEMINI_UNKNOWN_API_ERROR: "error-gemini-unknown",
     IMAGE_ANALYSIS_ERROR: "error-image-analysis-failed",
     GEMINI_TRANSCRIPTION_ERROR: "error-transcription-failed",
@@ -82,6 +88,7 @@ ERROR_CODE_TO_FTL_KEY: Dict[str, str] = {
     TELEGRAM_NETWORK_ERROR: "error-telegram-network",
     TELEGRAM_MESSAGE_DELETED_ERROR: "error-message-deleted",
     DATABASE_SAVE_ERROR: "error-db-save",
+    DEADLINE_EXCEEDED: "error-deadline-exceeded",
 }
 
 logger = logging.getLogger(__name__)
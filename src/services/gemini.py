@@ -1,5 +1,8 @@
+import asyncio
 import io
 import logging
+import time
+from functools import partial
 from typing import Any, Dict, List, Optional, Tuple
 
 import google.generativeai as genai
@@ -12,7 +15,25 @@ from google.generativeai.types import (
     HarmCategory,
 )
 
-from src.config import DEFAULT_TEXT_MODEL, VISION_MODEL, config
+from src.config import (
+    ALLOWED_SPEED_MODES,
+    DEFAULT_TEXT_MODEL,
+    MIN_THINKING_BUDGETS,
+    VISION_MODEL,
+    config,
+)
+from src.services.bulkhead import bulkheads
+from src.services.hedging import REQUEST_LATENCY_METRIC, hedger
+from src.services.quota import (
+    LOCAL_QUEUE_REJECTED,
+    QueuePositionCallback,
+    estimate_tokens,
+    quota_scheduler,
+)
+from src.services.resilience import call_with_resilience
+from src.services.routing import model_router
+from src.utils.deadline import DEADLINE_EXCEEDED, DeadlineExceeded
+from src.utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +54,17 @@ safety_settings = {
 }
 
 AUDIO_TRANSCRIPTION_MODEL = "gemini-2.5-flash-preview-04-17"
+IMAGE_INPUT_TOKENS = 258
+AUDIO_BYTES_PER_TOKEN = 64
+
+# thinking_config is known only to recent google-ai-generativelanguage versions.
+THINKING_CONFIG_SUPPORTED = (
+    "thinking_config" in genai.protos.GenerationConfig.meta.fields
+)
+if not THINKING_CONFIG_SUPPORTED:
+    logger.warning(
+        "Installed google-generativeai doesn't support thinking_config, speed modes are ignored."
+    )
 
 GEMINI_QUOTA_ERROR = "GEMINI_QUOTA_ERROR"
 GEMINI_API_KEY_ERROR = "GEMINI_API_KEY_ERROR"
@@ -43,6 +75,11 @@ GEMINI_TRANSCRIPTION_ERROR = "GEMINI_TRANSCRIPTION_ERROR"
 GEMINI_API_KEY_INVALID = "GEMINI_API_KEY_INVALID"
 GEMINI_SERVICE_UNAVAILABLE = "GEMINI_SERVICE_UNAVAILABLE"
 GEMINI_UNKNOWN_API_ERROR = "GEMINI_UNKNOWN_API_ERROR"
+GEMINI_CIRCUIT_OPEN = "GEMINI_CIRCUIT_OPEN"
+GEMINI_LOCAL_QUOTA_ERROR = f"{GEMINI_QUOTA_ERROR}:{LOCAL_QUEUE_REJECTED}"
+
+# Errors after which the request is repeated on the next model of the fallback chain.
+FALLBACK_ERRORS = {GEMINI_QUOTA_ERROR, GEMINI_SERVICE_UNAVAILABLE, GEMINI_CIRCUIT_OPEN}
 
 SYSTEM_INSTRUCTION = (
     "You were developed by a student "
@@ -52,26 +89,88 @@ SYSTEM_INSTRUCTION = (
 )
 
 
+def _thinking_budget(model_name: str, speed_mode: Optional[str]) -> Optional[int]:
+    """Returns thinking budget for the speed mode, or None to keep the model default."""
+    if speed_mode is None:
+        return None
+    if speed_mode not in ALLOWED_SPEED_MODES:
+        logger.warning(f"Unknown speed mode '{speed_mode}', using model default.")
+        return None
+    if not THINKING_CONFIG_SUPPORTED:
+        return None
+    return max(ALLOWED_SPEED_MODES[speed_mode], MIN_THINKING_BUDGETS.get(model_name, 0))
+
+
+def _log_thinking_usage(
+    model_name: str, speed_mode: Optional[str], seconds: float, response: Any
+):
+    """Logs answer time and thinking tokens, so speed modes can be compared."""
+    usage = getattr(response, "usage_metadata", None)
+    thoughts_tokens = getattr(usage, "thoughts_token_count", None)
+    mode = speed_mode or "default"
+    logger.info(
+        f"Gemini {model_name} answered in {seconds:.2f}s, speed mode {mode}, thinking tokens {thoughts_tokens}."
+    )
+    if thoughts_tokens is not None:
+        metrics.observe(
+            "gemini_thinking_tokens", thoughts_tokens, model=model_name, speed_mode=mode
+        )
+
+
+def _total_token_count(response: Any) -> Optional[int]:
+    """Returns total token count from response usage metadata, if API sent it."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return None
+    return getattr(usage, "total_token_count", None) or None
+
+
 async def transcribe_audio(
-    audio_bytes: bytes, mime_type: Optional[str] = None
+    audio_bytes: bytes,
+    mime_type: Optional[str] = None,
+    on_queue_position: Optional[QueuePositionCallback] = None,
 ) -> Tuple[Optional[str], Optional[str]]:
     """
-    Transcribes audio with Gemini API.
+    Transcribes audio with Gemini API, retrying transient errors.
     Returns (transcribed_text | None, error_code | None).
     """
+    return await call_with_resilience(
+        lambda: _transcribe_audio_once(audio_bytes, mime_type, on_queue_position),
+        model_name=AUDIO_TRANSCRIPTION_MODEL,
+        circuit_open_error=GEMINI_CIRCUIT_OPEN,
+    )
+
+
+async def _transcribe_audio_once(
+    audio_bytes: bytes,
+    mime_type: Optional[str],
+    on_queue_position: Optional[QueuePositionCallback],
+) -> Tuple[Optional[str], Optional[str]]:
     if not (config and config.gemini.api_key):
         logger.error("Gemini API not configured for transcription.")
         return None, GEMINI_API_KEY_ERROR
 
     transcription_prompt = "Transcribe this audio."
+    quota = quota_scheduler.for_model(AUDIO_TRANSCRIPTION_MODEL)
+    estimated_tokens = (
+        estimate_tokens(transcription_prompt)
+        + len(audio_bytes) // AUDIO_BYTES_PER_TOKEN
+    )
 
     try:
+        if not await quota.acquire(estimated_tokens, on_queue_position):
+            return None, GEMINI_LOCAL_QUOTA_ERROR
+
         logger.info(f"Loading audio ({len(audio_bytes)} byte) in Gemini...")
         audio_file_obj = io.BytesIO(audio_bytes)
-        audio_file = genai.upload_file(
-            path=audio_file_obj,
-            display_name="user_voice_message.ogg",
-            mime_type=mime_type,
+        bulkhead = bulkheads.get("audio")
+        audio_file = await bulkhead.run_sync(
+            partial(
+                genai.upload_file,
+                path=audio_file_obj,
+                display_name="user_voice_message.ogg",
+                mime_type=mime_type,
+            )
         )
         logger.info(f"Audio successfully loaded in Gemini: {audio_file.name}")
 
@@ -79,10 +178,13 @@ async def transcribe_audio(
             f"Requesting transcription with model {AUDIO_TRANSCRIPTION_MODEL}..."
         )
         model = genai.GenerativeModel(AUDIO_TRANSCRIPTION_MODEL)
-        response = await model.generate_content_async(
-            [transcription_prompt, audio_file],
-            safety_settings=safety_settings,
+        response = await bulkhead.run(
+            lambda: model.generate_content_async(
+                [transcription_prompt, audio_file],
+                safety_settings=safety_settings,
+            )
         )
+        quota.reconcile(estimated_tokens, _total_token_count(response))
 
         if not response.parts:
             block_reason = (
@@ -110,6 +212,7 @@ async def transcribe_audio(
             f"Quota exceeded while transcribing audio ({AUDIO_TRANSCRIPTION_MODEL}): {e}",
             exc_info=False,
         )
+        quota.exhaust()
         return None, GEMINI_QUOTA_ERROR
     except api_core_exceptions.ServiceUnavailable as e:
         logger.warning(
@@ -117,6 +220,13 @@ async def transcribe_audio(
             exc_info=False,
         )
         return None, GEMINI_SERVICE_UNAVAILABLE
+    except DeadlineExceeded:
+        return None, DEADLINE_EXCEEDED
+    except asyncio.TimeoutError:
+        logger.warning(
+            f"Audio transcription ({AUDIO_TRANSCRIPTION_MODEL}) timed out in its bulkhead."
+        )
+        return None, GEMINI_SERVICE_UNAVAILABLE
     except api_core_exceptions.GoogleAPIError as e:
         logger.error(
             f"Google API error during audio transcription ({AUDIO_TRANSCRIPTION_MODEL}): {e}",
@@ -132,7 +242,7 @@ async def transcribe_audio(
     finally:
         if "audio_file" in locals() and audio_file:
             try:
-                genai.delete_file(audio_file.name)
+                await bulkhead.run_sync(genai.delete_file, audio_file.name)
                 logger.info(
                     f"Uploaded audio file {audio_file.name} deleted in finally block."
                 )
@@ -148,12 +258,124 @@ async def generate_text_with_history(
     model_name: str = DEFAULT_TEXT_MODEL,
     temperature: Optional[float] = None,
     max_output_tokens: Optional[int] = None,
+    on_queue_position: Optional[QueuePositionCallback] = None,
+    speed_mode: Optional[str] = None,
+) -> tuple[str | None, str | None]:
+    """
+    Generates answer for new_prompt in context of history, retrying transient errors.
+    `speed_mode` (see ALLOWED_SPEED_MODES) sets the thinking budget of the model.
+    If the model is rate-limited or unavailable, falls back to the next model of its chain.
+    Returns (response_text | None, error_code | None).
+    """
+    started_at = time.monotonic()
+    candidates = model_router.candidates(model_name)
+    fallback_reason = "degraded"
+    response_text, error_code = None, None
+
+    for index, candidate in enumerate(candidates):
+        # Only the last model waits in the quota queue, the others fall back immediately.
+        is_last_candidate = index == len(candidates) - 1
+        primary = partial(
+            _generate_text_once,
+            history,
+            new_prompt,
+            candidate,
+            temperature,
+            max_output_tokens,
+            speed_mode,
+            on_queue_position if is_last_candidate else None,
+            is_last_candidate,
+        )
+        # Hedged duplicate never waits for quota: no capacity means no hedge.
+        admit_duplicate = partial(
+            quota_scheduler.for_model(candidate).try_acquire,
+            _estimate_text_tokens(history, new_prompt),
+        )
+        duplicate = partial(
+            _generate_text_once,
+            history,
+            new_prompt,
+            candidate,
+            temperature,
+            max_output_tokens,
+            speed_mode,
+            None,
+            False,
+            True,
+        )
+        response_text, error_code = await call_with_resilience(
+            partial(hedger.run, candidate, primary, duplicate, admit_duplicate),
+            model_name=candidate,
+            circuit_open_error=GEMINI_CIRCUIT_OPEN,
+        )
+
+        base_error_code, _, details = (error_code or "").partition(":")
+        if base_error_code not in FALLBACK_ERRORS:
+            if candidate != model_name and not error_code:
+                model_router.record_fallback(model_name, candidate, fallback_reason)
+            if not error_code:
+                elapsed = time.monotonic() - started_at
+                metrics.observe(
+                    "gemini_text_latency_seconds",
+                    elapsed,
+                    model=model_name,
+                    speed_mode=speed_mode or "default",
+                )
+                logger.info(
+                    f"Text generation for {model_name} (served by {candidate}, speed mode {speed_mode}) took {elapsed:.2f}s."
+                )
+            return response_text, error_code
+
+        if details != LOCAL_QUEUE_REJECTED and base_error_code != GEMINI_CIRCUIT_OPEN:
+            model_router.mark_degraded(candidate, error_code)
+        fallback_reason = base_error_code
+        if not is_last_candidate:
+            logger.warning(
+                f"Model {candidate} failed with {error_code}, trying {candidates[index + 1]}."
+            )
+
+    return response_text, error_code
+
+
+def _estimate_text_tokens(history: List[Dict[str, Any]], new_prompt: str) -> int:
+    history_texts = [
+        part.get("text", "")
+        for msg in history
+        if isinstance(msg, dict)
+        for part in msg.get("parts", [])
+        if isinstance(part, dict)
+    ]
+    return estimate_tokens(SYSTEM_INSTRUCTION, new_prompt, *history_texts)
+
+
+async def _generate_text_once(
+    history: List[Dict[str, Any]],
+    new_prompt: str,
+    model_name: str,
+    temperature: Optional[float],
+    max_output_tokens: Optional[int],
+    speed_mode: Optional[str],
+    on_queue_position: Optional[QueuePositionCallback],
+    wait_for_quota: bool = True,
+    quota_acquired: bool = False,
 ) -> tuple[str | None, str | None]:
     if not (config and config.gemini.api_key):
         logger.error("Gemini API is not configured.")
         return None, GEMINI_API_KEY_ERROR
 
+    quota = quota_scheduler.for_model(model_name)
+    estimated_tokens = _estimate_text_tokens(history, new_prompt)
+
     try:
+        if quota_acquired:
+            acquired = True
+        elif wait_for_quota:
+            acquired = await quota.acquire(estimated_tokens, on_queue_position)
+        else:
+            acquired = quota.try_acquire(estimated_tokens)
+        if not acquired:
+            return None, GEMINI_LOCAL_QUOTA_ERROR
+
         logger.debug(f"Using Gemini model: {model_name}")
         model = genai.GenerativeModel(model_name, system_instruction=SYSTEM_INSTRUCTION)
 
@@ -175,6 +397,10 @@ async def generate_text_with_history(
                 logger.warning(
                     f"Incorrect value for max_output_tokens ({max_output_tokens}), using default value from API."
                 )
+        thinking_budget = _thinking_budget(model_name, speed_mode)
+        if thinking_budget is not None:
+            generation_config["thinking_config"] = {"thinking_budget": thinking_budget}
+            config_params_set = True
 
         logger.debug(
             f"Generation config: {generation_config if config_params_set else 'Default API settings'}"
@@ -204,11 +430,18 @@ async def generate_text_with_history(
 
         chat = model.start_chat(history=final_history_for_api)
 
-        response = await chat.send_message_async(
-            new_prompt,
-            generation_config=generation_config if config_params_set else None,
-            safety_settings=safety_settings,
+        request_started_at = time.monotonic()
+        response = await bulkheads.get("text").run(
+            lambda: chat.send_message_async(
+                new_prompt,
+                generation_config=generation_config if config_params_set else None,
+                safety_settings=safety_settings,
+            )
         )
+        request_seconds = time.monotonic() - request_started_at
+        metrics.observe(REQUEST_LATENCY_METRIC, request_seconds, model=model_name)
+        quota.reconcile(estimated_tokens, _total_token_count(response))
+        _log_thinking_usage(model_name, speed_mode, request_seconds, response)
 
         if not response.parts:
             block_reason = (
@@ -233,6 +466,7 @@ async def generate_text_with_history(
         logger.error(
             f"Quota exceeded during text generation ({model_name}): {e}", exc_info=False
         )
+        quota.exhaust()
         return None, GEMINI_QUOTA_ERROR
     except api_core_exceptions.ServiceUnavailable as e:
         logger.warning(
@@ -246,6 +480,11 @@ async def generate_text_with_history(
             exc_info=True,
         )
         return None, f"{GEMINI_REQUEST_ERROR}:InvalidArgument"
+    except DeadlineExceeded:
+        return None, DEADLINE_EXCEEDED
+    except asyncio.TimeoutError:
+        logger.warning(f"Text generation ({model_name}) timed out in its bulkhead.")
+        return None, GEMINI_SERVICE_UNAVAILABLE
     except api_core_exceptions.GoogleAPIError as e:
         logger.error(
             f"Google API error during text generation ({model_name}): {e}",
@@ -258,6 +497,7 @@ async def generate_text_with_history(
                 f"Quota-like error caught in generic Exception ({model_name}): {e}",
                 exc_info=False,
             )
+            quota.exhaust()
             return None, GEMINI_QUOTA_ERROR
         else:
             logger.error(
@@ -268,22 +508,45 @@ async def generate_text_with_history(
 
 
 async def analyze_image(
-    image_bytes: bytes, prompt: str
+    image_bytes: bytes,
+    prompt: str,
+    on_queue_position: Optional[QueuePositionCallback] = None,
 ) -> Tuple[str | None, str | None]:
     """
-    Analyzes image using the Gemini API.
+    Analyzes image using the Gemini API, retrying transient errors.
     Returns image description, error code or None.
     """
+    return await call_with_resilience(
+        lambda: _analyze_image_once(image_bytes, prompt, on_queue_position),
+        model_name=VISION_MODEL,
+        circuit_open_error=GEMINI_CIRCUIT_OPEN,
+    )
+
+
+async def _analyze_image_once(
+    image_bytes: bytes,
+    prompt: str,
+    on_queue_position: Optional[QueuePositionCallback],
+) -> Tuple[str | None, str | None]:
     if not (config and config.gemini.api_key):
         logger.error("Gemini API not configured for image analysis.")
         return None, GEMINI_API_KEY_ERROR
 
+    quota = quota_scheduler.for_model(VISION_MODEL)
+    estimated_tokens = estimate_tokens(prompt) + IMAGE_INPUT_TOKENS
+
     try:
+        if not await quota.acquire(estimated_tokens, on_queue_position):
+            return None, GEMINI_LOCAL_QUOTA_ERROR
+
         img = PIL.Image.open(io.BytesIO(image_bytes))
         model = genai.GenerativeModel(VISION_MODEL)
-        response = await model.generate_content_async(
-            [prompt, img], safety_settings=safety_settings
+        response = await bulkheads.get("vision").run(
+            lambda: model.generate_content_async(
+                [prompt, img], safety_settings=safety_settings
+            )
         )
+        quota.reconcile(estimated_tokens, _total_token_count(response))
 
         if not response.parts:
             block_reason = (
@@ -309,6 +572,7 @@ async def analyze_image(
             f"Quota exceeded during image analysis ({VISION_MODEL}): {e}",
             exc_info=False,
         )
+        quota.exhaust()
         return None, GEMINI_QUOTA_ERROR
     except api_core_exceptions.ServiceUnavailable as e:
         logger.warning(
@@ -322,6 +586,11 @@ async def analyze_image(
             exc_info=True,
         )
         return None, f"{IMAGE_ANALYSIS_ERROR}:InvalidData"
+    except DeadlineExceeded:
+        return None, DEADLINE_EXCEEDED
+    except asyncio.TimeoutError:
+        logger.warning(f"Image analysis ({VISION_MODEL}) timed out in its bulkhead.")
+        return None, GEMINI_SERVICE_UNAVAILABLE
     except api_core_exceptions.GoogleAPIError as e:
         logger.error(
             f"Google API error during image analysis ({VISION_MODEL}): {e}",
@@ -334,6 +603,7 @@ async def analyze_image(
                 f"Quota-like error caught in generic Exception ({VISION_MODEL}): {e}",
                 exc_info=False,
             )
+            quota.exhaust()
             return None, GEMINI_QUOTA_ERROR
         else:
             logger.error(
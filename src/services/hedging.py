@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+
+from src.config import (
+    DEFAULT_HEDGE_INITIAL_DELAY_SECONDS,
+    DEFAULT_HEDGE_MAX_FRACTION,
+    DEFAULT_HEDGE_MIN_DELAY_SECONDS,
+    DEFAULT_HEDGE_MIN_SAMPLES,
+    DEFAULT_HEDGE_PERCENTILE,
+    config,
+)
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Operation = Callable[[], Awaitable[Tuple[Optional[T], Optional[str]]]]
+
+# Latency of single successful Gemini API calls, the hedge delay is its percentile.
+REQUEST_LATENCY_METRIC = "gemini_request_seconds"
+
+
+class Hedger:
+    """
+    Sends a duplicate request when the first one is slower than the latency percentile
+    of the model, and takes whichever answers first. The number of duplicates is capped
+    to `max_fraction` of requests, so quota use stays bounded.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        percentile: float,
+        max_fraction: float,
+        min_delay_seconds: float,
+        initial_delay_seconds: float = DEFAULT_HEDGE_INITIAL_DELAY_SECONDS,
+        min_samples: int = DEFAULT_HEDGE_MIN_SAMPLES,
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_fraction = max_fraction
+        self.min_delay_seconds = min_delay_seconds
+        self.initial_delay_seconds = initial_delay_seconds
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedges = 0
+
+    def hedge_delay(self, model_name: str) -> float:
+        if (
+            metrics.sample_count(REQUEST_LATENCY_METRIC, model=model_name)
+            < self.min_samples
+        ):
+            return self.initial_delay_seconds
+        latency = metrics.percentile(
+            REQUEST_LATENCY_METRIC, self.percentile, model=model_name
+        )
+        return max(self.min_delay_seconds, latency or self.initial_delay_seconds)
+
+    def _has_budget(self) -> bool:
+        return self.hedges + 1 <= self.max_fraction * self.requests
+
+    async def run(
+        self,
+        model_name: str,
+        primary: Operation,
+        duplicate: Operation,
+        admit: Optional[Callable[[], bool]] = None,
+    ) -> Tuple[Optional[T], Optional[str]]:
+        """
+        Runs `primary`, and `duplicate` too if primary didn't finish within the hedge delay.
+        `admit` takes quota for the duplicate, no quota means no hedge.
+        The first successful result wins and the other request is cancelled.
+        """
+        if not self.enabled:
+            return await primary()
+
+        self.requests += 1
+        delay = self.hedge_delay(model_name)
+        tasks = [asyncio.create_task(primary())]
+        primary_task = tasks[0]
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+            if done:
+                return primary_task.result()
+
+            if not self._has_budget():
+                metrics.inc(
+                    "gemini_hedges_total", model=model_name, outcome="no_budget"
+                )
+                return await primary_task
+            if admit is not None and not admit():
+                metrics.inc(
+                    "gemini_hedges_total", model=model_name, outcome="no_quota"
+                )
+                return await primary_task
+
+            self.hedges += 1
+            logger.info(
+                f"No answer from {model_name} after {delay:.2f}s, sending hedged request."
+            )
+            metrics.inc("gemini_hedges_total", model=model_name, outcome="sent")
+            duplicate_task = asyncio.create_task(duplicate())
+            tasks.append(duplicate_task)
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    result = task.result()
+                    if not result[1]:
+                        winner = "hedge" if task is duplicate_task else "primary"
+                        metrics.inc(
+                            "gemini_hedges_total",
+                            model=model_name,
+                            outcome=f"{winner}_won",
+                        )
+                        return result
+            # Both failed: primary's error is more meaningful than the duplicate's.
+            return primary_task.result()
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
+                metrics.inc(
+                    "gemini_hedges_cancelled_total", value=len(losers), model=model_name
+                )
+
+
+if config:
+    hedger = Hedger(
+        config.gemini.hedging_enabled,
+        config.gemini.hedge_percentile,
+        config.gemini.hedge_max_fraction,
+        config.gemini.hedge_min_delay_seconds,
+    )
+else:
+    hedger = Hedger(
+        False,
+        DEFAULT_HEDGE_PERCENTILE,
+        DEFAULT_HEDGE_MAX_FRACTION,
+        DEFAULT_HEDGE_MIN_DELAY_SECONDS,
+    )
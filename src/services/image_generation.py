@@ -14,6 +14,8 @@ except ImportError:
 from typing import Optional, Tuple
 
 from src.config import config
+from src.services.bulkhead import bulkheads
+from src.utils.deadline import DEADLINE_EXCEEDED, DeadlineExceeded, time_left
 
 logger = logging.getLogger(__name__)
 
@@ -25,10 +27,15 @@ IMAGE_GEN_CONTENT_FILTER_ERROR = "IMAGE_GEN_CONTENT_FILTER_ERROR"
 IMAGE_GEN_UNKNOWN_ERROR = "IMAGE_GEN_UNKNOWN_ERROR"
 IMAGE_GEN_CONNECTION_ERROR = "IMAGE_GEN_CONNECTION_ERROR"
 
+# Timeout of one Hugging Face request, cut to the remaining budget of the update.
+HF_REQUEST_TIMEOUT_SECONDS = 60.0
+
 hf_client: Optional[InferenceClient] = None
 if config and config.hf and config.hf.api_token:
     try:
-        hf_client = InferenceClient(token=config.hf.api_token, timeout=60)
+        hf_client = InferenceClient(
+            token=config.hf.api_token, timeout=HF_REQUEST_TIMEOUT_SECONDS
+        )
         logger.info("Hugging Face InferenceClient initialized.")
     except Exception as e:
         logger.error(f"Cannot initialize Hugging Face InferenceClient: {e}")
@@ -38,6 +45,18 @@ else:
     )
 
 
+def _text_to_png(prompt: str, model_id: str, timeout: float) -> bytes:
+    """Blocking: generates the image and encodes it to PNG."""
+    client = hf_client
+    if timeout < HF_REQUEST_TIMEOUT_SECONDS:
+        # Shorter HTTP timeout frees the pool thread when the budget runs out.
+        client = InferenceClient(token=config.hf.api_token, timeout=timeout)
+    image: Image.Image = client.text_to_image(prompt, model=model_id)
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format="PNG")
+    return img_byte_arr.getvalue()
+
+
 async def generate_image_from_prompt(prompt: str) -> Tuple[Optional[bytes], str]:
     """
     Generates image with Hugging Face API by text prompt.
@@ -55,15 +74,10 @@ async def generate_image_from_prompt(prompt: str) -> Tuple[Optional[bytes], str]
     )
 
     try:
-        loop = asyncio.get_running_loop()
-        image: Image.Image = await loop.run_in_executor(
-            None, lambda: hf_client.text_to_image(prompt, model=model_id)
+        img_byte_arr = await bulkheads.get("image_generation").run_sync(
+            _text_to_png, prompt, model_id, time_left(HF_REQUEST_TIMEOUT_SECONDS)
         )
 
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format="PNG")
-        img_byte_arr = img_byte_arr.getvalue()
-
         logger.info(
             f"Image generation completed with model '{model_id}'. Prompt: {prompt[:50]}..."
         )
@@ -87,6 +101,13 @@ async def generate_image_from_prompt(prompt: str) -> Tuple[Optional[bytes], str]
             return None, IMAGE_GEN_CONTENT_FILTER_ERROR
         else:
             return None, IMAGE_GEN_API_ERROR
+    except DeadlineExceeded:
+        return None, DEADLINE_EXCEEDED
+    except asyncio.TimeoutError:
+        logger.warning(
+            f"Image generation with model ({model_id}) timed out in its bulkhead."
+        )
+        return None, IMAGE_GEN_TIMEOUT_ERROR
     except (InferenceTimeoutError, RequestsTimeout) as e:
         logger.warning(
             f"Timeout error during image generation with model ({model_id}): {e}",
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+from src.config import (
+    DEFAULT_MODEL_LIMITS,
+    DEFAULT_QUOTA_MAX_QUEUE_SIZE,
+    DEFAULT_QUOTA_MAX_WAIT_SECONDS,
+    GEMINI_MODEL_LIMITS,
+    config,
+    per_process_limit,
+)
+from src.utils.deadline import time_left
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+# Error code details for requests rejected by the local queue, never sent to Gemini.
+LOCAL_QUEUE_REJECTED = "LocalQueue"
+
+# Called with the 1-based position in the queue, and with 0 once the request is admitted.
+QueuePositionCallback = Callable[[int], Awaitable[None]]
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token estimate used until the real usage metadata arrives."""
+    return sum(len(text) for text in texts if text) // CHARS_PER_TOKEN + 1
+
+
+class TokenBucket:
+    """
+    Continuously refilling token bucket.
+    The level may go below zero when actual usage turns out bigger than estimated.
+    """
+
+    def __init__(self, capacity: float, per_seconds: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / per_seconds
+        self.level = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(
+            self.capacity, self.level + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def delay_for(self, amount: float) -> float:
+        """Returns seconds until `amount` can be consumed (0 if it's available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+    def refund(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def drain(self):
+        self._refill()
+        self.level = min(self.level, 0.0)
+
+
+@dataclass
+class _Waiter:
+    tokens: int
+    wakeup: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class ModelQuota:
+    """RPM/TPM buckets of one model with a bounded FIFO queue of waiting requests."""
+
+    def __init__(
+        self,
+        model_name: str,
+        rpm: int,
+        tpm: int,
+        max_queue_size: int,
+        max_wait_seconds: float,
+    ):
+        self.model_name = model_name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_queue_size = max_queue_size
+        self.max_wait_seconds = max_wait_seconds
+        self._waiters: Deque[_Waiter] = deque()
+
+    @property
+    def queue_size(self) -> int:
+        return len(self._waiters)
+
+    def _delay_for(self, tokens: int) -> float:
+        return max(self.requests.delay_for(1), self.tokens.delay_for(tokens))
+
+    def _consume(self, tokens: int):
+        self.requests.consume(1)
+        self.tokens.consume(tokens)
+
+    def _wake_all(self):
+        for waiter in self._waiters:
+            waiter.wakeup.set()
+
+    def try_acquire(self, tokens: int) -> bool:
+        """Takes capacity only if it's available right now and nobody is queued."""
+        if not self._waiters and self._delay_for(tokens) <= 0:
+            self._consume(tokens)
+            return True
+        return False
+
+    async def acquire(
+        self, tokens: int, on_queue_position: Optional[QueuePositionCallback] = None
+    ) -> bool:
+        """
+        Waits for RPM/TPM capacity.
+        Returns False if the queue is full or capacity didn't free up within max wait.
+        """
+        if self.try_acquire(tokens):
+            return True
+
+        if len(self._waiters) >= self.max_queue_size:
+            logger.warning(
+                f"Quota queue for {self.model_name} is full ({len(self._waiters)} waiting)."
+            )
+            return False
+
+        loop = asyncio.get_running_loop()
+        max_wait_seconds = time_left(self.max_wait_seconds)
+        deadline = loop.time() + max_wait_seconds
+        waiter = _Waiter(tokens=tokens)
+        self._waiters.append(waiter)
+        reported_position: Optional[int] = None
+        logger.info(
+            f"Request queued for {self.model_name} quota, position {len(self._waiters)}."
+        )
+
+        try:
+            while True:
+                waiter.wakeup.clear()
+                position = self._waiters.index(waiter) + 1
+                delay: Optional[float] = None
+                if position == 1:
+                    delay = self._delay_for(tokens)
+                    if delay <= 0:
+                        self._consume(tokens)
+                        if reported_position is not None and on_queue_position:
+                            await notify_queue_position(on_queue_position, 0)
+                        return True
+
+                if position != reported_position and on_queue_position:
+                    reported_position = position
+                    await notify_queue_position(on_queue_position, position)
+                    continue
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    logger.warning(
+                        f"Request waited {max_wait_seconds:.1f}s for {self.model_name} quota, giving up."
+                    )
+                    return False
+                timeout = remaining if delay is None else min(delay, remaining)
+                try:
+                    await asyncio.wait_for(waiter.wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+            self._wake_all()
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Corrects the TPM bucket with token count from the response usage metadata."""
+        if actual_tokens is None:
+            return
+        difference = actual_tokens - estimated_tokens
+        if difference > 0:
+            self.tokens.consume(difference)
+        elif difference < 0:
+            self.tokens.refund(-difference)
+        self._wake_all()
+
+    def exhaust(self):
+        """Server answered 429 anyway: stop sending until the request bucket refills."""
+        self.requests.drain()
+
+
+async def notify_queue_position(callback: QueuePositionCallback, position: int):
+    try:
+        await callback(position)
+    except Exception as e:
+        logger.warning(f"Queue position callback failed: {e}", exc_info=False)
+
+
+class QuotaScheduler:
+    """
+    Keeps one ModelQuota per Gemini model.
+    The API key's limits are shared by `processes` worker processes, each takes its share.
+    """
+
+    def __init__(
+        self,
+        model_limits: Dict[str, Dict[str, int]],
+        max_queue_size: int,
+        max_wait_seconds: float,
+        processes: int = 1,
+    ):
+        self.model_limits = model_limits
+        self.max_queue_size = max_queue_size
+        self.max_wait_seconds = max_wait_seconds
+        self.processes = processes
+        self._quotas: Dict[str, ModelQuota] = {}
+
+    def for_model(self, model_name: str) -> ModelQuota:
+        quota = self._quotas.get(model_name)
+        if quota is None:
+            limits = self.model_limits.get(model_name, DEFAULT_MODEL_LIMITS)
+            quota = ModelQuota(
+                model_name,
+                rpm=per_process_limit(
+                    limits.get("rpm", DEFAULT_MODEL_LIMITS["rpm"]), self.processes
+                ),
+                tpm=per_process_limit(
+                    limits.get("tpm", DEFAULT_MODEL_LIMITS["tpm"]), self.processes
+                ),
+                max_queue_size=self.max_queue_size,
+                max_wait_seconds=self.max_wait_seconds,
+            )
+            self._quotas[model_name] = quota
+        return quota
+
+
+if config:
+    quota_scheduler = QuotaScheduler(
+        config.gemini.model_limits,
+        config.gemini.quota_max_queue_size,
+        config.gemini.quota_max_wait_seconds,
+        config.bot.worker_processes,
+    )
+else:
+    quota_scheduler = QuotaScheduler(
+        GEMINI_MODEL_LIMITS,
+        DEFAULT_QUOTA_MAX_QUEUE_SIZE,
+        DEFAULT_QUOTA_MAX_WAIT_SECONDS,
+    )
@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from src.config import (
+    DEFAULT_CIRCUIT_FAILURE_THRESHOLD,
+    DEFAULT_CIRCUIT_RECOVERY_SECONDS,
+    DEFAULT_RETRY_BASE_DELAY_SECONDS,
+    DEFAULT_RETRY_BUDGET_SECONDS,
+    DEFAULT_RETRY_MAX_ATTEMPTS,
+    DEFAULT_RETRY_MAX_DELAY_SECONDS,
+    config,
+)
+from src.services.quota import LOCAL_QUEUE_REJECTED
+from src.utils.deadline import DEADLINE_EXCEEDED, time_left
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Details of error codes which will fail the same way on every attempt.
+NON_TRANSIENT_DETAILS = {"InvalidArgument", "InvalidData", "InvalidImageData"}
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+CIRCUIT_STATE_VALUES = {CIRCUIT_CLOSED: 0, CIRCUIT_HALF_OPEN: 1, CIRCUIT_OPEN: 2}
+
+
+def is_retryable_error(error_code: Optional[str]) -> bool:
+    """Checks if error code is transient, so the same request may succeed on retry."""
+    if not error_code:
+        return False
+    # errors.py imports error codes from gemini.py, which imports this module.
+    from src.services.errors import GEMINI_REQUEST_ERROR, RETRYABLE_ERRORS
+
+    base_error_code, _, details = error_code.partition(":")
+    if base_error_code == GEMINI_REQUEST_ERROR and details:
+        # Details name the exception (InvalidArgument, TypeError, ...),
+        # the same request raises it again.
+        return False
+    return base_error_code in RETRYABLE_ERRORS and details not in NON_TRANSIENT_DETAILS
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = DEFAULT_RETRY_MAX_ATTEMPTS
+    base_delay_seconds: float = DEFAULT_RETRY_BASE_DELAY_SECONDS
+    max_delay_seconds: float = DEFAULT_RETRY_MAX_DELAY_SECONDS
+    budget_seconds: float = DEFAULT_RETRY_BUDGET_SECONDS
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given (1-based) attempt."""
+        ceiling = min(
+            self.max_delay_seconds, self.base_delay_seconds * (2 ** (attempt - 1))
+        )
+        return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    """
+    Per-model circuit breaker.
+    Opens after `failure_threshold` consecutive transient failures, fails fast while open
+    and lets a single probe request through after `recovery_seconds`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, recovery_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        metrics.set_gauge(
+            "gemini_circuit_state", CIRCUIT_STATE_VALUES[self.state], model=name
+        )
+
+    def _transition(self, new_state: str):
+        if new_state == self.state:
+            return
+        logger.warning(
+            f"Circuit breaker for {self.name}: {self.state} -> {new_state} "
+            f"(consecutive failures: {self.consecutive_failures})."
+        )
+        metrics.inc(
+            "gemini_circuit_transitions_total",
+            model=self.name,
+            from_state=self.state,
+            to_state=new_state,
+        )
+        metrics.set_gauge(
+            "gemini_circuit_state", CIRCUIT_STATE_VALUES[new_state], model=self.name
+        )
+        self.state = new_state
+
+    @property
+    def is_open(self) -> bool:
+        return (
+            self.state == CIRCUIT_OPEN
+            and time.monotonic() - self.opened_at < self.recovery_seconds
+        )
+
+    def allow_request(self) -> bool:
+        if self.state == CIRCUIT_CLOSED:
+            return True
+        if self.state == CIRCUIT_OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_seconds:
+                return False
+            self._transition(CIRCUIT_HALF_OPEN)
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def release_probe(self):
+        """Probe request ended without telling anything about model health."""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self._transition(CIRCUIT_CLOSED)
+
+    def record_failure(self):
+        self._probe_in_flight = False
+        self.consecutive_failures += 1
+        if (
+            self.state == CIRCUIT_HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            self.opened_at = time.monotonic()
+            self._transition(CIRCUIT_OPEN)
+
+
+class CircuitBreakerRegistry:
+    def __init__(self, failure_threshold: int, recovery_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name, self.failure_threshold, self.recovery_seconds
+            )
+            self._breakers[name] = breaker
+        return breaker
+
+
+if config:
+    retry_policy = RetryPolicy(
+        max_attempts=config.gemini.retry_max_attempts,
+        base_delay_seconds=config.gemini.retry_base_delay_seconds,
+        max_delay_seconds=config.gemini.retry_max_delay_seconds,
+        budget_seconds=config.gemini.retry_budget_seconds,
+    )
+    circuit_breakers = CircuitBreakerRegistry(
+        config.gemini.circuit_failure_threshold,
+        config.gemini.circuit_recovery_seconds,
+    )
+else:
+    retry_policy = RetryPolicy()
+    circuit_breakers = CircuitBreakerRegistry(
+        DEFAULT_CIRCUIT_FAILURE_THRESHOLD, DEFAULT_CIRCUIT_RECOVERY_SECONDS
+    )
+
+
+async def call_with_resilience(
+    operation: Callable[[], Awaitable[Tuple[Optional[T], Optional[str]]]],
+    model_name: str,
+    circuit_open_error: str,
+    policy: Optional[RetryPolicy] = None,
+) -> Tuple[Optional[T], Optional[str]]:
+    """
+    Runs `operation` (returning (result | None, error_code | None)) with retries
+    on transient error codes, exponential backoff with jitter and a per-model circuit breaker.
+    Retries stop when attempts or the time budget (cut to the update's deadline) are used up.
+    """
+    policy = policy or retry_policy
+    breaker = circuit_breakers.get(model_name)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + time_left(policy.budget_seconds)
+    attempt = 0
+
+    while True:
+        if not breaker.allow_request():
+            logger.warning(f"Circuit for {model_name} is open, failing fast.")
+            metrics.inc("gemini_circuit_rejections_total", model=model_name)
+            return None, circuit_open_error
+
+        attempt += 1
+        try:
+            result, error_code = await operation()
+        except BaseException:
+            breaker.release_probe()
+            raise
+
+        if error_code and (
+            error_code.endswith(f":{LOCAL_QUEUE_REJECTED}")
+            or error_code == DEADLINE_EXCEEDED
+        ):
+            # Request never reached the API or was cut by the update's deadline,
+            # it says nothing about model health.
+            breaker.release_probe()
+            return result, error_code
+
+        if error_code is None:
+            breaker.record_success()
+            return result, error_code
+
+        if not is_retryable_error(error_code):
+            # Quota, API key, blocked content or invalid request: the model answered,
+            # but it's not a successful call either, so it must not close the circuit.
+            breaker.release_probe()
+            return result, error_code
+
+        breaker.record_failure()
+        if attempt >= policy.max_attempts:
+            logger.warning(
+                f"Giving up on {model_name} after {attempt} attempts: {error_code}"
+            )
+            return result, error_code
+
+        delay = policy.backoff(attempt)
+        if loop.time() + delay >= deadline:
+            logger.warning(
+                f"Retry budget for {model_name} exhausted after {attempt} attempts: {error_code}"
+            )
+            return result, error_code
+
+        logger.info(
+            f"Transient error from {model_name} ({error_code}), retry {attempt} in {delay:.2f}s."
+        )
+        metrics.inc(
+            "gemini_retries_total", model=model_name, error=error_code.split(":")[0]
+        )
+        await asyncio.sleep(delay)
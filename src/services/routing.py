@@ -0,0 +1,198 @@
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from src.config import (
+    AUTO_ROUTE_DEEP_HISTORY_MESSAGES,
+    AUTO_ROUTE_FAST_MODEL,
+    AUTO_ROUTE_LONG_PROMPT_CHARS,
+    AUTO_ROUTE_SCORE_THRESHOLD,
+    AUTO_ROUTE_STRONG_MODEL,
+    AUTO_ROUTE_VERY_LONG_PROMPT_CHARS,
+    DEFAULT_MODEL_COOLDOWN_SECONDS,
+    MODEL_FALLBACKS,
+    config,
+)
+from src.services.resilience import circuit_breakers
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+AUTO_ROUTE_FAST = "fast"
+AUTO_ROUTE_STRONG = "strong"
+
+CODE_MARKERS = re.compile(
+    r"```|^\s*(def|class|import|return|#include|function|public|private|SELECT)\b"
+    r"|[{};]\s*$|=>|->|::",
+    re.MULTILINE,
+)
+MATH_MARKERS = re.compile(
+    r"\\(frac|int|sum|sqrt|lim|cdot)|[∫∑√∞≤≥≠±∂]|\d\s*[\^=]\s*\d|\b[xyz]\s*\^\s*\d"
+    r"|\b(prove|proof|theorem|lemma|derivative|integral|equation)"
+    r"|\b(доказ|теорем|производн|интеграл|уравнени)",
+    re.IGNORECASE,
+)
+
+
+class ModelRouter:
+    """
+    Chooses which text models to try for a request.
+    Models that recently failed with quota/availability errors are skipped
+    for a cool-down period, so later requests go straight to a healthy fallback.
+    """
+
+    def __init__(self, fallbacks: Dict[str, List[str]], cooldown_seconds: float):
+        self.fallbacks = fallbacks
+        self.cooldown_seconds = cooldown_seconds
+        self._degraded_until: Dict[str, float] = {}
+
+    def is_degraded(self, model_name: str) -> bool:
+        if circuit_breakers.get(model_name).is_open:
+            return True
+        degraded_until = self._degraded_until.get(model_name)
+        if degraded_until is None:
+            return False
+        if time.monotonic() >= degraded_until:
+            del self._degraded_until[model_name]
+            metrics.set_gauge("gemini_model_degraded", 0, model=model_name)
+            logger.info(f"Model {model_name} cool-down is over.")
+            return False
+        return True
+
+    def mark_degraded(self, model_name: str, reason: str):
+        logger.warning(
+            f"Model {model_name} marked degraded for {self.cooldown_seconds}s: {reason}"
+        )
+        self._degraded_until[model_name] = time.monotonic() + self.cooldown_seconds
+        metrics.set_gauge("gemini_model_degraded", 1, model=model_name)
+
+    def candidates(self, model_name: str) -> List[str]:
+        """
+        Returns models to try in order: selected model and its fallback chain,
+        without degraded ones. If every model is degraded, the whole chain is returned.
+        """
+        chain = [model_name] + [
+            m for m in self.fallbacks.get(model_name, []) if m != model_name
+        ]
+        healthy = [m for m in chain if not self.is_degraded(m)]
+        return healthy or chain
+
+    def record_fallback(self, requested_model: str, used_model: str, reason: str):
+        logger.info(f"Request for {requested_model} served by {used_model} ({reason}).")
+        metrics.inc(
+            "gemini_fallbacks_total",
+            requested_model=requested_model,
+            used_model=used_model,
+            reason=reason,
+        )
+
+
+@dataclass
+class RouteDecision:
+    model_name: str
+    route: str
+    score: int
+    reasons: List[str] = field(default_factory=list)
+
+
+class ComplexityRouter:
+    """
+    Cheap local classifier for the "auto" model.
+    Scores a request by prompt length, code/math markers, attached document and
+    history depth. Requests scoring at least `score_threshold` go to the strong model,
+    everything else to the fast one.
+    """
+
+    def __init__(
+        self,
+        fast_model: str = AUTO_ROUTE_FAST_MODEL,
+        strong_model: str = AUTO_ROUTE_STRONG_MODEL,
+        long_prompt_chars: int = AUTO_ROUTE_LONG_PROMPT_CHARS,
+        very_long_prompt_chars: int = AUTO_ROUTE_VERY_LONG_PROMPT_CHARS,
+        deep_history_messages: int = AUTO_ROUTE_DEEP_HISTORY_MESSAGES,
+        score_threshold: int = AUTO_ROUTE_SCORE_THRESHOLD,
+    ):
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.long_prompt_chars = long_prompt_chars
+        self.very_long_prompt_chars = very_long_prompt_chars
+        self.deep_history_messages = deep_history_messages
+        self.score_threshold = score_threshold
+
+    def score(
+        self, prompt: str, history_depth: int, has_document: bool = False
+    ) -> tuple[int, List[str]]:
+        """Returns complexity score of the request and the reasons that added to it."""
+        score = 0
+        reasons: List[str] = []
+        if len(prompt) >= self.very_long_prompt_chars:
+            score += 2
+            reasons.append("very_long_prompt")
+        elif len(prompt) >= self.long_prompt_chars:
+            score += 1
+            reasons.append("long_prompt")
+        if CODE_MARKERS.search(prompt):
+            score += 2
+            reasons.append("code")
+        if MATH_MARKERS.search(prompt):
+            score += 2
+            reasons.append("math")
+        if has_document:
+            score += 1
+            reasons.append("document")
+        if history_depth >= self.deep_history_messages:
+            score += 1
+            reasons.append("deep_history")
+        return score, reasons
+
+    def route(
+        self, prompt: str, history_depth: int, has_document: bool = False
+    ) -> RouteDecision:
+        score, reasons = self.score(prompt, history_depth, has_document)
+        if score >= self.score_threshold:
+            decision = RouteDecision(
+                self.strong_model, AUTO_ROUTE_STRONG, score, reasons
+            )
+        else:
+            decision = RouteDecision(self.fast_model, AUTO_ROUTE_FAST, score, reasons)
+        logger.debug(
+            f"Auto route: {decision.route} ({decision.model_name}), score {score}, reasons {reasons}."
+        )
+        metrics.inc("gemini_auto_routes_total", route=decision.route)
+        for reason in reasons:
+            metrics.inc("gemini_auto_route_reasons_total", reason=reason)
+        return decision
+
+    def record_result(
+        self,
+        decision: RouteDecision,
+        seconds: float,
+        estimated_tokens: int,
+        error_code: Optional[str],
+    ):
+        """Records latency and estimated token cost of a request sent by auto route."""
+        if error_code:
+            metrics.inc(
+                "gemini_auto_route_errors_total",
+                route=decision.route,
+                error=error_code.split(":")[0],
+            )
+            return
+        metrics.observe(
+            "gemini_auto_route_latency_seconds", seconds, route=decision.route
+        )
+        metrics.inc(
+            "gemini_auto_route_tokens_total", estimated_tokens, route=decision.route
+        )
+
+
+complexity_router = ComplexityRouter()
+
+if config:
+    model_router = ModelRouter(
+        config.gemini.model_fallbacks, config.gemini.model_cooldown_seconds
+    )
+else:
+    model_router = ModelRouter(MODEL_FALLBACKS, DEFAULT_MODEL_COOLDOWN_SECONDS)
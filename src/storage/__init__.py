@@ -0,0 +1,25 @@
+from .backend import StorageBackend
+from .cached import CachedStorage
+from .history_cache import HistoryCache, history_cache
+from .lease import LeaseManager, user_lease
+from .memory import MemoryBackend
+from .mongo import MongoBackend
+from .retention import RetentionSweeper, retention_sweeper
+from .sqlite import SQLiteBackend
+from .write_behind import WriteBehindQueue, write_behind
+
+__all__ = [
+    "CachedStorage",
+    "HistoryCache",
+    "LeaseManager",
+    "MemoryBackend",
+    "MongoBackend",
+    "RetentionSweeper",
+    "SQLiteBackend",
+    "StorageBackend",
+    "WriteBehindQueue",
+    "history_cache",
+    "retention_sweeper",
+    "user_lease",
+    "write_behind",
+]
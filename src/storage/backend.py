@@ -0,0 +1,116 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.fsm.storage.base import BaseStorage
+
+from src.config import (
+    CONVERSATION_TITLE_MAX_CHARS,
+    DEFAULT_GEMINI_MAX_TOKENS,
+    DEFAULT_GEMINI_TEMPERATURE,
+    DEFAULT_SPEED_MODE,
+)
+
+USER_SETTINGS_FIELDS = (
+    "gemini_temperature",
+    "gemini_max_tokens",
+    "gemini_speed_mode",
+    "message_debounce",
+)
+
+
+def conversation_title(messages: List[Dict[str, Any]]) -> Optional[str]:
+    """Title of a conversation: beginning of its first user message."""
+    for msg in messages:
+        if msg.get("role") != "user":
+            continue
+        for part in msg.get("parts", []):
+            text = part.get("text", "").strip() if isinstance(part, dict) else ""
+            if text:
+                return text[:CONVERSATION_TITLE_MAX_CHARS]
+    return None
+
+
+class StorageBackend(ABC):
+    """
+    Storage of everything the bot keeps about users: settings, conversations
+    with their history, and FSM state (through `create_fsm_storage`).
+    Methods don't raise on storage errors: they log them and return
+    False / None / empty values, like the rest of the data layer.
+    """
+
+    name: str
+
+    @abstractmethod
+    async def connect(self) -> bool:
+        """Opens the storage. Returns False if it's not available."""
+
+    @abstractmethod
+    async def close(self):
+        """Flushes pending writes and closes the storage."""
+
+    @abstractmethod
+    def create_fsm_storage(self) -> BaseStorage:
+        """FSM storage for the dispatcher, kept in the same store."""
+
+    @abstractmethod
+    async def get_history(self, user_id: int) -> List[Dict[str, Any]]:
+        """Latest messages of the user's current conversation."""
+
+    @abstractmethod
+    async def get_user_data(
+        self, user_id: int, include_history: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Saved settings of the user (only USER_SETTINGS_FIELDS that are set),
+        plus "history" if `include_history`. Unknown users have no settings
+        and empty history.
+        """
+
+    @abstractmethod
+    async def save_user_setting(
+        self, user_id: int, setting_name: str, setting_value: Any
+    ) -> bool:
+        """Saves one of USER_SETTINGS_FIELDS."""
+
+    @abstractmethod
+    async def append_history(
+        self, user_id: int, messages: List[Dict[str, Any]]
+    ) -> bool:
+        """Appends messages to the user's current conversation."""
+
+    @abstractmethod
+    async def start_conversation(
+        self, user_id: int, title: Optional[str] = None
+    ) -> bool:
+        """Starts a new current conversation, keeping the previous one."""
+
+    @abstractmethod
+    async def list_conversations(
+        self, user_id: int
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Latest conversations of the user, newest first, as dicts with
+        "conversation_id" and "title", and id of the current conversation.
+        """
+
+    @abstractmethod
+    async def switch_conversation(
+        self, user_id: int, conversation_id: int
+    ) -> Optional[Dict[str, Any]]:
+        """Makes a conversation current. Returns it, or None if it's not found."""
+
+    @abstractmethod
+    async def delete_user_data(self, user_id: int) -> bool:
+        """Deletes everything stored for the user. Returns False if nothing was found."""
+
+    async def get_user_settings(self, user_id: int) -> Tuple[float, int, str]:
+        """
+        Extracts Gemini settings for user.
+        Return (temperature, max_tokens, speed_mode), with defaults for unset ones.
+        """
+        doc = await self.get_user_data(user_id, include_history=False)
+        return (
+            doc.get("gemini_temperature", DEFAULT_GEMINI_TEMPERATURE),
+            doc.get("gemini_max_tokens", DEFAULT_GEMINI_MAX_TOKENS),
+            doc.get("gemini_speed_mode", DEFAULT_SPEED_MODE),
+        )
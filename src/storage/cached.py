@@ -0,0 +1,223 @@
+import asyncio
+import copy
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseStorage,
+    DefaultKeyBuilder,
+    KeyBuilder,
+    StateType,
+    StorageKey,
+)
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import OperationFailure, PyMongoError
+
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before reopening a failed change stream.
+INVALIDATION_RETRY_SECONDS = 5.0
+# MongoDB error code: change streams are only supported on replica sets.
+CHANGE_STREAM_NOT_SUPPORTED = 40573
+
+_MISSING = object()
+
+
+@dataclass
+class _Entry:
+    expires_at: float
+    state: Any = _MISSING
+    data: Any = _MISSING
+
+
+def _resolve_state(state: StateType) -> Optional[str]:
+    if state is None:
+        return None
+    if isinstance(state, State):
+        return state.state
+    return str(state)
+
+
+class CachedStorage(BaseStorage):
+    """
+    Read-through, write-through cache over another FSM storage.
+    Keeps state and data of the latest `max_entries` keys for `ttl_seconds`,
+    and skips writes that wouldn't change anything.
+    With `start_invalidation` entries changed by other bot instances are dropped
+    using a MongoDB change stream on the FSM collection.
+    """
+
+    def __init__(
+        self,
+        storage: BaseStorage,
+        max_entries: int,
+        ttl_seconds: float,
+        key_builder: Optional[KeyBuilder] = None,
+    ):
+        self.storage = storage
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Must build the same document ids as the wrapped storage.
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self._entries: "OrderedDict[StorageKey, _Entry]" = OrderedDict()
+        self._keys_by_id: Dict[str, StorageKey] = {}
+        self._invalidation_task: Optional[asyncio.Task] = None
+
+    def _get_entry(self, key: StorageKey) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry.expires_at:
+            self.invalidate(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: StorageKey, **values: Any):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _Entry(expires_at=0.0)
+            self._entries[key] = entry
+            self._keys_by_id[self.key_builder.build(key)] = key
+        for name, value in values.items():
+            setattr(entry, name, value)
+        entry.expires_at = time.monotonic() + self.ttl_seconds
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            oldest_key = next(iter(self._entries))
+            self.invalidate(oldest_key)
+        metrics.set_gauge("fsm_cache_entries", len(self._entries))
+
+    def invalidate(self, key: StorageKey):
+        if self._entries.pop(key, None) is not None:
+            self._keys_by_id.pop(self.key_builder.build(key), None)
+            metrics.set_gauge("fsm_cache_entries", len(self._entries))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        entry = self._get_entry(key)
+        if entry is not None and entry.state is not _MISSING:
+            metrics.inc("fsm_cache_hits_total", operation="get_state")
+            return entry.state
+        metrics.inc("fsm_cache_misses_total", operation="get_state")
+        state = await self.storage.get_state(key)
+        self._put(key, state=state)
+        return state
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = _resolve_state(state)
+        entry = self._get_entry(key)
+        if entry is not None and entry.state == state:
+            metrics.inc("fsm_cache_skipped_writes_total", operation="set_state")
+            return
+        try:
+            await self.storage.set_state(key, state)
+        except Exception:
+            self.invalidate(key)
+            raise
+        self._put(key, state=state)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        entry = self._get_entry(key)
+        if entry is not None and entry.data is not _MISSING:
+            metrics.inc("fsm_cache_hits_total", operation="get_data")
+            return copy.deepcopy(entry.data)
+        metrics.inc("fsm_cache_misses_total", operation="get_data")
+        data = await self.storage.get_data(key)
+        self._put(key, data=copy.deepcopy(data))
+        return data
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        entry = self._get_entry(key)
+        if entry is not None and entry.data == data:
+            metrics.inc("fsm_cache_skipped_writes_total", operation="set_data")
+            return
+        try:
+            await self.storage.set_data(key, data)
+        except Exception:
+            self.invalidate(key)
+            raise
+        self._put(key, data=copy.deepcopy(dict(data)))
+
+    async def update_data(
+        self, key: StorageKey, data: Mapping[str, Any]
+    ) -> Dict[str, Any]:
+        entry = self._get_entry(key)
+        if entry is not None and entry.data is not _MISSING:
+            if all(k in entry.data and entry.data[k] == v for k, v in data.items()):
+                metrics.inc("fsm_cache_skipped_writes_total", operation="update_data")
+                return copy.deepcopy(entry.data)
+        try:
+            new_data = await self.storage.update_data(key, data)
+        except Exception:
+            self.invalidate(key)
+            raise
+        self._put(key, data=copy.deepcopy(new_data))
+        return new_data
+
+    def start_invalidation(self, collection: AsyncIOMotorCollection):
+        """Starts dropping entries changed by other instances (needs a replica set)."""
+        if self._invalidation_task is None:
+            self._invalidation_task = asyncio.create_task(
+                self._watch_changes(collection)
+            )
+
+    async def _watch_changes(self, collection: AsyncIOMotorCollection):
+        while True:
+            try:
+                async with collection.watch(full_document="updateLookup") as stream:
+                    logger.info("FSM cache: watching FSM collection for changes.")
+                    async for change in stream:
+                        self._on_change(change)
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                if (
+                    isinstance(e, OperationFailure)
+                    and e.code == CHANGE_STREAM_NOT_SUPPORTED
+                ):
+                    logger.error(
+                        "FSM cache: change streams need a replica set, cross-instance invalidation is disabled."
+                    )
+                    return
+                # Entries written while the stream was down may be stale.
+                self._entries.clear()
+                self._keys_by_id.clear()
+                metrics.set_gauge("fsm_cache_entries", 0)
+                logger.warning(
+                    f"FSM cache: change stream failed, cache cleared, reopening in {INVALIDATION_RETRY_SECONDS}s: {e}"
+                )
+                await asyncio.sleep(INVALIDATION_RETRY_SECONDS)
+
+    def _on_change(self, change: Dict[str, Any]):
+        document_id = change.get("documentKey", {}).get("_id")
+        key = self._keys_by_id.get(document_id)
+        if key is None:
+            return
+        entry = self._entries.get(key)
+        document = change.get("fullDocument")
+        if entry is not None and document is not None:
+            # Changes written by this instance are already in the cache.
+            same_state = entry.state is _MISSING or entry.state == document.get("state")
+            same_data = entry.data is _MISSING or entry.data == (
+                document.get("data") or {}
+            )
+            if same_state and same_data:
+                return
+        self.invalidate(key)
+        metrics.inc("fsm_cache_invalidations_total")
+
+    async def close(self) -> None:
+        if self._invalidation_task:
+            self._invalidation_task.cancel()
+            try:
+                await self._invalidation_task
+            except asyncio.CancelledError:
+                pass
+            self._invalidation_task = None
+        await self.storage.close()
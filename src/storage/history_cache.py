@@ -0,0 +1,100 @@
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import DEFAULT_HISTORY_CACHE_MAX_BYTES, config
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Rough per-message overhead of dicts and lists on top of the text itself.
+MESSAGE_OVERHEAD_BYTES = 200
+
+
+def history_size(history: List[Dict[str, Any]]) -> int:
+    """Estimates memory taken by history (texts plus fixed overhead per message)."""
+    size = 0
+    for msg in history:
+        size += MESSAGE_OVERHEAD_BYTES
+        for part in msg.get("parts", []) if isinstance(msg, dict) else []:
+            if isinstance(part, dict):
+                size += len(part.get("text", "")) * 2
+    return size
+
+
+class HistoryCache:
+    """
+    LRU cache of chat histories bounded by their total estimated size in bytes.
+    Histories are kept only while they are also written through to MongoDB,
+    so a cached history is always the latest saved one for this process.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[int, Tuple[List[Dict[str, Any]], int]]" = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[List[Dict[str, Any]]]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            metrics.inc("history_cache_misses_total")
+            self._update_hit_ratio()
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        metrics.inc("history_cache_hits_total")
+        self._update_hit_ratio()
+        return list(entry[0])
+
+    def put(self, user_id: int, history: List[Dict[str, Any]]):
+        self.invalidate(user_id)
+        size = history_size(history)
+        if size > self.max_bytes:
+            logger.debug(
+                f"History of user_id={user_id} ({size} bytes) is bigger than the cache."
+            )
+            return
+        self._entries[user_id] = (list(history), size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+            metrics.inc("history_cache_evictions_total")
+        self._update_size()
+
+    def append(self, user_id: int, messages: List[Dict[str, Any]], max_messages: int):
+        """Appends messages to a cached history, keeping its latest `max_messages`."""
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            self.put(user_id, (entry[0] + messages)[-max_messages:])
+
+    def invalidate(self, user_id: int):
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+            self._update_size()
+
+    def clear(self):
+        self._entries.clear()
+        self.total_bytes = 0
+        self._update_size()
+
+    def _update_size(self):
+        metrics.set_gauge("history_cache_bytes", self.total_bytes)
+        metrics.set_gauge("history_cache_entries", len(self._entries))
+
+    def _update_hit_ratio(self):
+        metrics.set_gauge(
+            "history_cache_hit_ratio", self.hits / (self.hits + self.misses)
+        )
+
+
+if config:
+    history_cache = HistoryCache(config.mongo.history_cache_max_bytes)
+else:
+    history_cache = HistoryCache(DEFAULT_HISTORY_CACHE_MAX_BYTES)
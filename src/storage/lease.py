@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+
+from src.config import (
+    DEFAULT_LEASE_ACQUIRE_TIMEOUT_SECONDS,
+    DEFAULT_LEASE_TTL_SECONDS,
+    LEASES_COLLECTION_NAME,
+    config,
+)
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Fencing token of the lease held by the current task, None outside of a lease.
+# History writes of MongoBackend are rejected if a newer token was already used.
+current_lease_token: ContextVar[Optional[int]] = ContextVar(
+    "current_lease_token", default=None
+)
+ACQUIRE_RETRY_SECONDS = 0.25
+
+
+class LeaseUnavailable(Exception):
+    """The lease stayed held by another instance for the whole acquire timeout."""
+
+
+@dataclass
+class Lease:
+    user_id: int
+    # Grows with every acquisition, so a write with a smaller one is stale.
+    token: int
+    # The lease was last held by another instance: local caches may be stale.
+    owner_changed: bool = False
+
+
+@dataclass
+class _Held:
+    acquiring: asyncio.Lock = field(default_factory=asyncio.Lock)
+    holders: int = 0
+    lease: Optional[Lease] = None
+    heartbeat: Optional[asyncio.Task] = None
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class LeaseManager:
+    """
+    Per-user leases in MongoDB, one document per user: owner instance, expiry
+    and fencing token. A lease is renewed by a heartbeat while it's held and
+    expires `ttl_seconds` after the holder dies. Tasks of the same instance
+    share a held lease without round trips; it's released when the last one leaves.
+    The collection uses majority read/write concern, so a lease survives
+    a replica set failover, and the fencing token rejects writes of a holder
+    that lost its lease anyway (e.g. after a long pause).
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        ttl_seconds: float,
+        acquire_timeout_seconds: float,
+        owner: Optional[str] = None,
+    ):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.acquire_timeout_seconds = acquire_timeout_seconds
+        self.owner = owner or (
+            f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        )
+        self._collection: Optional[AsyncIOMotorCollection] = None
+        self._held: Dict[int, _Held] = {}
+
+    @property
+    def active(self) -> bool:
+        return self._collection is not None
+
+    async def start(self, db: AsyncIOMotorDatabase):
+        if not self.enabled:
+            return
+        self._collection = db.get_collection(
+            LEASES_COLLECTION_NAME,
+            write_concern=WriteConcern("majority"),
+            read_concern=ReadConcern("majority"),
+        )
+        logger.info(f"User leases enabled, instance {self.owner}.")
+
+    async def stop(self):
+        """Releases held leases, so other instances don't wait for them to expire."""
+        for held in self._held.values():
+            if held.heartbeat is not None:
+                held.heartbeat.cancel()
+            held.lease = None
+        if self._collection is None:
+            return
+        try:
+            # The owner is kept, so the next holder knows who had it before.
+            await self._collection.update_many(
+                {"owner": self.owner, "expires_at": {"$gt": _now()}},
+                {"$set": {"expires_at": _now()}},
+            )
+        except PyMongoError as e:
+            logger.warning(f"Cannot release leases of instance {self.owner}: {e}")
+        self._collection = None
+
+    @asynccontextmanager
+    async def hold(self, user_id: int) -> AsyncIterator[Lease]:
+        """
+        Holds the lease of the user in the block, waiting while another instance
+        has it. Raises LeaseUnavailable after `acquire_timeout_seconds`.
+        """
+        held = self._held.setdefault(user_id, _Held())
+        held.holders += 1
+        try:
+            async with held.acquiring:
+                if held.lease is None:
+                    held.lease = await self._acquire(user_id)
+                    held.heartbeat = asyncio.create_task(self._heartbeat(held))
+                    lease = held.lease
+                else:
+                    metrics.inc("lease_local_reuses_total")
+                    lease = Lease(user_id, held.lease.token)
+            reset_token = current_lease_token.set(lease.token)
+            try:
+                yield lease
+            finally:
+                current_lease_token.reset(reset_token)
+        finally:
+            held.holders -= 1
+            if held.holders == 0:
+                del self._held[user_id]
+                if held.lease is not None:
+                    held.heartbeat.cancel()
+                    await self._release(held.lease)
+
+    async def _acquire(self, user_id: int) -> Lease:
+        started = time.monotonic()
+        while True:
+            now = _now()
+            try:
+                # Matches a free lease or our own; a lease held by another
+                # instance doesn't match, and the upsert fails on the _id.
+                before = await self._collection.find_one_and_update(
+                    {
+                        "_id": user_id,
+                        "$or": [{"owner": self.owner}, {"expires_at": {"$lte": now}}],
+                    },
+                    [
+                        {
+                            "$set": {
+                                "owner": self.owner,
+                                "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                                "token": {"$add": [{"$ifNull": ["$token", 0]}, 1]},
+                            }
+                        }
+                    ],
+                    upsert=True,
+                    return_document=ReturnDocument.BEFORE,
+                )
+                before = before or {}
+                metrics.inc("lease_acquired_total")
+                metrics.observe("lease_wait_seconds", time.monotonic() - started)
+                return Lease(
+                    user_id,
+                    token=before.get("token", 0) + 1,
+                    owner_changed=before.get("owner", self.owner) != self.owner,
+                )
+            except DuplicateKeyError:
+                pass
+            except PyMongoError as e:
+                logger.warning(f"Error while acquiring lease of user {user_id}: {e}")
+            if time.monotonic() - started >= self.acquire_timeout_seconds:
+                metrics.inc("lease_timeouts_total")
+                raise LeaseUnavailable(user_id)
+            await asyncio.sleep(ACQUIRE_RETRY_SECONDS)
+
+    async def _heartbeat(self, held: _Held):
+        """Renews the held lease; if it was lost, the next holder acquires a new one."""
+        lease = held.lease
+        while True:
+            await asyncio.sleep(self.ttl_seconds / 3)
+            try:
+                result = await self._collection.update_one(
+                    {"_id": lease.user_id, "owner": self.owner, "token": lease.token},
+                    {
+                        "$set": {
+                            "expires_at": _now() + timedelta(seconds=self.ttl_seconds)
+                        }
+                    },
+                )
+            except PyMongoError as e:
+                logger.warning(f"Cannot renew lease of user {lease.user_id}: {e}")
+                continue
+            if result.matched_count == 0:
+                metrics.inc("lease_lost_total")
+                logger.error(
+                    f"Lease of user {lease.user_id} was lost, its writes are fenced."
+                )
+                if held.lease is lease:
+                    held.lease = None
+                return
+
+    async def _release(self, lease: Lease):
+        if self._collection is None:
+            return
+        try:
+            # The owner is kept, so the next holder knows who had it before.
+            await self._collection.update_one(
+                {"_id": lease.user_id, "owner": self.owner, "token": lease.token},
+                {"$set": {"expires_at": _now()}},
+            )
+        except PyMongoError as e:
+            logger.warning(f"Cannot release lease of user {lease.user_id}: {e}")
+
+
+if config:
+    user_lease = LeaseManager(
+        config.mongo.lease_enabled,
+        config.mongo.lease_ttl_seconds,
+        config.mongo.lease_acquire_timeout_seconds,
+    )
+else:
+    user_lease = LeaseManager(
+        False, DEFAULT_LEASE_TTL_SECONDS, DEFAULT_LEASE_ACQUIRE_TIMEOUT_SECONDS
+    )
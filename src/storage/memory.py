@@ -0,0 +1,139 @@
+import copy
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from src.config import CONVERSATION_TITLE_MAX_CHARS, CONVERSATIONS_LIST_LIMIT
+from src.storage.backend import USER_SETTINGS_FIELDS, StorageBackend, conversation_title
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Conversation:
+    title: Optional[str] = None
+    updated_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class _User:
+    settings: Dict[str, Any] = field(default_factory=dict)
+    conversation_id: int = 0
+    last_conversation_id: int = 0
+    conversations: Dict[int, _Conversation] = field(default_factory=dict)
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Storage in process memory, FSM in aiogram MemoryStorage.
+    Everything is lost on restart: meant for load tests and local runs
+    without a database.
+    """
+
+    name = "memory"
+
+    def __init__(self, history_window_messages: int):
+        self.history_window_messages = history_window_messages
+        self._users: Dict[int, _User] = {}
+
+    async def connect(self) -> bool:
+        logger.warning("Using in-memory storage, data is lost on restart.")
+        return True
+
+    async def close(self):
+        pass
+
+    def create_fsm_storage(self) -> BaseStorage:
+        return MemoryStorage()
+
+    async def get_history(self, user_id: int) -> List[Dict[str, Any]]:
+        user = self._users.get(user_id)
+        if user is None or user.conversation_id not in user.conversations:
+            return []
+        messages = user.conversations[user.conversation_id].messages
+        return copy.deepcopy(messages[-self.history_window_messages :])
+
+    async def get_user_data(
+        self, user_id: int, include_history: bool = True
+    ) -> Dict[str, Any]:
+        user = self._users.get(user_id)
+        doc = dict(user.settings) if user else {}
+        if include_history:
+            doc["history"] = await self.get_history(user_id)
+        return doc
+
+    async def save_user_setting(
+        self, user_id: int, setting_name: str, setting_value: Any
+    ) -> bool:
+        if setting_name not in USER_SETTINGS_FIELDS:
+            logger.error(
+                f"Trying to save unknown setting '{setting_name}' for user_id={user_id}"
+            )
+            return False
+        self._users.setdefault(user_id, _User()).settings[setting_name] = setting_value
+        return True
+
+    async def append_history(
+        self, user_id: int, messages: List[Dict[str, Any]]
+    ) -> bool:
+        if not messages:
+            return True
+        user = self._users.setdefault(user_id, _User())
+        conversation = user.conversations.setdefault(
+            user.conversation_id, _Conversation()
+        )
+        conversation.messages.extend(copy.deepcopy(messages))
+        conversation.title = conversation.title or conversation_title(messages)
+        conversation.updated_at = datetime.now(timezone.utc)
+        return True
+
+    async def start_conversation(
+        self, user_id: int, title: Optional[str] = None
+    ) -> bool:
+        user = self._users.setdefault(user_id, _User())
+        user.last_conversation_id = (
+            max(user.last_conversation_id, user.conversation_id) + 1
+        )
+        user.conversation_id = user.last_conversation_id
+        if title:
+            user.conversations[user.conversation_id] = _Conversation(
+                title=title[:CONVERSATION_TITLE_MAX_CHARS]
+            )
+        return True
+
+    async def list_conversations(
+        self, user_id: int
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        user = self._users.get(user_id)
+        if user is None:
+            return [], 0
+        latest = sorted(
+            user.conversations.items(),
+            key=lambda item: item[1].updated_at,
+            reverse=True,
+        )[:CONVERSATIONS_LIST_LIMIT]
+        conversations = [
+            {"conversation_id": conversation_id, "title": conversation.title}
+            for conversation_id, conversation in latest
+        ]
+        return conversations, user.conversation_id
+
+    async def switch_conversation(
+        self, user_id: int, conversation_id: int
+    ) -> Optional[Dict[str, Any]]:
+        user = self._users.get(user_id)
+        if user is None or conversation_id not in user.conversations:
+            return None
+        user.conversation_id = conversation_id
+        return {
+            "conversation_id": conversation_id,
+            "title": user.conversations[conversation_id].title,
+        }
+
+    async def delete_user_data(self, user_id: int) -> bool:
+        return self._users.pop(user_id, None) is not None
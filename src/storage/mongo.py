@@ -0,0 +1,691 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.mongo import MongoStorage
+from motor.motor_asyncio import (
+    AsyncIOMotorClient,
+    AsyncIOMotorCollection,
+    AsyncIOMotorDatabase,
+)
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import (
+    BulkWriteError,
+    ConnectionFailure,
+    DuplicateKeyError,
+    NetworkTimeout,
+    OperationFailure,
+    ServerSelectionTimeoutError,
+)
+
+from src.config import (
+    CONVERSATION_TITLE_MAX_CHARS,
+    CONVERSATIONS_COLLECTION_NAME,
+    CONVERSATIONS_LIST_LIMIT,
+    DEFAULT_FSM_CACHE_MAX_ENTRIES,
+    DEFAULT_FSM_CACHE_TTL_SECONDS,
+    DEFAULT_HISTORY_WINDOW_MESSAGES,
+    FSM_COLLECTION_NAME,
+    FSM_DB_NAME,
+    MESSAGES_ARCHIVE_COLLECTION_NAME,
+    MESSAGES_COLLECTION_NAME,
+    config,
+)
+from src.storage.backend import USER_SETTINGS_FIELDS, StorageBackend, conversation_title
+from src.storage.cached import CachedStorage
+from src.storage.history_cache import history_cache
+from src.storage.lease import current_lease_token, user_lease
+from src.storage.retention import (
+    HISTORY_EXPIRED_FIELD,
+    LAST_ACTIVE_FIELD,
+    LEGACY_HISTORY_FIELD,
+    MESSAGE_COUNT_FIELD,
+    SEQ_FIELD,
+    retention_sweeper,
+)
+from src.storage.write_behind import write_behind
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# User document fields: id of the current conversation and last created conversation.
+CONVERSATION_FIELD = "conversation_id"
+LAST_CONVERSATION_FIELD = "last_conversation_id"
+# Highest lease fencing token used to write the user's history.
+LEASE_TOKEN_FIELD = "lease_token"
+# MongoDB duplicate key error code.
+DUPLICATE_KEY_ERROR = 11000
+
+HISTORY_WINDOW_MESSAGES = (
+    config.mongo.history_window_messages if config else DEFAULT_HISTORY_WINDOW_MESSAGES
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class MongoBackend(StorageBackend):
+    """
+    Storage in MongoDB: user documents, messages and conversations collections
+    in the DB from the config, FSM in the aiogram MongoStorage collection.
+    Optionally batches user document writes (write-behind) and runs the
+    retention sweeper.
+    """
+
+    name = "mongo"
+
+    def __init__(
+        self,
+        uri: str,
+        db_name: str,
+        fsm_cache_max_entries: int = DEFAULT_FSM_CACHE_MAX_ENTRIES,
+        fsm_cache_ttl_seconds: float = DEFAULT_FSM_CACHE_TTL_SECONDS,
+        fsm_cache_invalidation: bool = False,
+    ):
+        self.uri = uri
+        self.db_name = db_name
+        self.fsm_cache_max_entries = fsm_cache_max_entries
+        self.fsm_cache_ttl_seconds = fsm_cache_ttl_seconds
+        self.fsm_cache_invalidation = fsm_cache_invalidation
+        self.client: AsyncIOMotorClient | None = None
+        self.db: AsyncIOMotorDatabase | None = None
+        self.user_data: AsyncIOMotorCollection | None = None
+        self.messages: AsyncIOMotorCollection | None = None
+        self.conversations: AsyncIOMotorCollection | None = None
+
+    async def connect(self) -> bool:
+        """Inits connection to MongoDB."""
+        if self.client is not None:
+            return True
+        logger.info(f"Connecting to MongoDB: {self.uri}")
+        try:
+            self.client = AsyncIOMotorClient(self.uri, serverSelectionTimeoutMS=5000)
+            await self.client.admin.command("ping")
+            self.db = self.client[self.db_name]
+            self.user_data = self.db["user_data"]
+            await self.user_data.create_index("user_id", unique=True)
+            self.messages = self.db[MESSAGES_COLLECTION_NAME]
+            await self.messages.create_index(
+                [
+                    ("user_id", ASCENDING),
+                    (CONVERSATION_FIELD, ASCENDING),
+                    ("seq", ASCENDING),
+                ],
+                unique=True,
+            )
+            self.conversations = self.db[CONVERSATIONS_COLLECTION_NAME]
+            await self.conversations.create_index(
+                [("user_id", ASCENDING), (CONVERSATION_FIELD, ASCENDING)],
+                unique=True,
+            )
+            await self.conversations.create_index(
+                [("user_id", ASCENDING), ("updated_at", DESCENDING)]
+            )
+            write_behind.start(self.user_data)
+            await retention_sweeper.start(
+                self.db, self.user_data, self.messages, self.conversations
+            )
+            await user_lease.start(self.db)
+            logger.info(
+                f"Successfully connected to MongoDB, DB: {self.db_name}, collections: user_data, {MESSAGES_COLLECTION_NAME}, {CONVERSATIONS_COLLECTION_NAME}"
+            )
+            return True
+        except (ConnectionFailure, ServerSelectionTimeoutError) as e:
+            logger.critical(
+                f"Cannot connect to MongoDB (ConnectionFailure or Timeout): {e}",
+                exc_info=True,
+            )
+            self._reset()
+            return False
+        except Exception as e:
+            logger.critical(
+                f"Unexpected error while connecting to MongoDB: {e}", exc_info=True
+            )
+            self._reset()
+            return False
+
+    def _reset(self):
+        self.client = None
+        self.db = None
+        self.user_data = None
+        self.messages = None
+        self.conversations = None
+
+    async def close(self):
+        """Closes connection to MongoDB."""
+        await retention_sweeper.stop()
+        await user_lease.stop()
+        await write_behind.stop()
+        if self.client:
+            self.client.close()
+            self._reset()
+            logger.info("Closed connection to MongoDB.")
+
+    def create_fsm_storage(self) -> BaseStorage:
+        """MongoStorage behind an in-process cache, on its own client."""
+        fsm_client = AsyncIOMotorClient(self.uri)
+        storage = CachedStorage(
+            MongoStorage(
+                client=fsm_client,
+                db_name=FSM_DB_NAME,
+                collection_name=FSM_COLLECTION_NAME,
+            ),
+            max_entries=self.fsm_cache_max_entries,
+            ttl_seconds=self.fsm_cache_ttl_seconds,
+        )
+        if self.fsm_cache_invalidation:
+            storage.start_invalidation(fsm_client[FSM_DB_NAME][FSM_COLLECTION_NAME])
+        return storage
+
+    async def migrate_legacy_history(
+        self, user_id: int, doc: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Moves history kept in the user document to the messages collection
+        and removes it from the document. Returns the migrated history.
+        Safe to run concurrently: messages get the same seq every time.
+        """
+        history = doc.get(LEGACY_HISTORY_FIELD) or []
+        conversation_id = doc.get(CONVERSATION_FIELD, 0)
+        if history:
+            try:
+                await self.messages.insert_many(
+                    [
+                        {
+                            **msg,
+                            "user_id": user_id,
+                            CONVERSATION_FIELD: conversation_id,
+                            "seq": seq,
+                        }
+                        for seq, msg in enumerate(history, start=1)
+                    ],
+                    ordered=False,
+                )
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                    raise
+        await self.user_data.update_one(
+            {"user_id": user_id},
+            {
+                "$unset": {LEGACY_HISTORY_FIELD: ""},
+                "$max": {SEQ_FIELD: len(history)},
+            },
+        )
+        logger.info(
+            f"Migrated {len(history)} history messages of user_id={user_id} to {MESSAGES_COLLECTION_NAME}."
+        )
+        return history
+
+    async def _load_history(
+        self, user_id: int, doc: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """Reads the latest messages of the current conversation and caches them."""
+        if LEGACY_HISTORY_FIELD in doc:
+            history = (await self.migrate_legacy_history(user_id, doc))[
+                -HISTORY_WINDOW_MESSAGES:
+            ]
+        else:
+            cursor = (
+                self.messages.find(
+                    {
+                        "user_id": user_id,
+                        CONVERSATION_FIELD: doc.get(CONVERSATION_FIELD, 0),
+                    },
+                    projection={
+                        "_id": 0,
+                        "user_id": 0,
+                        CONVERSATION_FIELD: 0,
+                        "seq": 0,
+                    },
+                )
+                .sort("seq", DESCENDING)
+                .limit(HISTORY_WINDOW_MESSAGES)
+            )
+            history = await cursor.to_list(length=HISTORY_WINDOW_MESSAGES)
+            history.reverse()
+        history_cache.put(user_id, history)
+        return history
+
+    async def get_history(self, user_id: int) -> List[Dict[str, Any]]:
+        """Extracts the latest messages of the user's current conversation."""
+        cached_history = history_cache.get(user_id)
+        if cached_history is not None:
+            return cached_history
+        if self.user_data is None:
+            logger.error("get_history: MongoDB collection isn't initialized.")
+            return []
+        try:
+            doc = await self.user_data.find_one(
+                {"user_id": user_id},
+                projection={
+                    CONVERSATION_FIELD: 1,
+                    LEGACY_HISTORY_FIELD: 1,
+                    "_id": 0,
+                },
+            )
+            return await self._load_history(user_id, doc or {})
+        except (OperationFailure, NetworkTimeout) as e:
+            logger.error(
+                f"MongoDB OperationFailure or NetworkTimeout while getting history for user_id={user_id}: {e}"
+            )
+            return []
+        except Exception as e:
+            logger.error(
+                f"Unexpected error while getting history for user_id={user_id}: {e}",
+                exc_info=True,
+            )
+            return []
+
+    async def get_user_data(
+        self, user_id: int, include_history: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Extracts Gemini settings (and history, if `include_history`) for the user
+        with a single query. Unknown users have no settings and empty history.
+        """
+        if self.user_data is None:
+            logger.error("get_user_data: MongoDB collection isn't initialized.")
+            return {}
+        cached_history = history_cache.get(user_id) if include_history else None
+        projection = {field: 1 for field in USER_SETTINGS_FIELDS}
+        if include_history and cached_history is None:
+            projection[CONVERSATION_FIELD] = 1
+            projection[LEGACY_HISTORY_FIELD] = 1
+        projection["_id"] = 0
+        try:
+            doc = await self.user_data.find_one(
+                {"user_id": user_id}, projection=projection
+            )
+            doc = doc or {}
+            if cached_history is None and include_history:
+                cached_history = await self._load_history(user_id, doc)
+            settings = {
+                field: doc[field] for field in USER_SETTINGS_FIELDS if field in doc
+            }
+            settings.update(write_behind.pending_fields(user_id))
+            if include_history:
+                settings["history"] = cached_history
+            return settings
+        except (OperationFailure, NetworkTimeout) as e:
+            logger.error(
+                f"MongoDB OperationFailure or NetworkTimeout while getting data for user_id={user_id}: {e}"
+            )
+            return {}
+        except Exception as e:
+            logger.error(
+                f"Unexpected error while getting data for user_id={user_id}: {e}",
+                exc_info=True,
+            )
+            return {}
+
+    async def save_user_setting(
+        self, user_id: int, setting_name: str, setting_value: Any
+    ):
+        """Saves (updating) one setting for user."""
+        if self.user_data is None:
+            logger.error("save_user_setting: MongoDB collection isn't initialized.")
+            return False
+        if setting_name not in USER_SETTINGS_FIELDS:
+            logger.error(
+                f"Trying to save unknown setting '{setting_name}' for user_id={user_id}"
+            )
+            return False
+        try:
+            fields = {setting_name: setting_value, LAST_ACTIVE_FIELD: _now()}
+            if write_behind.running:
+                await write_behind.enqueue(user_id, fields)
+            else:
+                await self.user_data.update_one(
+                    {"user_id": user_id},
+                    {"$set": {**fields, "user_id": user_id}},
+                    upsert=True,
+                )
+            logger.info(
+                f"Setting '{setting_name}' for user_id={user_id} saved/updated with value {setting_value}."
+            )
+            return True
+        except (OperationFailure, NetworkTimeout) as e:
+            logger.error(
+                f"Error MongoDB while saving setting '{setting_name}' for user_id={user_id}: {e}"
+            )
+            return False
+        except Exception as e:
+            logger.error(
+                f"Unexpected error while saving setting '{setting_name}' for user_id={user_id}: {e}",
+                exc_info=True,
+            )
+            return False
+
+    async def append_history(self, user_id: int, messages: List[Dict[str, Any]]):
+        """Appends messages to the user's current conversation."""
+        if self.user_data is None or self.messages is None:
+            logger.error("append_history: MongoDB collection isn't initialized.")
+            return False
+        if not messages:
+            return True
+        now = _now()
+        query: Dict[str, Any] = {"user_id": user_id}
+        update: Dict[str, Any] = {
+            "$inc": {SEQ_FIELD: len(messages)},
+            "$set": {LAST_ACTIVE_FIELD: now},
+            "$unset": {HISTORY_EXPIRED_FIELD: ""},
+        }
+        lease_token = current_lease_token.get()
+        if lease_token is not None:
+            # Fencing: a holder whose lease was taken over can't write anymore.
+            query[LEASE_TOKEN_FIELD] = {"$not": {"$gt": lease_token}}
+            update["$max"] = {LEASE_TOKEN_FIELD: lease_token}
+        try:
+            # Reserves seq numbers and reads the current conversation in one round trip.
+            doc = await self.user_data.find_one_and_update(
+                query,
+                update,
+                projection={CONVERSATION_FIELD: 1, SEQ_FIELD: 1, "_id": 0},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            conversation_id = doc.get(CONVERSATION_FIELD, 0)
+            first_seq = doc[SEQ_FIELD] - len(messages) + 1
+            await self.messages.insert_many(
+                [
+                    {
+                        **msg,
+                        "user_id": user_id,
+                        CONVERSATION_FIELD: conversation_id,
+                        "seq": seq,
+                    }
+                    for seq, msg in enumerate(messages, start=first_seq)
+                ]
+            )
+            await self._update_conversation(user_id, conversation_id, messages, now)
+            history_cache.append(user_id, messages, HISTORY_WINDOW_MESSAGES)
+            logger.debug(
+                f"{len(messages)} history messages for user_id={user_id} saved."
+            )
+            return True
+        except (OperationFailure, NetworkTimeout) as e:
+            if isinstance(e, DuplicateKeyError) and lease_token is not None:
+                # The fenced query didn't match and the upsert hit the existing user.
+                metrics.inc("lease_fenced_writes_total")
+                logger.error(
+                    f"History of user_id={user_id} not saved: lease token {lease_token} is stale."
+                )
+                history_cache.invalidate(user_id)
+                return False
+            logger.error(
+                f"Error MongoDB while saving history for user_id={user_id}: {e}"
+            )
+            history_cache.invalidate(user_id)
+            return False
+        except Exception as e:
+            logger.error(
+                f"Unexpected error while saving history for user_id={user_id}: {e}",
+                exc_info=True,
+            )
+            history_cache.invalidate(user_id)
+            return False
+
+    async def _update_conversation(
+        self,
+        user_id: int,
+        conversation_id: int,
+        messages: List[Dict[str, Any]],
+        now: datetime,
+    ):
+        """
+        Updates title, updated_at and message count of the conversation after its
+        messages are saved. Best-effort: the messages are what matters, so errors
+        are only logged.
+        """
+        try:
+            # Untitled conversations are named after their first user message.
+            await self.conversations.update_one(
+                {"user_id": user_id, CONVERSATION_FIELD: conversation_id},
+                [
+                    {
+                        "$set": {
+                            "title": {
+                                "$ifNull": [
+                                    "$title",
+                                    {"$literal": conversation_title(messages)},
+                                ]
+                            },
+                            "created_at": {"$ifNull": ["$created_at", now]},
+                            "updated_at": now,
+                            MESSAGE_COUNT_FIELD: {
+                                "$add": [
+                                    {"$ifNull": [f"${MESSAGE_COUNT_FIELD}", 0]},
+                                    len(messages),
+                                ]
+                            },
+                        }
+                    }
+                ],
+                upsert=True,
+            )
+        except Exception as e:
+            metrics.inc("conversation_update_failures_total")
+            logger.warning(
+                f"Conversation {conversation_id} of user_id={user_id} not updated: {e}"
+            )
+
+    async def _migrate_previous_conversation(
+        self, user_id: int, doc: Optional[Dict[str, Any]]
+    ):
+        """
+        History still kept in the user document belongs to the conversation the user
+        is leaving, so it's migrated with the conversation id from before the switch.
+        """
+        if doc and LEGACY_HISTORY_FIELD in doc:
+            await self.migrate_legacy_history(user_id, doc)
+
+    async def start_conversation(self, user_id: int, title: Optional[str] = None):
+        """
+        Starts a new conversation for user and makes it current.
+        The previous conversation is kept and can be switched back to.
+        """
+        if self.user_data is None or self.conversations is None:
+            logger.error("start_conversation: MongoDB collection isn't initialized.")
+            return False
+        try:
+            last_id = {
+                "$max": [
+                    {"$ifNull": [f"${LAST_CONVERSATION_FIELD}", 0]},
+                    {"$ifNull": [f"${CONVERSATION_FIELD}", 0]},
+                ]
+            }
+            doc = await self.user_data.find_one_and_update(
+                {"user_id": user_id},
+                [
+                    {
+                        "$set": {
+                            LAST_CONVERSATION_FIELD: {"$add": [last_id, 1]},
+                            LAST_ACTIVE_FIELD: _now(),
+                        }
+                    },
+                    {"$set": {CONVERSATION_FIELD: f"${LAST_CONVERSATION_FIELD}"}},
+                ],
+                projection={
+                    CONVERSATION_FIELD: 1,
+                    LAST_CONVERSATION_FIELD: 1,
+                    LEGACY_HISTORY_FIELD: 1,
+                    "_id": 0,
+                },
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+            )
+            history_cache.put(user_id, [])
+            await self._migrate_previous_conversation(user_id, doc)
+            doc = doc or {}
+            conversation_id = (
+                max(doc.get(LAST_CONVERSATION_FIELD, 0), doc.get(CONVERSATION_FIELD, 0))
+                + 1
+            )
+            if title:
+                now = _now()
+                await self.conversations.insert_one(
+                    {
+                        "user_id": user_id,
+                        CONVERSATION_FIELD: conversation_id,
+                        "title": title[:CONVERSATION_TITLE_MAX_CHARS],
+                        "created_at": now,
+                        "updated_at": now,
+                        MESSAGE_COUNT_FIELD: 0,
+                    }
+                )
+            logger.info(f"User_id={user_id} started conversation {conversation_id}.")
+            return True
+        except (OperationFailure, NetworkTimeout) as e:
+            logger.error(
+                f"Error MongoDB while starting conversation for user_id={user_id}: {e}"
+            )
+            history_cache.invalidate(user_id)
+            return False
+        except Exception as e:
+            logger.error(
+                f"Unexpected error while starting conversation for user_id={user_id}: {e}",
+                exc_info=True,
+            )
+            history_cache.invalidate(user_id)
+            return False
+
+    async def list_conversations(
+        self, user_id: int
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Returns the latest CONVERSATIONS_LIST_LIMIT conversations of the user
+        (without messages) and id of the current one.
+        """
+        if self.user_data is None or self.conversations is None:
+            logger.error("list_conversations: MongoDB collection isn't initialized.")
+            return [], 0
+        try:
+            cursor = (
+                self.conversations.find(
+                    {"user_id": user_id},
+                    projection={CONVERSATION_FIELD: 1, "title": 1, "_id": 0},
+                )
+                .sort("updated_at", DESCENDING)
+                .limit(CONVERSATIONS_LIST_LIMIT)
+            )
+            conversations, doc = await asyncio.gather(
+                cursor.to_list(length=CONVERSATIONS_LIST_LIMIT),
+                self.user_data.find_one(
+                    {"user_id": user_id}, projection={CONVERSATION_FIELD: 1, "_id": 0}
+                ),
+            )
+            return conversations, (doc or {}).get(CONVERSATION_FIELD, 0)
+        except (OperationFailure, NetworkTimeout) as e:
+            logger.error(
+                f"Error MongoDB while listing conversations for user_id={user_id}: {e}"
+            )
+            return [], 0
+        except Exception as e:
+            logger.error(
+                f"Unexpected error while listing conversations for user_id={user_id}: {e}",
+                exc_info=True,
+            )
+            return [], 0
+
+    async def switch_conversation(
+        self, user_id: int, conversation_id: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Makes an existing conversation of the user current.
+        Returns the conversation, or None if it's not found or the switch failed.
+        """
+        if self.user_data is None or self.conversations is None:
+            logger.error("switch_conversation: MongoDB collection isn't initialized.")
+            return None
+        try:
+            conversation = await self.conversations.find_one(
+                {"user_id": user_id, CONVERSATION_FIELD: conversation_id},
+                projection={CONVERSATION_FIELD: 1, "title": 1, "_id": 0},
+            )
+            if conversation is None:
+                logger.warning(
+                    f"Conversation {conversation_id} of user_id={user_id} is not found."
+                )
+                return None
+            doc = await self.user_data.find_one_and_update(
+                {"user_id": user_id},
+                {
+                    "$set": {
+                        CONVERSATION_FIELD: conversation_id,
+                        LAST_ACTIVE_FIELD: _now(),
+                    }
+                },
+                projection={
+                    CONVERSATION_FIELD: 1,
+                    LEGACY_HISTORY_FIELD: 1,
+                    "_id": 0,
+                },
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+            )
+            history_cache.invalidate(user_id)
+            await self._migrate_previous_conversation(user_id, doc)
+            logger.info(
+                f"User_id={user_id} switched to conversation {conversation_id}."
+            )
+            return conversation
+        except (OperationFailure, NetworkTimeout) as e:
+            logger.error(
+                f"Error MongoDB while switching conversation for user_id={user_id}: {e}"
+            )
+            history_cache.invalidate(user_id)
+            return None
+        except Exception as e:
+            logger.error(
+                f"Unexpected error while switching conversation for user_id={user_id}: {e}",
+                exc_info=True,
+            )
+            history_cache.invalidate(user_id)
+            return None
+
+    async def delete_user_data(self, user_id: int) -> bool:
+        """
+        Completely deletes the user’s document (settings), conversations and messages
+        (including archived ones) from the DB.
+        Returns True if the document was found and deleted, otherwise False.
+        """
+        if self.user_data is None:
+            logger.error("delete_user_data: MongoDB collection isn't initialized.")
+            return False
+        try:
+            logger.warning(f"Trying to delete all data for user_id={user_id}")
+            history_cache.invalidate(user_id)
+            had_pending_writes = await write_behind.discard(user_id)
+            result = await self.user_data.delete_one({"user_id": user_id})
+            related_results = await asyncio.gather(
+                self.messages.delete_many({"user_id": user_id}),
+                self.conversations.delete_many({"user_id": user_id}),
+                self.db[MESSAGES_ARCHIVE_COLLECTION_NAME].delete_many(
+                    {"user_id": user_id}
+                ),
+            )
+            if (
+                result.deleted_count > 0
+                or any(related.deleted_count > 0 for related in related_results)
+                or had_pending_writes
+            ):
+                logger.info(f"All data for user_id={user_id} deleted.")
+                return True
+            else:
+                logger.info(f"Data for deletion for user_id={user_id} is not found.")
+                return False
+        except (OperationFailure, NetworkTimeout) as e:
+            logger.error(
+                f"Error MongoDB while deleting data for user_id={user_id}: {e}"
+            )
+            return False
+        except Exception as e:
+            logger.error(
+                f"Unexpected error while deleting data for user_id={user_id}: {e}",
+                exc_info=True,
+            )
+            return False
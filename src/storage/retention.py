@@ -0,0 +1,299 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from src.config import (
+    DEFAULT_RETENTION_ARCHIVE_TTL_DAYS,
+    DEFAULT_RETENTION_BATCH_PAUSE_SECONDS,
+    DEFAULT_RETENTION_BATCH_SIZE,
+    DEFAULT_RETENTION_INACTIVE_DAYS,
+    DEFAULT_RETENTION_MAX_MESSAGES,
+    DEFAULT_RETENTION_MODE,
+    DEFAULT_RETENTION_SWEEP_INTERVAL_SECONDS,
+    MESSAGES_ARCHIVE_COLLECTION_NAME,
+    RETENTION_MODES,
+    config,
+)
+from src.storage.history_cache import history_cache
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# User document fields: time of the last write and time its history was expired.
+LAST_ACTIVE_FIELD = "last_active"
+HISTORY_EXPIRED_FIELD = "history_expired_at"
+# User document field holding history from before the messages collection.
+LEGACY_HISTORY_FIELD = "history"
+# User document field: last used message seq, it grows with every saved message.
+SEQ_FIELD = "history_seq"
+# Conversation document field: number of stored messages.
+MESSAGE_COUNT_FIELD = "message_count"
+# MongoDB duplicate key error code.
+DUPLICATE_KEY_ERROR = 11000
+
+
+class RetentionSweeper:
+    """
+    Background job that keeps the history collections bounded:
+    - history of users inactive for `inactive_days` is archived or deleted;
+      users written before activity was tracked count as active since the first
+      sweep, and users whose history isn't migrated to the messages collection
+      yet are skipped until it is. Only messages saved before the user was found
+      inactive are retired, so a message arriving during the sweep is kept;
+    - conversations longer than `max_messages` lose their oldest messages.
+    In "archive" mode messages are moved to the archive collection, which drops
+    them after `archive_ttl_days` with a TTL index (0 keeps them forever).
+    Work is done in batches of `batch_size` with `batch_pause_seconds` between them,
+    so a sweep doesn't compete with live traffic.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        mode: str,
+        inactive_days: int,
+        max_messages: int,
+        archive_ttl_days: int,
+        sweep_interval_seconds: float,
+        batch_size: int,
+        batch_pause_seconds: float,
+    ):
+        if mode not in RETENTION_MODES:
+            logger.warning(f"Unknown retention mode '{mode}', using archive.")
+            mode = "archive"
+        self.enabled = enabled
+        self.mode = mode
+        self.inactive_days = inactive_days
+        self.max_messages = max_messages
+        self.archive_ttl_days = archive_ttl_days
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.batch_size = batch_size
+        self.batch_pause_seconds = batch_pause_seconds
+        self._user_data: Optional[AsyncIOMotorCollection] = None
+        self._messages: Optional[AsyncIOMotorCollection] = None
+        self._conversations: Optional[AsyncIOMotorCollection] = None
+        self._archive: Optional[AsyncIOMotorCollection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(
+        self,
+        db: AsyncIOMotorDatabase,
+        user_data: AsyncIOMotorCollection,
+        messages: AsyncIOMotorCollection,
+        conversations: AsyncIOMotorCollection,
+    ):
+        """Creates indexes used by sweeps and starts the periodic job."""
+        if not self.enabled or self._task is not None:
+            return
+        self._user_data = user_data
+        self._messages = messages
+        self._conversations = conversations
+        await user_data.create_index(LAST_ACTIVE_FIELD)
+        await conversations.create_index(MESSAGE_COUNT_FIELD)
+        if self.mode == "archive":
+            self._archive = db[MESSAGES_ARCHIVE_COLLECTION_NAME]
+            if self.archive_ttl_days > 0:
+                await self._archive.create_index(
+                    "archived_at",
+                    expireAfterSeconds=int(
+                        timedelta(days=self.archive_ttl_days).total_seconds()
+                    ),
+                )
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Retention started: {self.mode} after {self.inactive_days} days, at most {self.max_messages} messages per conversation."
+        )
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            try:
+                await self.sweep()
+            except PyMongoError as e:
+                metrics.inc("retention_sweep_errors_total")
+                logger.error(f"Retention sweep failed, will retry next time: {e}")
+
+    async def sweep(self):
+        """Runs one full pass: expires inactive users, then trims long conversations."""
+        started_at = time.monotonic()
+        await self._backfill_last_active()
+        expired_users = await self._expire_inactive_users()
+        trimmed_conversations = await self._trim_long_conversations()
+        seconds = time.monotonic() - started_at
+        metrics.observe("retention_sweep_seconds", seconds)
+        logger.info(
+            f"Retention sweep: expired history of {expired_users} users, trimmed {trimmed_conversations} conversations in {seconds:.1f}s."
+        )
+
+    async def _backfill_last_active(self):
+        """Sets last activity of users that have none to now, batch by batch."""
+        while True:
+            docs = await self._user_data.find(
+                {LAST_ACTIVE_FIELD: {"$exists": False}},
+                projection={"user_id": 1, "_id": 0},
+            ).to_list(length=self.batch_size)
+            if not docs:
+                return
+            user_ids = [doc["user_id"] for doc in docs]
+            await self._user_data.update_many(
+                {"user_id": {"$in": user_ids}, LAST_ACTIVE_FIELD: {"$exists": False}},
+                {"$set": {LAST_ACTIVE_FIELD: datetime.now(timezone.utc)}},
+            )
+            metrics.inc("retention_backfilled_users_total", len(user_ids))
+            await asyncio.sleep(self.batch_pause_seconds)
+
+    async def _expire_inactive_users(self) -> int:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.inactive_days)
+        expired = 0
+        while True:
+            docs = await self._user_data.find(
+                {
+                    LAST_ACTIVE_FIELD: {"$lt": cutoff},
+                    HISTORY_EXPIRED_FIELD: {"$exists": False},
+                    # Legacy history would come back with the next message.
+                    LEGACY_HISTORY_FIELD: {"$exists": False},
+                },
+                projection={"user_id": 1, SEQ_FIELD: 1, "_id": 0},
+            ).to_list(length=self.batch_size)
+            if not docs:
+                return expired
+            user_ids = [doc["user_id"] for doc in docs]
+            for doc in docs:
+                # Messages saved from now on get a higher seq.
+                await self._retire_messages(
+                    {"user_id": doc["user_id"], "seq": {"$lte": doc.get(SEQ_FIELD, 0)}}
+                )
+            await self._conversations.delete_many(
+                {"user_id": {"$in": user_ids}, "updated_at": {"$lt": cutoff}}
+            )
+            await self._user_data.update_many(
+                {"user_id": {"$in": user_ids}, LAST_ACTIVE_FIELD: {"$lt": cutoff}},
+                {"$set": {HISTORY_EXPIRED_FIELD: datetime.now(timezone.utc)}},
+            )
+            for user_id in user_ids:
+                history_cache.invalidate(user_id)
+            expired += len(user_ids)
+            metrics.inc("retention_expired_users_total", len(user_ids))
+            await asyncio.sleep(self.batch_pause_seconds)
+
+    async def _trim_long_conversations(self) -> int:
+        trimmed = 0
+        while True:
+            conversations = await self._conversations.find(
+                {MESSAGE_COUNT_FIELD: {"$gt": self.max_messages}},
+                projection={"user_id": 1, "conversation_id": 1, "_id": 0},
+            ).to_list(length=self.batch_size)
+            if not conversations:
+                return trimmed
+            for conversation in conversations:
+                await self._trim_conversation(conversation)
+            trimmed += len(conversations)
+            await asyncio.sleep(self.batch_pause_seconds)
+
+    async def _trim_conversation(self, conversation: Dict[str, Any]):
+        key = {
+            "user_id": conversation["user_id"],
+            "conversation_id": conversation["conversation_id"],
+        }
+        # The oldest message to keep: `max_messages`-th from the end.
+        oldest_kept = await (
+            self._messages.find(key, projection={"seq": 1, "_id": 0})
+            .sort("seq", DESCENDING)
+            .skip(self.max_messages - 1)
+            .limit(1)
+            .to_list(length=1)
+        )
+        retired = 0
+        if oldest_kept:
+            retired = await self._retire_messages(
+                {**key, "seq": {"$lt": oldest_kept[0]["seq"]}}
+            )
+        if retired:
+            # Messages saved meanwhile are counted by append_history.
+            await self._conversations.update_one(
+                key, {"$inc": {MESSAGE_COUNT_FIELD: -retired}}
+            )
+        else:
+            # Nothing to trim, the count is off (e.g. a lost conversation update).
+            count = await self._messages.count_documents(key)
+            await self._conversations.update_one(
+                key, {"$set": {MESSAGE_COUNT_FIELD: count}}
+            )
+        history_cache.invalidate(conversation["user_id"])
+        metrics.inc("retention_trimmed_conversations_total")
+
+    async def _retire_messages(self, query: Dict[str, Any]) -> int:
+        """
+        Deletes messages matching the query, copying them to the archive first.
+        Returns the number of deleted messages.
+        """
+        if self._archive is None:
+            result = await self._messages.delete_many(query)
+            metrics.inc("retention_deleted_messages_total", result.deleted_count)
+            return result.deleted_count
+        retired = 0
+        while True:
+            batch: List[Dict[str, Any]] = (
+                await self._messages.find(query)
+                .sort("seq", ASCENDING)
+                .to_list(length=self.batch_size)
+            )
+            if not batch:
+                return retired
+            archived_at = datetime.now(timezone.utc)
+            try:
+                await self._archive.insert_many(
+                    [{**msg, "archived_at": archived_at} for msg in batch],
+                    ordered=False,
+                )
+            except BulkWriteError as e:
+                # Messages archived by an interrupted sweep keep their _id.
+                errors = e.details.get("writeErrors", [])
+                if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                    raise
+            result = await self._messages.delete_many(
+                {"_id": {"$in": [msg["_id"] for msg in batch]}}
+            )
+            retired += result.deleted_count
+            metrics.inc("retention_archived_messages_total", len(batch))
+            await asyncio.sleep(self.batch_pause_seconds)
+
+
+if config:
+    retention_sweeper = RetentionSweeper(
+        config.mongo.retention_enabled,
+        config.mongo.retention_mode,
+        config.mongo.retention_inactive_days,
+        config.mongo.retention_max_messages,
+        config.mongo.retention_archive_ttl_days,
+        config.mongo.retention_sweep_interval_seconds,
+        config.mongo.retention_batch_size,
+        config.mongo.retention_batch_pause_seconds,
+    )
+else:
+    retention_sweeper = RetentionSweeper(
+        False,
+        DEFAULT_RETENTION_MODE,
+        DEFAULT_RETENTION_INACTIVE_DAYS,
+        DEFAULT_RETENTION_MAX_MESSAGES,
+        DEFAULT_RETENTION_ARCHIVE_TTL_DAYS,
+        DEFAULT_RETENTION_SWEEP_INTERVAL_SECONDS,
+        DEFAULT_RETENTION_BATCH_SIZE,
+        DEFAULT_RETENTION_BATCH_PAUSE_SECONDS,
+    )
@@ -0,0 +1,345 @@
+import json
+import logging
+import sqlite3
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseStorage,
+    DefaultKeyBuilder,
+    StateType,
+    StorageKey,
+)
+
+from src.config import CONVERSATION_TITLE_MAX_CHARS, CONVERSATIONS_LIST_LIMIT
+from src.storage.backend import USER_SETTINGS_FIELDS, StorageBackend, conversation_title
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    settings TEXT NOT NULL DEFAULT '{}',
+    conversation_id INTEGER NOT NULL DEFAULT 0,
+    last_conversation_id INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    user_id INTEGER NOT NULL,
+    conversation_id INTEGER NOT NULL,
+    title TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_id, conversation_id)
+);
+CREATE INDEX IF NOT EXISTS conversations_by_update
+    ON conversations (user_id, updated_at);
+CREATE TABLE IF NOT EXISTS messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    conversation_id INTEGER NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_conversation
+    ON messages (user_id, conversation_id, seq);
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT NOT NULL DEFAULT '{}'
+);
+"""
+
+
+class SQLiteFSMStorage(BaseStorage):
+    """FSM storage in the `fsm` table of the SQLite backend's database."""
+
+    def __init__(self, backend: "SQLiteBackend"):
+        self.backend = backend
+        self.key_builder = DefaultKeyBuilder()
+
+    async def _upsert(self, key: StorageKey, column: str, value: Optional[str]):
+        conn = self.backend.conn
+        await conn.execute(
+            f"INSERT INTO fsm (key, {column}) VALUES (?, ?) "
+            f"ON CONFLICT (key) DO UPDATE SET {column} = excluded.{column}",
+            (self.key_builder.build(key), value),
+        )
+        await conn.commit()
+
+    async def _select(self, key: StorageKey, column: str) -> Optional[str]:
+        async with self.backend.conn.execute(
+            f"SELECT {column} FROM fsm WHERE key = ?", (self.key_builder.build(key),)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        if isinstance(state, State):
+            state = state.state
+        await self._upsert(key, "state", state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._select(key, "state")
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._upsert(key, "data", json.dumps(dict(data), ensure_ascii=False))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        data = await self._select(key, "data")
+        return json.loads(data) if data else {}
+
+    async def close(self) -> None:
+        pass
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Storage in a local SQLite file through aiosqlite (optional dependency),
+    FSM included. For single-node deployments: no network round trips,
+    but only one bot process may use the file.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, history_window_messages: int):
+        self.path = path
+        self.history_window_messages = history_window_messages
+        self.conn: Optional["aiosqlite.Connection"] = None
+
+    async def connect(self) -> bool:
+        if self.conn is not None:
+            return True
+        if aiosqlite is None:
+            logger.critical("SQLite storage needs the aiosqlite package.")
+            return False
+        try:
+            self.conn = await aiosqlite.connect(self.path)
+            await self.conn.execute("PRAGMA journal_mode=WAL")
+            await self.conn.executescript(SCHEMA)
+            await self.conn.commit()
+            logger.info(f"Opened SQLite storage: {self.path}")
+            return True
+        except sqlite3.Error as e:
+            logger.critical(f"Cannot open SQLite storage {self.path}: {e}")
+            self.conn = None
+            return False
+
+    async def close(self):
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+            logger.info("Closed SQLite storage.")
+
+    def create_fsm_storage(self) -> BaseStorage:
+        return SQLiteFSMStorage(self)
+
+    async def _current_conversation(self, user_id: int) -> int:
+        async with self.conn.execute(
+            "SELECT conversation_id FROM users WHERE user_id = ?", (user_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else 0
+
+    async def get_history(self, user_id: int) -> List[Dict[str, Any]]:
+        if self.conn is None:
+            logger.error("get_history: SQLite storage isn't opened.")
+            return []
+        try:
+            conversation_id = await self._current_conversation(user_id)
+            async with self.conn.execute(
+                "SELECT message FROM messages WHERE user_id = ? AND conversation_id = ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (user_id, conversation_id, self.history_window_messages),
+            ) as cursor:
+                rows = await cursor.fetchall()
+            return [json.loads(row[0]) for row in reversed(rows)]
+        except sqlite3.Error as e:
+            logger.error(
+                f"SQLite error while getting history for user_id={user_id}: {e}"
+            )
+            return []
+
+    async def get_user_data(
+        self, user_id: int, include_history: bool = True
+    ) -> Dict[str, Any]:
+        if self.conn is None:
+            logger.error("get_user_data: SQLite storage isn't opened.")
+            return {}
+        try:
+            async with self.conn.execute(
+                "SELECT settings FROM users WHERE user_id = ?", (user_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"SQLite error while getting data for user_id={user_id}: {e}")
+            return {}
+        doc = json.loads(row[0]) if row else {}
+        if include_history:
+            doc["history"] = await self.get_history(user_id)
+        return doc
+
+    async def save_user_setting(
+        self, user_id: int, setting_name: str, setting_value: Any
+    ) -> bool:
+        if self.conn is None:
+            logger.error("save_user_setting: SQLite storage isn't opened.")
+            return False
+        if setting_name not in USER_SETTINGS_FIELDS:
+            logger.error(
+                f"Trying to save unknown setting '{setting_name}' for user_id={user_id}"
+            )
+            return False
+        try:
+            await self.conn.execute(
+                "INSERT INTO users (user_id, settings) VALUES (?, json_object(?, json(?))) "
+                "ON CONFLICT (user_id) DO UPDATE SET "
+                "settings = json_set(settings, '$.' || ?, json(?))",
+                (
+                    user_id,
+                    setting_name,
+                    json.dumps(setting_value),
+                    setting_name,
+                    json.dumps(setting_value),
+                ),
+            )
+            await self.conn.commit()
+            logger.info(
+                f"Setting '{setting_name}' for user_id={user_id} saved/updated with value {setting_value}."
+            )
+            return True
+        except sqlite3.Error as e:
+            logger.error(
+                f"SQLite error while saving setting '{setting_name}' for user_id={user_id}: {e}"
+            )
+            return False
+
+    async def append_history(
+        self, user_id: int, messages: List[Dict[str, Any]]
+    ) -> bool:
+        if self.conn is None:
+            logger.error("append_history: SQLite storage isn't opened.")
+            return False
+        if not messages:
+            return True
+        try:
+            conversation_id = await self._current_conversation(user_id)
+            await self.conn.executemany(
+                "INSERT INTO messages (user_id, conversation_id, message) VALUES (?, ?, ?)",
+                [
+                    (user_id, conversation_id, json.dumps(msg, ensure_ascii=False))
+                    for msg in messages
+                ],
+            )
+            await self.conn.execute(
+                "INSERT INTO conversations (user_id, conversation_id, title, updated_at) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (user_id, conversation_id) DO UPDATE SET "
+                "title = coalesce(title, excluded.title), updated_at = excluded.updated_at",
+                (user_id, conversation_id, conversation_title(messages), time.time()),
+            )
+            await self.conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logger.error(
+                f"SQLite error while saving history for user_id={user_id}: {e}"
+            )
+            return False
+
+    async def start_conversation(
+        self, user_id: int, title: Optional[str] = None
+    ) -> bool:
+        if self.conn is None:
+            logger.error("start_conversation: SQLite storage isn't opened.")
+            return False
+        try:
+            await self.conn.execute(
+                "INSERT INTO users (user_id, conversation_id, last_conversation_id) "
+                "VALUES (?, 1, 1) ON CONFLICT (user_id) DO UPDATE SET "
+                "last_conversation_id = max(last_conversation_id, conversation_id) + 1, "
+                "conversation_id = max(last_conversation_id, conversation_id) + 1",
+                (user_id,),
+            )
+            if title:
+                await self.conn.execute(
+                    "INSERT INTO conversations (user_id, conversation_id, title, updated_at) "
+                    "SELECT user_id, conversation_id, ?, ? FROM users WHERE user_id = ?",
+                    (title[:CONVERSATION_TITLE_MAX_CHARS], time.time(), user_id),
+                )
+            await self.conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logger.error(
+                f"SQLite error while starting conversation for user_id={user_id}: {e}"
+            )
+            return False
+
+    async def list_conversations(
+        self, user_id: int
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        if self.conn is None:
+            logger.error("list_conversations: SQLite storage isn't opened.")
+            return [], 0
+        try:
+            async with self.conn.execute(
+                "SELECT conversation_id, title FROM conversations WHERE user_id = ? "
+                "ORDER BY updated_at DESC LIMIT ?",
+                (user_id, CONVERSATIONS_LIST_LIMIT),
+            ) as cursor:
+                rows = await cursor.fetchall()
+            conversations = [
+                {"conversation_id": conversation_id, "title": title}
+                for conversation_id, title in rows
+            ]
+            return conversations, await self._current_conversation(user_id)
+        except sqlite3.Error as e:
+            logger.error(
+                f"SQLite error while listing conversations for user_id={user_id}: {e}"
+            )
+            return [], 0
+
+    async def switch_conversation(
+        self, user_id: int, conversation_id: int
+    ) -> Optional[Dict[str, Any]]:
+        if self.conn is None:
+            logger.error("switch_conversation: SQLite storage isn't opened.")
+            return None
+        try:
+            async with self.conn.execute(
+                "SELECT title FROM conversations WHERE user_id = ? AND conversation_id = ?",
+                (user_id, conversation_id),
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                return None
+            await self.conn.execute(
+                "UPDATE users SET conversation_id = ? WHERE user_id = ?",
+                (conversation_id, user_id),
+            )
+            await self.conn.commit()
+            return {"conversation_id": conversation_id, "title": row[0]}
+        except sqlite3.Error as e:
+            logger.error(
+                f"SQLite error while switching conversation for user_id={user_id}: {e}"
+            )
+            return None
+
+    async def delete_user_data(self, user_id: int) -> bool:
+        if self.conn is None:
+            logger.error("delete_user_data: SQLite storage isn't opened.")
+            return False
+        try:
+            deleted = 0
+            for table in ("users", "conversations", "messages"):
+                cursor = await self.conn.execute(
+                    f"DELETE FROM {table} WHERE user_id = ?", (user_id,)
+                )
+                deleted += cursor.rowcount
+            await self.conn.commit()
+            logger.info(f"All data for user_id={user_id} deleted ({deleted} rows).")
+            return deleted > 0
+        except sqlite3.Error as e:
+            logger.error(f"SQLite error while deleting data for user_id={user_id}: {e}")
+            return False
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Set
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from src.config import (
+    DEFAULT_WRITE_BEHIND_BATCH_SIZE,
+    DEFAULT_WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+    DEFAULT_WRITE_BEHIND_MAX_PENDING,
+    config,
+)
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    Coalesces `$set` writes to user documents per user and flushes them with
+    `bulk_write`, when `batch_size` users are pending or every `flush_interval_seconds`.
+    Only settings go through it: history appends write directly, as they reserve
+    message seq numbers and are fenced by the user's lease.
+    When `max_pending` users are waiting, the writer flushes itself (backpressure).
+    Pending writes are flushed on shutdown, but writes of the last interval
+    are lost if the process crashes.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        batch_size: int,
+        flush_interval_seconds: float,
+        max_pending: int,
+    ):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+        self._collection: Optional[AsyncIOMotorCollection] = None
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._in_flight: Dict[int, Dict[str, Any]] = {}
+        # Users discarded while their writes were in flight, never re-queued.
+        self._discarded: Set[int] = set()
+        self._flush_lock = asyncio.Lock()
+        self._flush_needed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self.enabled and self._task is not None
+
+    def start(self, collection: AsyncIOMotorCollection):
+        if not self.enabled or self._task is not None:
+            return
+        self._collection = collection
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Write-behind started: batch {self.batch_size}, interval {self.flush_interval_seconds}s."
+        )
+
+    async def stop(self):
+        """Stops the flusher and writes everything that is still pending."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+        if self._pending:
+            logger.error(
+                f"Write-behind stopped with {len(self._pending)} unsaved user documents."
+            )
+
+    def pending_fields(self, user_id: int) -> Dict[str, Any]:
+        """Fields written for the user that are not in MongoDB yet."""
+        return {
+            **self._in_flight.get(user_id, {}),
+            **self._pending.get(user_id, {}),
+        }
+
+    async def enqueue(self, user_id: int, fields: Dict[str, Any]):
+        if user_id not in self._pending and len(self._pending) >= self.max_pending:
+            metrics.inc("write_behind_backpressure_total")
+            logger.warning(
+                f"Write-behind queue is full ({len(self._pending)} users), flushing inline."
+            )
+            await self.flush()
+        self._pending.setdefault(user_id, {}).update(fields)
+        metrics.set_gauge("write_behind_pending", len(self._pending))
+        if len(self._pending) >= self.batch_size:
+            self._flush_needed.set()
+
+    async def discard(self, user_id: int) -> bool:
+        """
+        Drops pending writes of a user whose document is being deleted,
+        and waits for a running flush, so it can't recreate the document afterwards.
+        If that flush fails, the user's writes from it aren't retried.
+        """
+        discarded = self._pending.pop(user_id, None) is not None
+        if discarded:
+            metrics.set_gauge("write_behind_pending", len(self._pending))
+        if user_id in self._in_flight:
+            self._discarded.add(user_id)
+            discarded = True
+        async with self._flush_lock:
+            pass
+        return discarded
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_needed.wait(), timeout=self.flush_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending or self._collection is None:
+                return
+            batch, self._pending = self._pending, {}
+            self._in_flight = batch
+            operations = [
+                UpdateOne(
+                    {"user_id": user_id},
+                    {"$set": {**fields, "user_id": user_id}},
+                    upsert=True,
+                )
+                for user_id, fields in batch.items()
+            ]
+            started_at = time.monotonic()
+            try:
+                await self._collection.bulk_write(operations, ordered=False)
+            except PyMongoError as e:
+                logger.error(
+                    f"Write-behind flush of {len(operations)} documents failed, will retry: {e}"
+                )
+                metrics.inc("write_behind_flush_errors_total")
+                # Newer writes made during the flush win over the failed ones.
+                for user_id, fields in batch.items():
+                    if user_id in self._discarded:
+                        continue
+                    self._pending[user_id] = {
+                        **fields,
+                        **self._pending.get(user_id, {}),
+                    }
+            else:
+                metrics.inc("write_behind_flushes_total")
+                metrics.inc("write_behind_operations_total", len(operations))
+                metrics.observe(
+                    "write_behind_flush_seconds", time.monotonic() - started_at
+                )
+                logger.debug(f"Write-behind flushed {len(operations)} documents.")
+            finally:
+                self._in_flight = {}
+                self._discarded.clear()
+                metrics.set_gauge("write_behind_pending", len(self._pending))
+
+
+if config:
+    write_behind = WriteBehindQueue(
+        config.mongo.write_behind_enabled,
+        config.mongo.write_behind_batch_size,
+        config.mongo.write_behind_flush_interval_seconds,
+        config.mongo.write_behind_max_pending,
+    )
+else:
+    write_behind = WriteBehindQueue(
+        False,
+        DEFAULT_WRITE_BEHIND_BATCH_SIZE,
+        DEFAULT_WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+        DEFAULT_WRITE_BEHIND_MAX_PENDING,
+    )
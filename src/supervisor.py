@@ -0,0 +1,176 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from aiogram import BaseMiddleware
+from aiogram.types import Chat, TelegramObject, Update, User
+
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Virtual nodes per worker on the hash ring: evens out the share of users per worker.
+RING_REPLICAS = 64
+WORKER_RESTART_DELAY_SECONDS = 1.0
+WORKER_STOP_TIMEOUT_SECONDS = 15.0
+# Max size of one serialized update on the worker pipe.
+IPC_LINE_LIMIT = 4 * 1024 * 1024
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest())
+
+
+class HashRing:
+    """
+    Consistent hash ring of `nodes` workers. A key always maps to the same worker,
+    and changing the number of workers moves only ~1/N of the keys.
+    """
+
+    def __init__(self, nodes: int, replicas: int = RING_REPLICAS):
+        points = sorted(
+            (_hash(f"worker-{node}:{replica}"), node)
+            for node in range(nodes)
+            for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: Any) -> int:
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._nodes[index]
+
+
+class WorkerProcess:
+    """Child process reading newline-delimited updates from its stdin."""
+
+    def __init__(self, index: int, command: Sequence[str]):
+        self.index = index
+        self.command = list(command)
+        self.process: Optional[asyncio.subprocess.Process] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command, stdin=asyncio.subprocess.PIPE
+        )
+        logger.info(f"Worker {self.index} started (pid {self.process.pid}).")
+
+    async def send(self, payload: bytes) -> bool:
+        if not self.alive:
+            return False
+        try:
+            self.process.stdin.write(payload + b"\n")
+            await self.process.stdin.drain()
+            return True
+        except (BrokenPipeError, ConnectionResetError):
+            return False
+
+    async def stop(self, timeout: float):
+        """Closes stdin so the worker finishes its updates and exits, kills it on timeout."""
+        if not self.alive:
+            return
+        self.process.stdin.close()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Worker {self.index} didn't stop in {timeout}s, killing.")
+            self.process.kill()
+            await self.process.wait()
+
+
+class Supervisor:
+    """
+    Runs `workers` worker processes started with `command` and dispatches
+    serialized updates to them by consistent hash of a key (user_id), so
+    updates of one user are always handled, in order, by the same process.
+    Workers that exit unexpectedly are restarted; updates sent meanwhile are dropped.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        command: Sequence[str],
+        stop_timeout: float = WORKER_STOP_TIMEOUT_SECONDS,
+    ):
+        self.ring = HashRing(workers)
+        self.workers = [WorkerProcess(index, command) for index in range(workers)]
+        self.stop_timeout = stop_timeout
+        self._monitors: List[asyncio.Task] = []
+        self._stopping = False
+
+    async def start(self):
+        self._stopping = False
+        for worker in self.workers:
+            await worker.start()
+        self._monitors = [
+            asyncio.create_task(self._monitor(worker)) for worker in self.workers
+        ]
+        logger.info(f"Supervisor started {len(self.workers)} workers.")
+
+    async def _monitor(self, worker: WorkerProcess):
+        while True:
+            returncode = await worker.process.wait()
+            if self._stopping:
+                return
+            logger.error(
+                f"Worker {worker.index} exited with code {returncode}, restarting."
+            )
+            metrics.inc("supervisor_worker_restarts_total", worker=worker.index)
+            await asyncio.sleep(WORKER_RESTART_DELAY_SECONDS)
+            await worker.start()
+
+    async def dispatch(self, key: Any, payload: bytes) -> bool:
+        worker = self.workers[self.ring.node_for(key)]
+        if not await worker.send(payload):
+            metrics.inc("supervisor_dropped_total", worker=worker.index)
+            logger.error(f"Worker {worker.index} is down, update dropped.")
+            return False
+        metrics.inc("supervisor_dispatched_total", worker=worker.index)
+        return True
+
+    async def stop(self):
+        self._stopping = True
+        for task in self._monitors:
+            task.cancel()
+        await asyncio.gather(*self._monitors, return_exceptions=True)
+        self._monitors = []
+        await asyncio.gather(
+            *(worker.stop(self.stop_timeout) for worker in self.workers)
+        )
+        logger.info("Supervisor stopped all workers.")
+
+
+class ShardingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware of the supervisor process: forwards every update
+    to its worker instead of handling it. The key is the user, then the chat,
+    so updates without either are spread by update_id.
+    """
+
+    def __init__(self, supervisor: Supervisor):
+        self.supervisor = supervisor
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        user: User | None = data.get("event_from_user")
+        chat: Chat | None = data.get("event_chat")
+        if user is not None:
+            key = f"user:{user.id}"
+        elif chat is not None:
+            key = f"chat:{chat.id}"
+        else:
+            key = f"update:{event.update_id}"
+        payload = event.model_dump_json(exclude_none=True, by_alias=True).encode()
+        await self.supervisor.dispatch(key, payload)
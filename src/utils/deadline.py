@@ -0,0 +1,99 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Optional
+
+from src.utils.metrics import metrics
+
+DEADLINE_EXCEEDED = "DEADLINE_EXCEEDED"
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The time budget of the update ran out."""
+
+
+class Deadline:
+    """
+    Time budget of one update and the time spent in each of its stages.
+    Stages get the budget minus `reserve_seconds`, which is left for telling
+    the user that the request ran out of time.
+    """
+
+    def __init__(self, budget_seconds: float, reserve_seconds: float):
+        self.budget_seconds = budget_seconds
+        self.reserve_seconds = min(reserve_seconds, budget_seconds / 2)
+        self.started = time.monotonic()
+        self.stages: Dict[str, float] = {}
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        """Budget left for the stages."""
+        return max(0.0, self.budget_seconds - self.reserve_seconds - self.elapsed)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def record(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def summary(self) -> str:
+        stages = ", ".join(
+            f"{stage}={seconds:.2f}s" for stage, seconds in self.stages.items()
+        )
+        return (
+            f"{self.elapsed:.2f}s of {self.budget_seconds:g}s ({stages or 'no stages'})"
+        )
+
+
+# Deadline of the update being handled, set by DeadlineMiddleware.
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar(
+    "current_deadline", default=None
+)
+
+
+def time_left(default: float) -> float:
+    """`default` timeout, cut to the remaining budget of the current update."""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return default
+    return min(default, deadline.remaining())
+
+
+def record_stage(stage: str, seconds: float):
+    """Adds time spent in the stage to the current update's deadline, if any."""
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.record(stage, seconds)
+
+
+@asynccontextmanager
+async def stage(name: str) -> AsyncIterator[None]:
+    """
+    Times a stage of the update and bounds it by the remaining budget.
+    Raises DeadlineExceeded when the budget runs out.
+    """
+    deadline = current_deadline.get()
+    started = time.monotonic()
+    try:
+        if deadline is None:
+            yield
+            return
+        if deadline.expired:
+            metrics.inc("deadline_exceeded_total", stage=name)
+            raise DeadlineExceeded(f"No budget left for {name}.")
+        timeout = asyncio.timeout(deadline.remaining())
+        try:
+            async with timeout:
+                yield
+        except asyncio.TimeoutError:
+            if timeout.expired():
+                metrics.inc("deadline_exceeded_total", stage=name)
+                raise DeadlineExceeded(f"{name} ran out of the budget.") from None
+            raise
+    finally:
+        record_stage(name, time.monotonic() - started)
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Hashable
+
+from src.utils.metrics import metrics
+
+
+class KeyedLockFull(Exception):
+    """Raised when a key already has `max_depth` holders and waiters."""
+
+
+@dataclass
+class _Slot:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # The holder plus the waiters.
+    depth: int = 0
+
+
+class KeyedLock:
+    """
+    One asyncio lock per key, so work of one key runs in arrival order
+    while different keys run concurrently. At most `max_depth` tasks may
+    hold or wait for one key. A key is evicted as soon as its last task
+    leaves, so idle keys take no memory.
+    Metrics are named `{name}_*`.
+    """
+
+    def __init__(self, name: str, max_depth: int):
+        self.name = name
+        self.max_depth = max(1, max_depth)
+        self._slots: Dict[Hashable, _Slot] = {}
+
+    def depth(self, key: Hashable) -> int:
+        slot = self._slots.get(key)
+        return slot.depth if slot else 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @asynccontextmanager
+    async def acquire(self, key: Hashable) -> AsyncIterator[bool]:
+        """
+        Holds the lock of `key` in the block and yields whether it had to wait.
+        Raises KeyedLockFull without waiting if the key is at `max_depth`.
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = _Slot()
+        if slot.depth >= self.max_depth:
+            metrics.inc(f"{self.name}_rejected_total")
+            raise KeyedLockFull(key)
+        slot.depth += 1
+        metrics.set_gauge(f"{self.name}_keys", len(self._slots))
+        waited = slot.lock.locked()
+        started = time.monotonic()
+        try:
+            if waited:
+                metrics.add_gauge(f"{self.name}_waiting", 1)
+                try:
+                    await slot.lock.acquire()
+                finally:
+                    metrics.add_gauge(f"{self.name}_waiting", -1)
+            else:
+                await slot.lock.acquire()
+            metrics.observe(f"{self.name}_wait_seconds", time.monotonic() - started)
+            try:
+                yield waited
+            finally:
+                slot.lock.release()
+        finally:
+            slot.depth -= 1
+            if slot.depth == 0:
+                del self._slots[key]
+                metrics.set_gauge(f"{self.name}_keys", len(self._slots))
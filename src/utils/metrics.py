@@ -0,0 +1,112 @@
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+LabelsKey = Tuple[Tuple[str, str], ...]
+MetricKey = Tuple[str, LabelsKey]
+
+SUMMARY_QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _key(name: str, labels: Dict[str, object]) -> MetricKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: LabelsKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry: counters, gauges and summaries.
+    Summaries keep a bounded reservoir of the latest observations for percentiles.
+    Can be rendered in Prometheus text format.
+    """
+
+    def __init__(self, reservoir_size: int = 1024):
+        self.reservoir_size = reservoir_size
+        self._lock = threading.Lock()
+        self._counters: Dict[MetricKey, float] = {}
+        self._gauges: Dict[MetricKey, float] = {}
+        self._observations: Dict[MetricKey, Deque[float]] = {}
+        self._sums: Dict[MetricKey, Tuple[int, float]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = float(value)
+
+    def add_gauge(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            reservoir = self._observations.get(key)
+            if reservoir is None:
+                reservoir = deque(maxlen=self.reservoir_size)
+                self._observations[key] = reservoir
+            reservoir.append(value)
+            count, total = self._sums.get(key, (0, 0.0))
+            self._sums[key] = (count + 1, total + value)
+
+    def get_counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0.0)
+
+    def get_gauge(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._gauges.get(_key(name, labels), 0.0)
+
+    def sample_count(self, name: str, **labels) -> int:
+        with self._lock:
+            return len(self._observations.get(_key(name, labels), ()))
+
+    def percentile(self, name: str, quantile: float, **labels) -> Optional[float]:
+        """Returns percentile of the recent observations, or None if there are none."""
+        with self._lock:
+            values = sorted(self._observations.get(_key(name, labels), ()))
+        return _percentile(values, quantile)
+
+    def render(self) -> str:
+        """Renders all metrics in Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            observations = {k: sorted(v) for k, v in self._observations.items()}
+            sums = dict(self._sums)
+
+        for (name, labels), value in sorted(counters.items()):
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in sorted(gauges.items()):
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), values in sorted(observations.items()):
+            for quantile in SUMMARY_QUANTILES:
+                value = _percentile(values, quantile)
+                lines.append(
+                    f"{name}{_format_labels(labels, ('quantile', str(quantile)))} {value}"
+                )
+            count, total = sums[(name, labels)]
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        return "\n".join(lines) + "\n"
+
+
+def _percentile(sorted_values: List[float], quantile: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(quantile * len(sorted_values)))
+    return sorted_values[index]
+
+
+metrics = Metrics()
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Collection, Dict, Iterator, Optional
+
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# How long cancel() waits for cancelled tasks to finish their cleanup.
+CANCEL_WAIT_SECONDS = 5.0
+
+
+class TaskRegistry:
+    """
+    In-flight tasks of every user with their kind (e.g. "text", "document"),
+    so a command like /newchat can cancel the user's running AI work.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: Dict[int, Dict[asyncio.Task, str]] = {}
+
+    @contextmanager
+    def track(self, user_id: int, kind: str, task: asyncio.Task) -> Iterator[None]:
+        """Registers the task of the user for the duration of the block."""
+        self._tasks.setdefault(user_id, {})[task] = kind
+        metrics.add_gauge(f"{self.name}_tasks", 1, kind=kind)
+        try:
+            yield
+        finally:
+            tasks = self._tasks.get(user_id, {})
+            tasks.pop(task, None)
+            if not tasks:
+                self._tasks.pop(user_id, None)
+            metrics.add_gauge(f"{self.name}_tasks", -1, kind=kind)
+
+    async def cancel(
+        self,
+        user_id: int,
+        reason: str,
+        kinds: Optional[Collection[str]] = None,
+        wait_seconds: float = CANCEL_WAIT_SECONDS,
+    ) -> int:
+        """
+        Cancels in-flight tasks of the user (only of `kinds`, if given) and waits
+        until they finish, so they can't write anything after this returns.
+        Returns the number of cancelled tasks.
+        """
+        current = asyncio.current_task()
+        cancelled = []
+        for task, kind in list(self._tasks.get(user_id, {}).items()):
+            if task is current or task.done():
+                continue
+            if kinds is not None and kind not in kinds:
+                continue
+            task.cancel()
+            cancelled.append(task)
+            metrics.inc(f"{self.name}_cancelled_total", kind=kind, reason=reason)
+        if not cancelled:
+            return 0
+        logger.info(
+            f"Cancelled {len(cancelled)} in-flight task(s) of user {user_id}: {reason}."
+        )
+        _, pending = await asyncio.wait(cancelled, timeout=wait_seconds)
+        if pending:
+            logger.warning(
+                f"{len(pending)} cancelled task(s) of user {user_id} still running after {wait_seconds}s."
+            )
+        return len(cancelled)
+
+
+inflight_tasks = TaskRegistry("inflight")
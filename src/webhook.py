@@ -0,0 +1,154 @@
+import asyncio
+import hmac
+import logging
+import time
+from typing import Optional, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# How long stop() waits for pending updates before cancelling them.
+DRAIN_TIMEOUT_SECONDS = 10.0
+
+
+class WebhookServer:
+    """
+    aiohttp server receiving Telegram updates on `path`.
+    Requests are checked against the webhook secret token, acknowledged with 200
+    right away and queued. A background task takes updates from the queue and,
+    with `handle_as_tasks`, handles each one in its own task like polling does;
+    otherwise it handles them one by one, in order. Queued and running updates
+    are bounded by `max_pending`: beyond it the server answers 503, so Telegram
+    redelivers the update later instead of it piling up in memory.
+    The same server exposes GET /healthz and GET /metrics.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        path: str,
+        secret_token: str,
+        host: str,
+        port: int,
+        max_pending: int,
+        handle_as_tasks: bool = True,
+    ):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self.max_pending = max(1, max_pending)
+        self.handle_as_tasks = handle_as_tasks
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._runner: Optional[web.AppRunner] = None
+        self._dispatch_task: Optional[asyncio.Task] = None
+        self._handling: Set[asyncio.Task] = set()
+
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle_update)
+        self.app.router.add_get("/healthz", self.handle_health)
+        self.app.router.add_get("/metrics", self.handle_metrics)
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_TOKEN_HEADER, "")
+        if not hmac.compare_digest(token.encode(), self.secret_token.encode()):
+            metrics.inc("webhook_rejected_total", reason="secret")
+            logger.warning(f"Webhook request with a wrong secret from {request.remote}")
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(
+                await request.json(), context={"bot": self.bot}
+            )
+        except ValueError as e:
+            metrics.inc("webhook_rejected_total", reason="invalid")
+            logger.warning(f"Invalid webhook update: {e}")
+            return web.Response(status=400)
+        if self.pending >= self.max_pending:
+            metrics.inc("webhook_rejected_total", reason="queue_full")
+            logger.warning(
+                f"{self.pending} webhook updates pending, update {update.update_id} will be redelivered."
+            )
+            return web.Response(status=503)
+        self.queue.put_nowait(update)
+        metrics.inc("webhook_updates_total")
+        metrics.set_gauge("webhook_queue_size", self.queue.qsize())
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "status": "ok",
+                "queue_size": self.queue.qsize(),
+                "running": len(self._handling),
+                "queue_capacity": self.max_pending,
+            }
+        )
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain")
+
+    @property
+    def pending(self) -> int:
+        """Updates queued or being handled."""
+        return self.queue.qsize() + len(self._handling)
+
+    async def _dispatch(self):
+        while True:
+            update = await self.queue.get()
+            if not self.handle_as_tasks:
+                await self._process(update)
+                continue
+            task = asyncio.create_task(self._process(update))
+            self._handling.add(task)
+            task.add_done_callback(self._handling.discard)
+
+    async def _process(self, update: Update):
+        started = time.monotonic()
+        try:
+            await self.dispatcher.feed_update(self.bot, update)
+        except Exception as e:
+            logger.error(
+                f"Error while processing update {update.update_id}: {e}",
+                exc_info=True,
+            )
+        finally:
+            metrics.observe("webhook_update_seconds", time.monotonic() - started)
+            metrics.set_gauge("webhook_queue_size", self.queue.qsize())
+            self.queue.task_done()
+
+    async def start(self):
+        self._dispatch_task = asyncio.create_task(self._dispatch())
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Webhook server listening on {self.host}:{self.port}{self.path}.")
+
+    async def stop(self):
+        """Stops accepting updates, lets pending ones finish for a while, cancels the rest."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        try:
+            await asyncio.wait_for(self.queue.join(), DRAIN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Webhook updates not finished in {DRAIN_TIMEOUT_SECONDS}s, "
+                f"dropping {self.pending} updates."
+            )
+        tasks = list(self._handling)
+        if self._dispatch_task is not None:
+            tasks.append(self._dispatch_task)
+            self._dispatch_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info("Webhook server stopped.")
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import signal
+import sys
+from typing import Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.types import Update
+
+from src.bot import create_dispatcher, on_shutdown
+from src.config import config
+from src.db import backend, connect_db
+from src.supervisor import IPC_LINE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+
+async def on_worker_startup():
+    if not await connect_db():
+        logger.critical(
+            f"Cannot open {backend.name} storage. Some bot features may not work."
+        )
+
+
+async def _feed(dp: Dispatcher, bot: Bot, update: Update):
+    try:
+        await dp.feed_update(bot, update)
+    except Exception as e:
+        logger.error(
+            f"Error while processing update {update.update_id}: {e}", exc_info=True
+        )
+
+
+async def main():
+    """
+    Worker process of the supervisor mode: handles updates read from stdin,
+    one JSON per line, with the regular routers and middlewares.
+    Exits after stdin is closed and all started updates are handled.
+    """
+    if not config:
+        logger.critical("Worker can't start. No config found.")
+        return
+
+    bot = Bot(token=config.bot.token, default=DefaultBotProperties(parse_mode="HTML"))
+    dp = create_dispatcher(backend.create_fsm_storage())
+    dp.startup.register(on_worker_startup)
+    dp.shutdown.register(on_shutdown)
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=IPC_LINE_LIMIT)
+    await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), sys.stdin
+    )
+    tasks: Set[asyncio.Task] = set()
+    while line := await reader.readline():
+        try:
+            update = Update.model_validate_json(line, context={"bot": bot})
+        except ValueError as e:
+            logger.error(f"Worker got an invalid update: {e}")
+            continue
+        task = asyncio.create_task(_feed(dp, bot, update))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    await asyncio.gather(*tasks)
+    await dp.emit_shutdown(bot=bot, dispatcher=dp)
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    # Shutdown is driven by the supervisor closing stdin.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+MongoDB collections for tests: mongomock behind the awaitable interface of motor.
+"""
+
+from typing import Any, List, Optional
+
+import pytest
+from pymongo import ASCENDING
+
+from src.storage.history_cache import history_cache
+from src.storage.mongo import CONVERSATION_FIELD, MongoBackend
+
+
+class FakeCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs) -> "FakeCursor":
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count: int) -> "FakeCursor":
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    def limit(self, count: int) -> "FakeCursor":
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Any]:
+        docs = list(self._cursor)
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._cursor:
+            yield doc
+
+
+class FakeCollection:
+    """Awaitable methods of a mongomock collection, like AsyncIOMotorCollection."""
+
+    def __init__(self, collection):
+        self.sync = collection
+
+    def find(self, *args, batch_size: Optional[int] = None, **kwargs) -> FakeCursor:
+        return FakeCursor(self.sync.find(*args, **kwargs))
+
+    def __getattr__(self, name: str):
+        method = getattr(self.sync, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+
+@pytest.fixture
+def mongo_db():
+    """Returns a function creating awaitable collections of one fresh database."""
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient().db
+    history_cache.clear()
+    yield lambda name: FakeCollection(db[name])
+    history_cache.clear()
+
+
+@pytest.fixture
+def mongo_backend(mongo_db) -> MongoBackend:
+    """MongoBackend on mongomock collections, without the background jobs of connect()."""
+    backend = MongoBackend("mongodb://localhost", "test")
+    backend.user_data = mongo_db("user_data")
+    backend.user_data.sync.create_index("user_id", unique=True)
+    backend.messages = mongo_db("messages")
+    backend.messages.sync.create_index(
+        [("user_id", ASCENDING), (CONVERSATION_FIELD, ASCENDING), ("seq", ASCENDING)],
+        unique=True,
+    )
+    backend.conversations = mongo_db("conversations")
+    return backend
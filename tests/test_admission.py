@@ -0,0 +1,110 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+import pytest
+
+from src.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    ModalityPool,
+)
+
+HOLDER_ID = 99
+
+
+def make_pool(**kwargs) -> ModalityPool:
+    return ModalityPool(
+        "text",
+        limit=kwargs.pop("limit", 1),
+        max_queue_size=kwargs.pop("max_queue_size", 10),
+        max_wait_seconds=kwargs.pop("max_wait_seconds", 5.0),
+        **kwargs,
+    )
+
+
+async def admission_order(
+    pool: ModalityPool, requests: List[Tuple[str, Optional[int]]]
+) -> List[str]:
+    """Queues `requests` (name, user_id) behind a busy slot, returns the order they ran in."""
+    order = []
+
+    async def request(name: str, user_id: Optional[int]):
+        await pool.acquire(user_id)
+        order.append(name)
+        pool.release()
+
+    await pool.acquire(HOLDER_ID)
+    tasks = []
+    for name, user_id in requests:
+        tasks.append(asyncio.create_task(request(name, user_id)))
+        await asyncio.sleep(0)
+    assert pool.queue_size == len(requests)
+    pool.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_light_user_goes_ahead_of_a_flood():
+    flood = [("a1", 1), ("a2", 1), ("a3", 1)]
+    order = asyncio.run(
+        admission_order(make_pool(fair_queueing=True), flood + [("b1", 2)])
+    )
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_weight_gives_a_larger_share():
+    requests = [("a1", 1), ("a2", 1), ("a3", 1), ("b1", 2), ("b2", 2), ("b3", 2)]
+    pool = make_pool(fair_queueing=True, user_weights={2: 3.0})
+    order = asyncio.run(admission_order(pool, requests))
+    assert order == ["a1", "b1", "b2", "b3", "a2", "a3"]
+
+
+def test_queue_is_fifo_without_fair_queueing():
+    requests = [("a1", 1), ("a2", 1), ("b1", 2)]
+    order = asyncio.run(admission_order(make_pool(fair_queueing=False), requests))
+    assert order == ["a1", "a2", "b1"]
+
+
+def test_released_slot_is_handed_to_the_first_waiter():
+    async def scenario():
+        pool = make_pool()
+        await pool.acquire(1)
+        waiter = asyncio.create_task(pool.acquire(2))
+        await asyncio.sleep(0)
+
+        pool.release()
+        # The slot already belongs to the waiter, a newcomer has to queue.
+        assert pool.in_flight == 1
+        newcomer = asyncio.create_task(pool.acquire(3))
+        await waiter
+        await asyncio.sleep(0)
+        assert not newcomer.done()
+        assert pool.queue_size == 1
+
+        pool.release()
+        await newcomer
+        pool.release()
+        assert pool.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_and_timeout_reject():
+    async def scenario():
+        pool = make_pool(max_queue_size=1, max_wait_seconds=0.05)
+        await pool.acquire(1)
+        waiter = asyncio.create_task(pool.acquire(2))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await pool.acquire(3)
+        with pytest.raises(AdmissionRejected):
+            await waiter
+        assert pool.queue_size == 0
+        assert pool.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_worker_processes_share_limits():
+    controller = AdmissionController({"text": 32}, 10, 5.0, processes=4)
+    assert controller.pool("text").limit == 8
@@ -0,0 +1,102 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.middlewares.deadline import DeadlineMiddleware
+from src.utils.deadline import (
+    Deadline,
+    DeadlineExceeded,
+    current_deadline,
+    stage,
+    time_left,
+)
+
+
+def run_with_deadline(budget_seconds: float, coro_factory):
+    async def main():
+        deadline = Deadline(budget_seconds, reserve_seconds=0.0)
+        token = current_deadline.set(deadline)
+        try:
+            return await coro_factory(deadline)
+        finally:
+            current_deadline.reset(token)
+
+    return asyncio.run(main())
+
+
+def test_stage_runs_out_of_the_budget():
+    async def scenario(deadline: Deadline):
+        with pytest.raises(DeadlineExceeded):
+            async with stage("download"):
+                await asyncio.sleep(1)
+        assert deadline.expired
+        assert deadline.stages["download"] > 0
+        # The next stage doesn't even start.
+        with pytest.raises(DeadlineExceeded):
+            async with stage("model"):
+                raise AssertionError("no budget left")
+
+    run_with_deadline(0.05, scenario)
+
+
+def test_own_timeouts_of_a_stage_are_not_deadline_errors():
+    async def scenario(deadline: Deadline):
+        with pytest.raises(asyncio.TimeoutError) as raised:
+            async with stage("model"):
+                await asyncio.wait_for(asyncio.sleep(1), 0.01)
+        assert not isinstance(raised.value, DeadlineExceeded)
+        assert not deadline.expired
+
+    run_with_deadline(5.0, scenario)
+
+
+def test_timeouts_are_cut_to_the_remaining_budget():
+    assert time_left(30.0) == 30.0
+
+    async def scenario(deadline: Deadline):
+        assert time_left(30.0) <= 2.0
+        assert time_left(0.5) == 0.5
+
+    run_with_deadline(2.0, scenario)
+
+
+def test_reserve_is_kept_for_the_timeout_notice():
+    deadline = Deadline(10.0, reserve_seconds=3.0)
+    assert 6.9 < deadline.remaining() <= 7.0
+    # The reserve never takes more than half the budget.
+    assert Deadline(4.0, reserve_seconds=3.0).reserve_seconds == 2.0
+
+
+def test_middleware_cancels_handler_after_the_budget():
+    async def scenario():
+        middleware = DeadlineMiddleware(0.05, reserve_seconds=0.0)
+        cancelled = []
+
+        async def handler(event, data):
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        data = {"handler": SimpleNamespace(flags={"admission": "text"})}
+        assert await middleware(handler, object(), data) is None
+        assert cancelled == [True]
+        assert current_deadline.get() is None
+
+    asyncio.run(scenario())
+
+
+def test_middleware_ignores_handlers_without_admission_flag():
+    async def scenario():
+        middleware = DeadlineMiddleware(0.01)
+
+        async def handler(event, data):
+            await asyncio.sleep(0.03)
+            return current_deadline.get()
+
+        data = {"handler": SimpleNamespace(flags={})}
+        assert await middleware(handler, object(), data) is None
+
+    asyncio.run(scenario())
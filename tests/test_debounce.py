@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from aiogram.types import Chat, Message
+
+from src.middlewares import debounce as debounce_module
+from src.middlewares.debounce import DebounceMiddleware
+from src.middlewares.user_context import UserContext
+
+USER_ID = 42
+
+
+@pytest.fixture(autouse=True)
+def short_windows(monkeypatch):
+    monkeypatch.setattr(
+        debounce_module, "ALLOWED_DEBOUNCE_MODES", {"off": 0.0, "short": 0.05}
+    )
+
+
+def make_message(message_id: int, text: str) -> Message:
+    return Message(
+        message_id=message_id,
+        date=datetime.now(),
+        chat=Chat(id=USER_ID, type="private"),
+        text=text,
+    )
+
+
+def make_data(debounce_mode: str) -> dict:
+    context = UserContext(
+        user_id=USER_ID, debounce_mode=debounce_mode, settings_loaded=True
+    )
+    return {"user_context": context}
+
+
+def test_messages_in_a_row_are_merged():
+    async def scenario():
+        middleware = DebounceMiddleware()
+        handled = []
+
+        async def handler(event, data):
+            handled.append(event.text)
+
+        first = asyncio.create_task(
+            middleware(handler, make_message(1, "one"), make_data("short"))
+        )
+        await asyncio.sleep(0.01)
+        for message_id, text in ((2, "two"), (3, "three")):
+            await middleware(
+                handler, make_message(message_id, text), make_data("short")
+            )
+            await asyncio.sleep(0.01)
+        assert handled == []
+
+        await first
+        assert handled == ["one\ntwo\nthree"]
+
+    asyncio.run(scenario())
+
+
+def test_full_batch_is_sent_right_away():
+    async def scenario():
+        middleware = DebounceMiddleware(max_messages=2)
+        handled = []
+
+        async def handler(event, data):
+            handled.append(event.text)
+
+        first = asyncio.create_task(
+            middleware(handler, make_message(1, "one"), make_data("short"))
+        )
+        await asyncio.sleep(0)
+        await middleware(handler, make_message(2, "two"), make_data("short"))
+        await asyncio.wait_for(first, 0.03)
+        assert handled == ["one\ntwo"]
+
+    asyncio.run(scenario())
+
+
+def test_off_mode_handles_every_message():
+    async def scenario():
+        middleware = DebounceMiddleware()
+        handled = []
+
+        async def handler(event, data):
+            handled.append(event.text)
+
+        for message_id, text in ((1, "one"), (2, "two")):
+            await middleware(handler, make_message(message_id, text), make_data("off"))
+        assert handled == ["one", "two"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+import asyncio
+
+from src.services.hedging import Hedger
+
+
+def make_hedger() -> Hedger:
+    return Hedger(
+        True,
+        95.0,
+        max_fraction=1.0,
+        min_delay_seconds=0.0,
+        initial_delay_seconds=0.01,
+    )
+
+
+async def slow():
+    await asyncio.sleep(0.1)
+    return "slow", None
+
+
+async def fast():
+    return "fast", None
+
+
+def test_hedge_wins_and_is_counted():
+    async def scenario():
+        hedger = make_hedger()
+        assert await hedger.run("m", slow, fast) == ("fast", None)
+        assert hedger.hedges == 1
+
+    asyncio.run(scenario())
+
+
+def test_hedge_without_quota_is_not_counted():
+    async def scenario():
+        hedger = make_hedger()
+
+        async def never_sent():
+            raise AssertionError("duplicate has no quota")
+
+        result = await hedger.run("m", slow, never_sent, admit=lambda: False)
+        assert result == ("slow", None)
+        assert hedger.hedges == 0
+
+    asyncio.run(scenario())
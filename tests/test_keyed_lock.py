@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from src.utils.keyed_lock import KeyedLock, KeyedLockFull
+
+
+def test_key_is_rejected_at_max_depth():
+    async def scenario():
+        lock = KeyedLock("test_lock", max_depth=2)
+        release = asyncio.Event()
+        order = []
+
+        async def hold(name: str):
+            async with lock.acquire("user") as waited:
+                order.append((name, waited))
+                await release.wait()
+
+        holder = asyncio.create_task(hold("first"))
+        waiter = asyncio.create_task(hold("second"))
+        await asyncio.sleep(0)
+        assert lock.depth("user") == 2
+
+        with pytest.raises(KeyedLockFull):
+            async with lock.acquire("user"):
+                pass
+        # Other keys aren't limited by it.
+        async with lock.acquire("other") as waited:
+            assert not waited
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+        assert order == [("first", False), ("second", True)]
+        assert lock.depth("user") == 0
+        assert len(lock) == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_frees_its_place():
+    async def scenario():
+        lock = KeyedLock("test_lock", max_depth=2)
+        release = asyncio.Event()
+
+        async def hold():
+            async with lock.acquire("user"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert lock.depth("user") == 1
+
+        release.set()
+        await holder
+        assert len(lock) == 0
+
+    asyncio.run(scenario())
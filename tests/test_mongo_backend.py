@@ -0,0 +1,58 @@
+import asyncio
+
+from src.storage.mongo import MongoBackend
+from src.storage.retention import LEGACY_HISTORY_FIELD, MESSAGE_COUNT_FIELD
+from src.utils.metrics import metrics
+
+USER_ID = 42
+
+
+def message(role: str, text: str) -> dict:
+    return {"role": role, "parts": [{"text": text}]}
+
+
+def test_append_history_counts_messages(mongo_backend: MongoBackend):
+    async def scenario():
+        assert await mongo_backend.append_history(USER_ID, [message("user", "hi")])
+        assert await mongo_backend.append_history(USER_ID, [message("model", "hello")])
+        conversation = await mongo_backend.conversations.find_one({"user_id": USER_ID})
+        assert conversation["title"] == "hi"
+        assert conversation[MESSAGE_COUNT_FIELD] == 2
+        seqs = [doc["seq"] for doc in mongo_backend.messages.sync.find()]
+        assert seqs == [1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_failed_conversation_update_doesnt_fail_the_save(
+    mongo_backend: MongoBackend, monkeypatch
+):
+    async def failing_update(*args, **kwargs):
+        raise RuntimeError("conversations unavailable")
+
+    monkeypatch.setattr(mongo_backend.conversations, "update_one", failing_update)
+    failures = metrics.get_counter("conversation_update_failures_total")
+
+    async def scenario():
+        assert await mongo_backend.append_history(USER_ID, [message("user", "hi")])
+        assert mongo_backend.messages.sync.count_documents({"user_id": USER_ID}) == 1
+        assert metrics.get_counter("conversation_update_failures_total") == failures + 1
+
+    asyncio.run(scenario())
+
+
+def test_legacy_history_is_migrated(mongo_backend: MongoBackend):
+    async def scenario():
+        legacy = [message("user", "old"), message("model", "answer")]
+        await mongo_backend.user_data.insert_one(
+            {"user_id": USER_ID, LEGACY_HISTORY_FIELD: legacy}
+        )
+        assert await mongo_backend.get_history(USER_ID) == legacy
+        doc = await mongo_backend.user_data.find_one({"user_id": USER_ID})
+        assert LEGACY_HISTORY_FIELD not in doc
+
+        assert await mongo_backend.append_history(USER_ID, [message("user", "new")])
+        seqs = [doc["seq"] for doc in mongo_backend.messages.sync.find()]
+        assert seqs == [1, 2, 3]
+
+    asyncio.run(scenario())
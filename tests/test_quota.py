@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from src.services import quota as quota_module
+from src.services.quota import ModelQuota, QuotaScheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(quota_module.time, "monotonic", fake)
+    return fake
+
+
+def test_bucket_refills_continuously(clock):
+    bucket = TokenBucket(60, per_seconds=60.0)
+    bucket.consume(60)
+    assert bucket.delay_for(1) == pytest.approx(1.0)
+
+    clock.now += 30
+    assert bucket.delay_for(30) == 0.0
+    assert bucket.delay_for(31) == pytest.approx(1.0)
+
+    clock.now += 3600
+    assert bucket.level <= bucket.capacity
+    assert bucket.delay_for(60) == 0.0
+
+
+def test_bucket_goes_negative_and_refunds(clock):
+    bucket = TokenBucket(10, per_seconds=10.0)
+    bucket.consume(15)
+    assert bucket.delay_for(1) == pytest.approx(6.0)
+    bucket.refund(100)
+    assert bucket.level == bucket.capacity
+    bucket.drain()
+    assert bucket.delay_for(1) == pytest.approx(1.0)
+
+
+def test_request_bigger_than_capacity_is_capped(clock):
+    bucket = TokenBucket(10, per_seconds=10.0)
+    assert bucket.delay_for(1000) == 0.0
+
+
+def make_quota(rpm: int, per_seconds: float, **kwargs) -> ModelQuota:
+    quota = ModelQuota(
+        "test-model",
+        rpm=rpm,
+        tpm=1_000_000,
+        max_queue_size=kwargs.get("max_queue_size", 10),
+        max_wait_seconds=kwargs.get("max_wait_seconds", 5.0),
+    )
+    quota.requests = TokenBucket(rpm, per_seconds=per_seconds)
+    return quota
+
+
+def test_waiting_requests_are_admitted_in_fifo_order():
+    async def scenario():
+        # Two requests per 0.2 s: the bucket is empty after the first two.
+        quota = make_quota(2, per_seconds=0.2)
+        assert await quota.acquire(1)
+        assert await quota.acquire(1)
+
+        admitted = []
+        positions = {}
+
+        async def request(name: str):
+            async def on_position(position: int):
+                positions.setdefault(name, []).append(position)
+
+            assert await quota.acquire(1, on_position)
+            admitted.append(name)
+
+        tasks = []
+        for name in ("a", "b", "c"):
+            tasks.append(asyncio.create_task(request(name)))
+            await asyncio.sleep(0)
+        assert quota.queue_size == 3
+        await asyncio.gather(*tasks)
+
+        assert admitted == ["a", "b", "c"]
+        assert positions["a"] == [1, 0]
+        assert positions["c"][0] == 3 and positions["c"][-1] == 0
+        assert quota.queue_size == 0
+
+    asyncio.run(scenario())
+
+
+def test_try_acquire_does_not_jump_the_queue():
+    async def scenario():
+        quota = make_quota(1, per_seconds=0.1)
+        assert quota.try_acquire(1)
+        waiter = asyncio.create_task(quota.acquire(1))
+        await asyncio.sleep(0)
+        assert not quota.try_acquire(1)
+        assert await waiter
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_and_max_wait_reject():
+    async def scenario():
+        quota = make_quota(1, per_seconds=60.0, max_queue_size=1, max_wait_seconds=0.05)
+        assert await quota.acquire(1)
+        waiter = asyncio.create_task(quota.acquire(1))
+        await asyncio.sleep(0)
+        assert not await quota.acquire(1)
+        assert not await waiter
+        assert quota.queue_size == 0
+
+    asyncio.run(scenario())
+
+
+def test_worker_processes_share_model_limits():
+    scheduler = QuotaScheduler({"m": {"rpm": 10, "tpm": 1000}}, 10, 5.0, processes=4)
+    quota = scheduler.for_model("m")
+    assert quota.requests.capacity == 2
+    assert quota.tokens.capacity == 250
+    # Every process can still send requests.
+    small = QuotaScheduler({"m": {"rpm": 2}}, 10, 5.0, processes=4)
+    assert small.for_model("m").requests.capacity == 1
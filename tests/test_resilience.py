@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+
+from src.services import resilience
+from src.services.errors import format_error_message
+from src.services.gemini import (
+    GEMINI_CIRCUIT_OPEN,
+    GEMINI_QUOTA_ERROR,
+    GEMINI_REQUEST_ERROR,
+    GEMINI_SERVICE_UNAVAILABLE,
+)
+from src.services.resilience import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    RetryPolicy,
+    call_with_resilience,
+    is_retryable_error,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(resilience.time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def breakers(monkeypatch) -> CircuitBreakerRegistry:
+    registry = CircuitBreakerRegistry(failure_threshold=3, recovery_seconds=10.0)
+    monkeypatch.setattr(resilience, "circuit_breakers", registry)
+    return registry
+
+
+NO_DELAY = RetryPolicy(
+    max_attempts=3, base_delay_seconds=0.0, max_delay_seconds=0.0, budget_seconds=5.0
+)
+
+
+def test_breaker_opens_probes_and_closes(clock):
+    breaker = CircuitBreaker("model", failure_threshold=2, recovery_seconds=10.0)
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_CLOSED
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert not breaker.allow_request()
+
+    clock.now += 10
+    assert breaker.allow_request()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    # Only one probe at a time.
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CIRCUIT_CLOSED
+    assert breaker.consecutive_failures == 0
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker("model", failure_threshold=5, recovery_seconds=10.0)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert breaker.is_open
+
+
+def test_released_probe_lets_the_next_request_probe(clock):
+    breaker = CircuitBreaker("model", failure_threshold=1, recovery_seconds=10.0)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_retryable_errors():
+    assert is_retryable_error(GEMINI_SERVICE_UNAVAILABLE)
+    assert not is_retryable_error(None)
+    assert not is_retryable_error(GEMINI_QUOTA_ERROR)
+    assert not is_retryable_error(f"{GEMINI_REQUEST_ERROR}:TypeError")
+    assert not is_retryable_error(f"{GEMINI_REQUEST_ERROR}:InvalidArgument")
+
+
+def test_open_circuit_offers_a_retry_button():
+    class Localizer:
+        def format_value(self, key, args=None):
+            return key
+
+    assert format_error_message(GEMINI_CIRCUIT_OPEN, Localizer())[1]
+
+
+def test_transient_errors_are_retried(breakers):
+    async def scenario():
+        results = iter(
+            [(None, GEMINI_SERVICE_UNAVAILABLE), (None, GEMINI_SERVICE_UNAVAILABLE)]
+        )
+        calls = []
+
+        async def operation():
+            calls.append(1)
+            return next(results, ("answer", None))
+
+        result = await call_with_resilience(
+            operation, "m", GEMINI_CIRCUIT_OPEN, NO_DELAY
+        )
+        assert result == ("answer", None)
+        assert len(calls) == 3
+        assert breakers.get("m").state == CIRCUIT_CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_open_circuit_fails_fast(breakers):
+    async def scenario():
+        async def failing():
+            return None, GEMINI_SERVICE_UNAVAILABLE
+
+        await call_with_resilience(failing, "m", GEMINI_CIRCUIT_OPEN, NO_DELAY)
+        assert breakers.get("m").state == CIRCUIT_OPEN
+
+        async def never_called():
+            raise AssertionError("circuit is open")
+
+        result = await call_with_resilience(
+            never_called, "m", GEMINI_CIRCUIT_OPEN, NO_DELAY
+        )
+        assert result == (None, GEMINI_CIRCUIT_OPEN)
+
+    asyncio.run(scenario())
+
+
+def test_quota_error_during_probe_keeps_circuit_half_open(breakers):
+    async def scenario():
+        breaker = breakers.get("m")
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        breaker.opened_at -= breaker.recovery_seconds
+
+        async def quota_error():
+            return None, GEMINI_QUOTA_ERROR
+
+        result = await call_with_resilience(
+            quota_error, "m", GEMINI_CIRCUIT_OPEN, NO_DELAY
+        )
+        assert result == (None, GEMINI_QUOTA_ERROR)
+        assert breaker.state == CIRCUIT_HALF_OPEN
+        assert breaker.allow_request()
+
+    asyncio.run(scenario())
@@ -0,0 +1,117 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.storage.mongo import MongoBackend
+from src.storage.retention import (
+    HISTORY_EXPIRED_FIELD,
+    LAST_ACTIVE_FIELD,
+    MESSAGE_COUNT_FIELD,
+    RetentionSweeper,
+)
+
+USER_ID = 42
+OTHER_USER_ID = 7
+
+
+def message(role: str, text: str) -> dict:
+    return {"role": role, "parts": [{"text": text}]}
+
+
+@pytest.fixture
+def sweeper(mongo_backend: MongoBackend) -> RetentionSweeper:
+    sweeper = RetentionSweeper(
+        True,
+        "delete",
+        inactive_days=30,
+        max_messages=3,
+        archive_ttl_days=0,
+        sweep_interval_seconds=3600.0,
+        batch_size=10,
+        batch_pause_seconds=0.0,
+    )
+    sweeper._user_data = mongo_backend.user_data
+    sweeper._messages = mongo_backend.messages
+    sweeper._conversations = mongo_backend.conversations
+    return sweeper
+
+
+async def make_inactive(backend: MongoBackend, user_id: int):
+    long_ago = datetime.now(timezone.utc) - timedelta(days=60)
+    await backend.user_data.update_one(
+        {"user_id": user_id}, {"$set": {LAST_ACTIVE_FIELD: long_ago}}
+    )
+    await backend.conversations.update_many(
+        {"user_id": user_id}, {"$set": {"updated_at": long_ago}}
+    )
+
+
+def test_inactive_users_are_expired(mongo_backend: MongoBackend, sweeper):
+    async def scenario():
+        for user_id in (USER_ID, OTHER_USER_ID):
+            await mongo_backend.append_history(user_id, [message("user", "hi")])
+        await make_inactive(mongo_backend, USER_ID)
+
+        assert await sweeper._expire_inactive_users() == 1
+        assert await mongo_backend.get_history(USER_ID) == []
+        assert await mongo_backend.list_conversations(USER_ID) == ([], 0)
+        doc = await mongo_backend.user_data.find_one({"user_id": USER_ID})
+        assert HISTORY_EXPIRED_FIELD in doc
+        assert len(await mongo_backend.get_history(OTHER_USER_ID)) == 1
+
+    asyncio.run(scenario())
+
+
+def test_message_saved_during_expiry_is_kept(
+    mongo_backend: MongoBackend, sweeper, monkeypatch
+):
+    async def scenario():
+        await mongo_backend.append_history(USER_ID, [message("user", "old")])
+        await make_inactive(mongo_backend, USER_ID)
+
+        retire_messages = sweeper._retire_messages
+
+        async def user_writes_meanwhile(query):
+            await mongo_backend.append_history(USER_ID, [message("user", "new")])
+            return await retire_messages(query)
+
+        monkeypatch.setattr(sweeper, "_retire_messages", user_writes_meanwhile)
+        await sweeper._expire_inactive_users()
+
+        history = await mongo_backend.get_history(USER_ID)
+        assert [msg["parts"][0]["text"] for msg in history] == ["new"]
+        doc = await mongo_backend.user_data.find_one({"user_id": USER_ID})
+        assert HISTORY_EXPIRED_FIELD not in doc
+        conversation = await mongo_backend.conversations.find_one({"user_id": USER_ID})
+        assert conversation["title"] == "old"
+
+    asyncio.run(scenario())
+
+
+def test_trim_decrements_message_count(mongo_backend: MongoBackend, sweeper):
+    async def scenario():
+        for i in range(5):
+            await mongo_backend.append_history(USER_ID, [message("user", f"q{i}")])
+
+        assert await sweeper._trim_long_conversations() == 1
+        history = await mongo_backend.get_history(USER_ID)
+        assert [msg["parts"][0]["text"] for msg in history] == ["q2", "q3", "q4"]
+        conversation = await mongo_backend.conversations.find_one({"user_id": USER_ID})
+        assert conversation[MESSAGE_COUNT_FIELD] == 3
+
+    asyncio.run(scenario())
+
+
+def test_trim_recounts_a_wrong_message_count(mongo_backend: MongoBackend, sweeper):
+    async def scenario():
+        await mongo_backend.append_history(USER_ID, [message("user", "hi")])
+        await mongo_backend.conversations.update_one(
+            {"user_id": USER_ID}, {"$set": {MESSAGE_COUNT_FIELD: 10}}
+        )
+
+        assert await sweeper._trim_long_conversations() == 1
+        conversation = await mongo_backend.conversations.find_one({"user_id": USER_ID})
+        assert conversation[MESSAGE_COUNT_FIELD] == 1
+
+    asyncio.run(scenario())
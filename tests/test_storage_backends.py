@@ -0,0 +1,178 @@
+"""
+Conformance tests every storage backend must pass.
+MongoDB needs a server, so only the in-memory and SQLite backends run here.
+"""
+
+import asyncio
+from typing import Awaitable, Callable
+
+import pytest
+
+from src.config import CONVERSATION_TITLE_MAX_CHARS
+from src.storage import MemoryBackend, SQLiteBackend, StorageBackend
+
+HISTORY_WINDOW = 4
+USER_ID = 42
+OTHER_USER_ID = 7
+
+Scenario = Callable[[StorageBackend], Awaitable[None]]
+
+
+def message(role: str, text: str) -> dict:
+    return {"role": role, "parts": [{"text": text}]}
+
+
+def texts(history: list) -> list:
+    return [msg["parts"][0]["text"] for msg in history]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def run(request, tmp_path) -> Callable[[Scenario], None]:
+    """Runs a scenario against a fresh backend of each kind."""
+
+    def create_backend() -> StorageBackend:
+        if request.param == "memory":
+            return MemoryBackend(HISTORY_WINDOW)
+        pytest.importorskip("aiosqlite")
+        return SQLiteBackend(str(tmp_path / "bot.sqlite3"), HISTORY_WINDOW)
+
+    def run_scenario(scenario: Scenario):
+        async def main():
+            backend = create_backend()
+            assert await backend.connect()
+            try:
+                await scenario(backend)
+            finally:
+                await backend.close()
+
+        asyncio.run(main())
+
+    return run_scenario
+
+
+def test_settings(run):
+    async def scenario(backend: StorageBackend):
+        assert await backend.get_user_data(USER_ID, include_history=False) == {}
+        assert await backend.get_user_data(USER_ID) == {"history": []}
+
+        assert await backend.save_user_setting(USER_ID, "gemini_temperature", 0.3)
+        assert await backend.save_user_setting(USER_ID, "gemini_temperature", 0.5)
+        assert await backend.save_user_setting(USER_ID, "message_debounce", "off")
+        assert not await backend.save_user_setting(USER_ID, "unknown_setting", 1)
+
+        assert await backend.get_user_data(USER_ID, include_history=False) == {
+            "gemini_temperature": 0.5,
+            "message_debounce": "off",
+        }
+        temperature, _, _ = await backend.get_user_settings(USER_ID)
+        assert temperature == 0.5
+        assert await backend.get_user_data(OTHER_USER_ID, include_history=False) == {}
+
+    run(scenario)
+
+
+def test_history_is_windowed(run):
+    async def scenario(backend: StorageBackend):
+        assert await backend.get_history(USER_ID) == []
+        assert await backend.append_history(USER_ID, [])
+        for i in range(3):
+            assert await backend.append_history(
+                USER_ID, [message("user", f"q{i}"), message("model", f"a{i}")]
+            )
+
+        expected = ["q1", "a1", "q2", "a2"]
+        assert texts(await backend.get_history(USER_ID)) == expected
+        data = await backend.get_user_data(USER_ID)
+        assert texts(data["history"]) == expected
+        assert await backend.get_history(OTHER_USER_ID) == []
+
+    run(scenario)
+
+
+def test_returned_history_is_a_copy(run):
+    async def scenario(backend: StorageBackend):
+        await backend.append_history(USER_ID, [message("user", "hi")])
+        history = await backend.get_history(USER_ID)
+        history[0]["parts"][0]["text"] = "changed"
+        history.append(message("model", "extra"))
+        assert texts(await backend.get_history(USER_ID)) == ["hi"]
+
+    run(scenario)
+
+
+def test_conversations(run):
+    async def scenario(backend: StorageBackend):
+        assert await backend.list_conversations(USER_ID) == ([], 0)
+
+        await backend.append_history(USER_ID, [message("user", "first chat")])
+        first_id = (await backend.list_conversations(USER_ID))[1]
+
+        long_title = "x" * (CONVERSATION_TITLE_MAX_CHARS + 10)
+        assert await backend.start_conversation(USER_ID, long_title)
+        conversations, second_id = await backend.list_conversations(USER_ID)
+        assert second_id != first_id
+        assert await backend.get_history(USER_ID) == []
+        titles = {c["conversation_id"]: c["title"] for c in conversations}
+        assert titles == {
+            first_id: "first chat",
+            second_id: long_title[:CONVERSATION_TITLE_MAX_CHARS],
+        }
+
+        await backend.append_history(USER_ID, [message("user", "second chat")])
+        assert await backend.start_conversation(USER_ID)
+        third_id = (await backend.list_conversations(USER_ID))[1]
+        assert third_id not in (first_id, second_id)
+        await backend.append_history(USER_ID, [message("user", "third chat")])
+        conversations, _ = await backend.list_conversations(USER_ID)
+        assert conversations[0] == {"conversation_id": third_id, "title": "third chat"}
+
+        switched = await backend.switch_conversation(USER_ID, first_id)
+        assert switched == {"conversation_id": first_id, "title": "first chat"}
+        assert (await backend.list_conversations(USER_ID))[1] == first_id
+        assert texts(await backend.get_history(USER_ID)) == ["first chat"]
+
+        assert await backend.switch_conversation(USER_ID, 999) is None
+        assert await backend.switch_conversation(OTHER_USER_ID, first_id) is None
+        assert (await backend.list_conversations(USER_ID))[1] == first_id
+
+    run(scenario)
+
+
+def test_fsm_storage(run):
+    async def scenario(backend: StorageBackend):
+        from aiogram.fsm.storage.base import StorageKey
+
+        storage = backend.create_fsm_storage()
+        key = StorageKey(bot_id=1, chat_id=USER_ID, user_id=USER_ID)
+        assert await storage.get_state(key) is None
+        assert await storage.get_data(key) == {}
+
+        await storage.set_state(key, "ImageGenState:waiting_for_prompt")
+        await storage.set_data(key, {"language": "en"})
+        assert await storage.get_state(key) == "ImageGenState:waiting_for_prompt"
+        assert await storage.get_data(key) == {"language": "en"}
+
+        await storage.set_state(key, None)
+        assert await storage.get_state(key) is None
+        assert await storage.get_data(key) == {"language": "en"}
+        await storage.close()
+
+    run(scenario)
+
+
+def test_delete_user_data(run):
+    async def scenario(backend: StorageBackend):
+        assert not await backend.delete_user_data(USER_ID)
+
+        await backend.save_user_setting(USER_ID, "gemini_temperature", 0.3)
+        await backend.append_history(USER_ID, [message("user", "hi")])
+        await backend.start_conversation(USER_ID, "second")
+        await backend.append_history(OTHER_USER_ID, [message("user", "other")])
+
+        assert await backend.delete_user_data(USER_ID)
+        assert await backend.get_user_data(USER_ID) == {"history": []}
+        assert await backend.list_conversations(USER_ID) == ([], 0)
+        assert not await backend.delete_user_data(USER_ID)
+        assert texts(await backend.get_history(OTHER_USER_ID)) == ["other"]
+
+    run(scenario)
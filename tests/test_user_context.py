@@ -0,0 +1,39 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.middlewares import user_context as user_context_module
+from src.middlewares.user_context import UserContextLoaderMiddleware
+
+USER_ID = 42
+
+
+class FakeState:
+    async def get_data(self):
+        return {"language_code": "en"}
+
+
+def test_settings_are_loaded_on_first_access(monkeypatch):
+    queries = []
+
+    async def get_user_data(user_id, include_history=True):
+        queries.append(user_id)
+        return {"gemini_temperature": 0.3, "message_debounce": "off"}
+
+    monkeypatch.setattr(user_context_module, "get_user_data", get_user_data)
+
+    async def scenario():
+        async def handler(event, data):
+            return data["user_context"]
+
+        data = {"event_from_user": SimpleNamespace(id=USER_ID), "state": FakeState()}
+        context = await UserContextLoaderMiddleware()(handler, object(), data)
+        assert context.fsm_data == {"language_code": "en"}
+        assert queries == []
+
+        await context.load_settings()
+        await context.load_settings()
+        assert queries == [USER_ID]
+        assert context.temperature == 0.3
+        assert context.debounce_mode == "off"
+
+    asyncio.run(scenario())
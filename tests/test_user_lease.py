@@ -0,0 +1,93 @@
+"""
+Per-user leases of two bot instances. The takeover and fencing test needs
+a mongod (TEST_MONGO_URI, default mongodb://localhost:27017) and is skipped
+without one.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+
+import pytest
+
+from src.storage.lease import LeaseManager
+from src.storage.mongo import MongoBackend
+
+USER_ID = 1
+TTL_SECONDS = 1.5
+MONGO_URI = os.getenv("TEST_MONGO_URI", "mongodb://localhost:27017")
+
+
+def message(text: str) -> dict:
+    return {"role": "user", "parts": [{"text": text}]}
+
+
+def test_stop_releases_held_leases(mongo_db):
+    async def scenario():
+        collection = mongo_db("leases")
+        lease_a = LeaseManager(True, TTL_SECONDS, 5.0, owner="instance-a")
+        lease_b = LeaseManager(True, TTL_SECONDS, 5.0, owner="instance-b")
+        lease_a._collection = lease_b._collection = collection
+
+        async with lease_a.hold(USER_ID) as held_a:
+            await lease_a.stop()
+            started = time.monotonic()
+            async with lease_b.hold(USER_ID) as held_b:
+                assert time.monotonic() - started < TTL_SECONDS
+                assert held_b.owner_changed
+                assert held_b.token > held_a.token
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def mongod() -> str:
+    """Database name on a running mongod, dropped after the test."""
+    pymongo = pytest.importorskip("pymongo")
+    client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError:
+        client.close()
+        pytest.skip(f"No mongod at {MONGO_URI}")
+    db_name = f"lease_test_{uuid.uuid4().hex[:8]}"
+    yield db_name
+    client.drop_database(db_name)
+    client.close()
+
+
+def test_stale_holder_is_fenced_and_lease_hands_over(mongod):
+    async def scenario():
+        instances = []
+        for name in ("a", "b"):
+            backend = MongoBackend(MONGO_URI, mongod)
+            assert await backend.connect()
+            lease = LeaseManager(True, TTL_SECONDS, 10.0, owner=f"instance-{name}")
+            await lease.start(backend.db)
+            instances.append((backend, lease))
+        (backend_a, lease_a), (backend_b, lease_b) = instances
+        try:
+            async with lease_a.hold(USER_ID) as held_a:
+                # A long pause of instance A: its lease isn't renewed anymore.
+                lease_a._held[USER_ID].heartbeat.cancel()
+                await asyncio.sleep(TTL_SECONDS + 0.5)
+                async with lease_b.hold(USER_ID) as held_b:
+                    assert held_b.owner_changed
+                    assert held_b.token > held_a.token
+                    assert await backend_b.append_history(USER_ID, [message("b")])
+                assert not await backend_a.append_history(USER_ID, [message("a")])
+
+            started = time.monotonic()
+            async with lease_b.hold(USER_ID):
+                pass
+            async with lease_a.hold(USER_ID) as held_a:
+                assert held_a.owner_changed
+                assert time.monotonic() - started < TTL_SECONDS
+                assert await backend_a.append_history(USER_ID, [message("a")])
+        finally:
+            for backend, lease in instances:
+                await lease.stop()
+                await backend.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.webhook import SECRET_TOKEN_HEADER, WebhookServer
+
+SECRET = "secret"
+
+
+class BlockingDispatcher:
+    """Handles updates until released, recording how many run at once."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.running = 0
+        self.max_running = 0
+        self.handled = []
+
+    async def feed_update(self, bot, update):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await self.release.wait()
+        self.running -= 1
+        self.handled.append(update.update_id)
+
+
+def make_request(update_id: int):
+    async def json():
+        return {"update_id": update_id}
+
+    return SimpleNamespace(
+        headers={SECRET_TOKEN_HEADER: SECRET}, json=json, remote="127.0.0.1"
+    )
+
+
+def make_server(dispatcher, max_pending: int, handle_as_tasks: bool = True):
+    return WebhookServer(
+        dispatcher,
+        None,
+        path="/webhook",
+        secret_token=SECRET,
+        host="127.0.0.1",
+        port=0,
+        max_pending=max_pending,
+        handle_as_tasks=handle_as_tasks,
+    )
+
+
+def test_updates_are_handled_concurrently_up_to_max_pending():
+    async def scenario():
+        dispatcher = BlockingDispatcher()
+        server = make_server(dispatcher, max_pending=3)
+        server._dispatch_task = asyncio.create_task(server._dispatch())
+
+        for update_id in range(3):
+            response = await server.handle_update(make_request(update_id))
+            assert response.status == 200
+        await asyncio.sleep(0.01)
+        assert dispatcher.max_running == 3
+        assert (await server.handle_update(make_request(3))).status == 503
+
+        dispatcher.release.set()
+        await server.stop()
+        assert sorted(dispatcher.handled) == [0, 1, 2]
+        assert server.pending == 0
+
+    asyncio.run(scenario())
+
+
+def test_updates_are_handled_in_order_without_tasks():
+    async def scenario():
+        dispatcher = BlockingDispatcher()
+        dispatcher.release.set()
+        server = make_server(dispatcher, max_pending=10, handle_as_tasks=False)
+        server._dispatch_task = asyncio.create_task(server._dispatch())
+
+        for update_id in range(5):
+            await server.handle_update(make_request(update_id))
+        await server.stop()
+        assert dispatcher.handled == [0, 1, 2, 3, 4]
+        assert dispatcher.max_running == 1
+
+    asyncio.run(scenario())